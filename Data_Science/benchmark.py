@@ -0,0 +1,228 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from particle_reader import read_particles
+from particle_species import DEFAULT_CLASSIFIER, classify
+from kinematics import transverse_momentum, momentum, pseudorapidity
+from histograms import new_histogram, fill
+from streaming_stats import block_moments
+import event_stats
+import event_kernels
+from synthetic_data import generate_file, parse_mix
+from precision import PRECISIONS, as_precision, precision_loss, worst_loss
+import goal3
+import goal4
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+# Benchmarks for the analysis pipeline on synthetic output-SetN.txt files.
+# Every stage (parse, classify, kinematics, aggregate, per-event reductions
+# with the NumPy and, if installed, Numba backend, plot, plus goal3 and
+# goal4 end to end) is timed best-of-repeat and reported as particles/sec;
+# numba_first is the first Numba call of the process (compile or cache load),
+# which every worker process pays once;
+# results are written as JSON so runs can be compared over time:
+#   python benchmark.py --events 20000 --out bench.json
+#   python benchmark.py --events 20000 --compare bench.json
+# --precision float32 runs the array stages on float32 momenta and reports
+# how far the goal3 summary moves from the float64 one.
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MiB (None where unavailable).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+@contextlib.contextmanager
+def module_settings(module, **values):
+    """
+    Set module-level settings (e.g. goal3.use_cache) for the duration of the block.
+    """
+    old = {name: getattr(module, name) for name in values}
+    for name, value in values.items():
+        setattr(module, name, value)
+    try:
+        yield module
+    finally:
+        for name, value in old.items():
+            setattr(module, name, value)
+
+
+def best_time(func, repeat: int):
+    """
+    (best wall time, last result) of repeat calls of func().
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def plot_spectra(pt, categories, folder: str) -> str:
+    fig, ax = plt.subplots()
+    for code in np.unique(categories):
+        ax.hist(pt[categories == code], bins=100, range=(0, 3), histtype='step',
+                label=DEFAULT_CLASSIFIER['names'][code])
+    ax.set_xlabel('pT (GeV/c)')
+    ax.set_yscale('log')
+    ax.legend(fontsize=6)
+    fname = os.path.join(folder, 'spectra.png')
+    fig.savefig(fname)
+    plt.close(fig)
+    return fname
+
+
+def run_stages(path: str, repeat: int, folder: str, precision: str = 'float64') -> tuple[dict, int]:
+    """
+    Time every pipeline stage on one file; returns ({stage: seconds}, particles).
+    """
+    times = {}
+    times['parse'], cols = best_time(lambda: as_precision(read_particles(path), precision), repeat)
+    px, py, pz, pdg = cols['px'], cols['py'], cols['pz'], cols['pdg']
+    times['classify'], categories = best_time(lambda: classify(pdg), repeat)
+
+    def kinematics():
+        pt = transverse_momentum(px, py)
+        p = momentum(px, py, pz, pt=pt)
+        return pt, p, pseudorapidity(px, py, pz, p=p)
+    times['kinematics'], (pt, p, eta) = best_time(kinematics, repeat)
+
+    n_cat = len(DEFAULT_CLASSIFIER['names'])
+
+    def aggregate():
+        counts = np.bincount(categories, minlength=n_cat)
+        moments = [block_moments(pt[categories == c]) for c in range(n_cat) if counts[c]]
+        hist = fill(new_histogram(0.01, 10.0, 100, log=True, n_categories=n_cat), pt, categories)
+        return counts, moments, hist
+    times['aggregate'], _ = best_time(aggregate, repeat)
+
+    # per-event reductions with each available backend
+    for name in ('numpy', 'numba') if event_kernels.available() else ('numpy',):
+        with module_settings(event_stats, backend=name):
+            # the first call compiles / loads the Numba kernel, timed on its own
+            first, _ = best_time(lambda: event_stats.event_quantities(cols, species=categories), 1)
+            if name == 'numba':
+                times['numba_first'] = first
+            times[f'events_{name}'], _ = best_time(
+                lambda: event_stats.event_quantities(cols, species=categories), repeat)
+    times['plot'], _ = best_time(lambda: plot_spectra(pt, categories, folder), repeat)
+
+    with module_settings(goal3, use_cache=False, precision=precision, max_particles=None), \
+            module_settings(goal4, use_cache=False, precision=precision, max_events=cols['event_id'].size,
+                            sample_mode='head'):
+        times['goal3'], _ = best_time(lambda: goal3.analyse_file(path), repeat)
+        times['goal4'], _ = best_time(lambda: goal4.process_file(path), repeat)
+    return times, pdg.size
+
+
+def precision_check(path: str, precision: str) -> dict:
+    """
+    precision_loss of the goal3 summary of path computed in precision vs float64.
+    """
+    results = {}
+    for mode in ('float64', precision):
+        with module_settings(goal3, use_cache=False, max_particles=None, precision=mode):
+            results[mode] = goal3.analyse_file(path)
+    return precision_loss(results['float64'], results[precision])
+
+
+def run_benchmark(n_events: int, multiplicity: float, mix: dict = None, repeat: int = 3,
+                  seed: int = 0, precision: str = 'float64') -> dict:
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'output-Set0.txt')
+        start = time.perf_counter()
+        size = generate_file(path, n_events, multiplicity, mix, seed=seed)
+        generate_s = time.perf_counter() - start
+        times, n_particles = run_stages(path, repeat, folder, precision)
+        loss = precision_check(path, precision) if precision != 'float64' else None
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'events': n_events,
+        'multiplicity': multiplicity,
+        'mix': mix,
+        'seed': seed,
+        'repeat': repeat,
+        'precision': precision,
+        'precision_loss': loss,
+        'particles': n_particles,
+        'file_bytes': size,
+        'generate_s': generate_s,
+        'stages': {
+            stage: {'seconds': t, 'particles_per_s': n_particles / t if t > 0 else None}
+            for stage, t in times.items()
+        },
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def print_report(report: dict, baseline: dict = None) -> None:
+    print(f"{report['particles']:,} particles in {report['events']:,} events "
+          f"({report['file_bytes'] / (1 << 20):.1f} MiB), best of {report['repeat']}, "
+          f"{report.get('precision', 'float64')}")
+    for stage, entry in report['stages'].items():
+        line = f"  {stage:<12} {entry['seconds']:9.4f} s  {entry['particles_per_s'] or 0:14,.0f} particles/s"
+        if baseline and stage in baseline['stages']:
+            ratio = baseline['stages'][stage]['seconds'] / entry['seconds'] if entry['seconds'] > 0 else float('nan')
+            line += f"  {ratio:5.2f}x vs baseline"
+        print(line)
+    if report.get('precision_loss'):
+        name, rel = worst_loss(report['precision_loss'])
+        print(f"  Precision loss vs float64: worst relative difference {rel:.2e} ({name})")
+    if report['peak_rss_mb'] is not None:
+        print(f"  Peak RSS: {report['peak_rss_mb']:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the particle analysis pipeline on synthetic data.")
+    parser.add_argument("--events", type=int, default=20000, help="Events in the synthetic file.")
+    parser.add_argument("--multiplicity", type=float, default=30.0, help="Mean particles per event.")
+    parser.add_argument("--mix", type=parse_mix, default=None,
+                        help="Species mix, e.g. 'pi+=0.3,pi-=0.3,p=0.1'.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage (best time is kept).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic file.")
+    parser.add_argument("--precision", choices=tuple(PRECISIONS), default='float64',
+                        help="Momentum precision of the array stages.")
+    parser.add_argument("--out", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against.")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.events, args.multiplicity, args.mix, args.repeat, args.seed, args.precision)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
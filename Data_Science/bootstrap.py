@@ -0,0 +1,90 @@
+import hashlib
+import numpy as np
+
+# Bootstrap uncertainties for the π⁺/π⁻ asymmetry from per-batch counts.
+# Batches are resampled with replacement (π⁺ and π⁻ of a batch stay together)
+# for all replicates at once with NumPy indexing; replicates are processed in
+# slices of at most max_cells resampled batches to bound memory.
+
+max_cells = 1 << 22        # replicates x batches drawn per slice
+
+
+def asymmetry(pos, neg):
+    """
+    A = (N+ - N-) / (N+ + N-), NaN where there are no pions at all.
+    """
+    pos = np.asarray(pos, dtype=np.float64)
+    neg = np.asarray(neg, dtype=np.float64)
+    total = pos + neg
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total > 0, (pos - neg) / total, np.nan)
+
+
+def bootstrap_replicates(pos_batches, neg_batches, n_replicates: int = 2000, seed=None) -> np.ndarray:
+    """
+    Asymmetry of n_replicates bootstrap resamples of the batches.
+    seed can be an int, a SeedSequence or a Generator.
+    """
+    pos = np.asarray(pos_batches, dtype=np.int64)
+    neg = np.asarray(neg_batches, dtype=np.int64)
+    n = pos.size
+    if n == 0:
+        return np.full(n_replicates, np.nan)
+    rng = np.random.default_rng(seed)
+    out = np.empty(n_replicates)
+    step = max(1, max_cells // n)
+    for start in range(0, n_replicates, step):
+        stop = min(start + step, n_replicates)
+        pick = rng.integers(0, n, size=(stop - start, n))
+        out[start:stop] = asymmetry(pos[pick].sum(axis=1), neg[pick].sum(axis=1))
+    return out
+
+
+def bootstrap_asymmetry(pos_batches, neg_batches, n_replicates: int = 2000, seed=None,
+                        confidence: float = 0.95) -> dict:
+    """
+    Asymmetry with its bootstrap standard error, percentile confidence
+    interval and significance (A / standard error).
+    """
+    a = float(asymmetry(np.sum(pos_batches), np.sum(neg_batches)))
+    reps = bootstrap_replicates(pos_batches, neg_batches, n_replicates, seed)
+    reps = reps[np.isfinite(reps)]
+    if reps.size < 2:
+        return {'asym': a, 'asym_err': float('nan'), 'ci_low': float('nan'),
+                'ci_high': float('nan'), 'significance': float('nan'), 'confidence': confidence}
+    err = float(reps.std(ddof=1))
+    tail = (1.0 - confidence) / 2
+    low, high = np.quantile(reps, [tail, 1.0 - tail])
+    return {
+        'asym': a,
+        'asym_err': err,
+        'ci_low': float(low),
+        'ci_high': float(high),
+        'significance': a / err if err > 0 else float('inf'),
+        'confidence': confidence,
+    }
+
+
+def bootstrap_job(task: tuple) -> dict:
+    """
+    Process-pool entry point: task is (pos_batches, neg_batches, n_replicates, seed).
+    """
+    pos_batches, neg_batches, n_replicates, seed = task
+    return bootstrap_asymmetry(pos_batches, neg_batches, n_replicates, seed)
+
+
+def file_seeds(seed, n_files: int) -> list:
+    """
+    Independent, reproducible seeds for n_files files (independent of the
+    order in which workers pick them up).
+    """
+    return np.random.SeedSequence(seed).spawn(n_files)
+
+
+def name_seed(seed, name: str):
+    """
+    Reproducible seed for the file called name (e.g. its path relative to the
+    data folder), independent of which other files are analysed with it.
+    """
+    digest = int.from_bytes(hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest(), 'little')
+    return np.random.SeedSequence(digest if seed is None else [seed, digest])
@@ -0,0 +1,234 @@
+import argparse
+import concurrent.futures
+import glob
+import hashlib
+import json
+import os
+import goal4
+from bootstrap import name_seed
+from results_store import fingerprint, load_store, save_store, lookup, record
+from plotting import new_plotter, submit_plot, close_plotter
+from shared_arrays import start_tracker
+
+# Manifest-driven goal4 campaigns, sharded over machines sharing a filesystem.
+#   python campaign.py run --glob 'data_science/output-Set*.txt' --shard 0/4 --out campaign/
+#   python campaign.py run --manifest files.txt --shard 1/4 --out campaign/
+#   python campaign.py reduce --manifest files.txt --out campaign/
+# Every file is known by its key, its path relative to the manifest folder
+# or to the fixed part of the glob pattern ('output-Set3.txt' for
+# data_science/output-*.txt), so it does not matter whether a node spells
+# the paths relative or absolute. A file belongs to shard hash(key) % N and
+# its bootstrap seed comes from the key as well: neither depends on the
+# order of the manifest or on the other files in it, so every node can
+# work out its share alone and results do not depend on the sharding.
+# Each shard writes campaign/shard-<i>-of-<N>.json, a results_store file of
+# goal4 summaries (the key is part of their config): rerunning a shard only
+# analyses new or changed files, and reduce merges all shard files into
+# goal4's per-file tables and plots.
+# The analysis settings are goal4's module settings.
+
+SHARD_FILE = 'shard-{index}-of-{count}.json'
+RESULTS_FILE = 'campaign_results.json'
+
+
+def read_manifest(path: str) -> list:
+    """
+    Data files listed in a manifest, one per line ('#' starts a comment).
+    Relative paths are taken relative to the manifest.
+    """
+    folder = os.path.dirname(path)
+    files = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                files.append(line if os.path.isabs(line) else os.path.normpath(os.path.join(folder, line)))
+    return files
+
+
+def glob_root(pattern: str) -> str:
+    """
+    The folder part of a glob pattern before its first wildcard.
+    """
+    parts = os.path.normpath(pattern).split(os.sep)
+    fixed = []
+    for part in parts[:-1]:
+        if glob.has_magic(part):
+            break
+        fixed.append(part)
+    return os.sep.join(fixed) or ('.' if parts[0] else os.sep)
+
+
+def file_key(path: str, root: str) -> str:
+    return os.path.relpath(os.path.abspath(path), os.path.abspath(root)).replace(os.sep, '/')
+
+
+def campaign_files(manifest: str = None, patterns=()) -> dict:
+    """
+    {key: path} of the files of a manifest and / or glob patterns, sorted by key.
+    """
+    found = []
+    if manifest:
+        root = os.path.dirname(manifest)
+        found += [(file_key(path, root), path) for path in read_manifest(manifest)]
+    for pattern in patterns:
+        root = glob_root(pattern)
+        found += [(file_key(path, root), os.path.normpath(path)) for path in glob.glob(pattern)]
+    files = {}
+    for key, path in sorted(found):
+        known = files.setdefault(key, path)
+        if os.path.abspath(known) != os.path.abspath(path):
+            raise ValueError(f"Two files share the campaign key {key!r}: {known} and {path}")
+    return files
+
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """
+    'i/N' -> (i, N) with 0 <= i < N.
+    """
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like i/N, got {text!r}") from None
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must be in 0..{count - 1}, got {index}")
+    return index, count
+
+
+def shard_of(key: str, n_shards: int) -> int:
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % n_shards
+
+
+def shard_files(files: dict, index: int, count: int) -> dict:
+    return {key: path for key, path in files.items() if shard_of(key, count) == index}
+
+
+def file_config(config: dict, key: str) -> dict:
+    """
+    Store config of one file: goal4's settings plus the key its seed comes from.
+    """
+    return dict(config, file_key=key)
+
+
+def shard_path(out: str, index: int, count: int) -> str:
+    return os.path.join(out, SHARD_FILE.format(index=index, count=count))
+
+
+def run_shard(files: dict, index: int, count: int, out: str, workers: int = None) -> dict:
+    """
+    Analyse the files of one shard with goal4 and store their summaries in
+    the shard file. Returns {'files', 'analysed', 'cached', 'missing', 'store'}.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(out, exist_ok=True)
+    mine = shard_files(files, index, count)
+    store_path = shard_path(out, index, count)
+    store = load_store(store_path)
+    config = goal4.analysis_config()
+    todo, fps, missing = [], {}, []
+    for key, path in mine.items():
+        fps[key] = fingerprint(path)
+        if fps[key] is None:
+            missing.append(path)
+        elif lookup(store, path, file_config(config, key), fps[key]) is None:
+            todo.append(key)
+    if todo:
+        if goal4.shared_results:
+            start_tracker()
+        seeds = [name_seed(goal4.bootstrap_seed, key) for key in todo]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as exe:
+            summaries = goal4.analyse_files([mine[key] for key in todo], seeds, exe, workers,
+                                            new_plotter(enabled=False))
+        for key, summary in zip(todo, summaries):
+            summary.pop('run', None)
+            record(store, mine[key], file_config(config, key), summary, fps[key])
+        save_store(store, store_path)
+    return {'files': len(mine), 'analysed': len(todo), 'cached': len(mine) - len(todo) - len(missing),
+            'missing': missing, 'store': store_path}
+
+
+def merge_shards(out: str, files: dict = None) -> tuple[list, list]:
+    """
+    (summaries, missing files) from all shard files in out, matched by key.
+    Only summaries computed with the current goal4 settings count, the most
+    recently written shard file wins. With files ({key: path}), the result
+    follows their order and lists the files no shard has a summary for.
+    """
+    config = goal4.analysis_config()
+    merged = {}
+    store_paths = glob.glob(os.path.join(out, SHARD_FILE.format(index='*', count='*')))
+    for store_path in sorted(store_paths, key=os.path.getmtime, reverse=True):
+        for entry in load_store(store_path)['files'].values():
+            key = entry['config'].get('file_key')
+            if key is not None and entry['config'] == file_config(config, key):
+                merged.setdefault(key, entry['result'])
+    if files is None:
+        return [merged[key] for key in sorted(merged)], []
+    summaries = [merged[key] for key in files if key in merged]
+    missing = [path for key, path in files.items() if key not in merged]
+    return summaries, missing
+
+
+def reduce_shards(out: str, files: dict = None, plots: bool = None) -> list:
+    """
+    Print goal4's per-file tables for the merged shards, render its plots
+    and write all summaries to out/campaign_results.json.
+    """
+    summaries, missing = merge_shards(out, files)
+    plotter = new_plotter(plots)
+    for summary in summaries:
+        goal4.print_summary(summary)
+        submit_plot(plotter, goal4.plot_batches, summary)
+        submit_plot(plotter, goal4.plot_events, summary)
+    close_plotter(plotter)
+    results_path = os.path.join(out, RESULTS_FILE)
+    with open(results_path, 'w') as f:
+        json.dump(summaries, f, indent=1)
+    print(f"\nMerged {len(summaries)} files into {results_path}")
+    if missing:
+        print(f"No results yet for {len(missing)} files: " + ", ".join(missing[:10])
+              + (" ..." if len(missing) > 10 else ""))
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run goal4 over a manifest of files, sharded across machines.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('run', "Analyse one shard of the campaign."),
+                            ('list', "Print the files of one shard."),
+                            ('reduce', "Merge the shard results into goal4's tables and plots.")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("--manifest", help="File listing one data file per line.")
+        cmd.add_argument("--glob", action='append', default=[], help="Glob pattern of data files (repeatable).")
+        cmd.add_argument("--out", default='campaign', help="Folder of the shard result files.")
+        if name != 'reduce':
+            cmd.add_argument("--shard", type=parse_shard, default=(0, 1), help="Shard i/N to process (default 0/1).")
+        if name == 'run':
+            cmd.add_argument("--workers", type=int, help="Worker processes (default: one per CPU core).")
+        if name == 'reduce':
+            cmd.add_argument("--no-plots", action='store_true', help="Skip the per-file plots.")
+    args = parser.parse_args()
+
+    try:
+        files = campaign_files(args.manifest, args.glob)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.command == 'reduce':
+        reduce_shards(args.out, files or None, False if args.no_plots else None)
+        return
+    if not files:
+        parser.error("no input files (use --manifest and / or --glob)")
+    index, count = args.shard
+    if args.command == 'list':
+        print("\n".join(shard_files(files, index, count).values()))
+        return
+    stats = run_shard(files, index, count, args.out, args.workers)
+    print(f"Shard {index}/{count}: {stats['files']} of {len(files)} files, {stats['analysed']} analysed, "
+          f"{stats['cached']} unchanged -> {stats['store']}")
+    if stats['missing']:
+        print(f"Missing files: {', '.join(stats['missing'])}")
+
+
+if __name__ == '__main__':
+    main()
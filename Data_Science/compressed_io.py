@@ -0,0 +1,259 @@
+import concurrent.futures
+import gzip
+import io
+import mmap
+import os
+import struct
+import zlib
+
+# Transparent reading of compressed particle files.
+# output-SetN.txt.gz / .zst / .lz4 are decompressed on the fly, never to disk.
+# Files made of many independent frames (zstd or lz4 frames, BGZF gzip
+# members, e.g. from compress_file below or `bgzip`) are located by walking
+# the frame headers and decompressed in parallel worker processes, in order.
+# zstd and lz4 need the optional zstandard / lz4 packages.
+
+decompress_workers = 1     # Processes for multi-frame files (1 = stream in this process)
+task_bytes = 1 << 22       # Compressed bytes per decompression task (4 MiB)
+
+COMPRESSION = {'.gz': 'gzip', '.zst': 'zstd', '.lz4': 'lz4'}
+
+ZSTD_MAGIC = 0xFD2FB528
+LZ4_MAGIC = 0x184D2204
+BGZF_BLOCK = 65280         # Input bytes per BGZF member, as in bgzip
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+def compression_of(path: str):
+    """
+    'gzip', 'zstd', 'lz4' or None, from the file extension.
+    """
+    return COMPRESSION.get(os.path.splitext(path)[1].lower())
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Reading .zst files needs the zstandard package (pip install zstandard)") from None
+    return zstandard
+
+
+def _lz4():
+    try:
+        import lz4.frame
+    except ImportError:
+        raise ImportError("Reading .lz4 files needs the lz4 package (pip install lz4)") from None
+    return lz4.frame
+
+
+def open_binary(path: str):
+    """
+    Binary file object with the decompressed contents of path.
+    """
+    kind = compression_of(path)
+    if kind == 'gzip':
+        return gzip.open(path, 'rb')
+    if kind == 'zstd':
+        f = open(path, 'rb')
+        return _zstd().ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=True)
+    if kind == 'lz4':
+        return _lz4().open(path, 'rb')
+    return open(path, 'rb')
+
+
+def open_text(path: str):
+    """
+    Drop-in for open(path, 'r') that also reads compressed files.
+    """
+    if compression_of(path) is None:
+        return open(path, 'r')
+    return io.TextIOWrapper(open_binary(path))
+
+
+def _skippable(magic: int) -> bool:
+    return magic & 0xFFFFFFF0 == 0x184D2A50
+
+
+def _zstd_frame_end(buf, pos: int) -> int:
+    descriptor = buf[pos + 4]
+    fcs_flag = descriptor >> 6
+    single_segment = descriptor >> 5 & 1
+    end = pos + 5 + (0 if single_segment else 1)
+    end += (0, 1, 2, 4)[descriptor & 3]
+    end += (single_segment, 2, 4, 8)[fcs_flag]
+    while True:
+        if end + 3 > len(buf):
+            raise ValueError("Corrupt zstd frame")
+        header = int.from_bytes(buf[end:end + 3], 'little')
+        block_type = header >> 1 & 3
+        if block_type == 3:
+            raise ValueError("Corrupt zstd frame")
+        end += 3 + (1 if block_type == 1 else header >> 3)
+        if header & 1:
+            break
+    return end + (4 if descriptor & 4 else 0)
+
+
+def _lz4_frame_end(buf, pos: int) -> int:
+    flags = buf[pos + 4]
+    block_checksum = flags >> 4 & 1
+    end = pos + 7 + (8 if flags & 8 else 0) + (4 if flags & 1 else 0)
+    while True:
+        if end + 4 > len(buf):
+            raise ValueError("Corrupt lz4 frame")
+        size = int.from_bytes(buf[end:end + 4], 'little')
+        end += 4
+        if size == 0:
+            break
+        end += (size & 0x7FFFFFFF) + 4 * block_checksum
+    return end + (4 if flags & 4 else 0)
+
+
+def _bgzf_size(buf, pos: int):
+    """
+    Total size of the BGZF member at pos, None for a plain gzip member.
+    """
+    if buf[pos + 3] & 4 == 0:
+        return None
+    xlen = int.from_bytes(buf[pos + 10:pos + 12], 'little')
+    field = pos + 12
+    while field < pos + 12 + xlen:
+        slen = int.from_bytes(buf[field + 2:field + 4], 'little')
+        if buf[field:field + 2] == b'BC' and slen == 2:
+            return int.from_bytes(buf[field + 4:field + 6], 'little') + 1
+        field += 4 + slen
+    return None
+
+
+def frame_spans(path: str):
+    """
+    (offset, length) of every independently decompressible frame of path,
+    or None when the file is not splittable (plain text, single gzip stream).
+    """
+    kind = compression_of(path)
+    if kind is None or os.path.getsize(path) == 0:
+        return None
+    spans = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        pos = 0
+        while pos < len(buf):
+            if kind == 'gzip':
+                size = _bgzf_size(buf, pos)
+                if size is None:
+                    return None
+                end = pos + size
+            else:
+                magic = int.from_bytes(buf[pos:pos + 4], 'little')
+                if _skippable(magic):
+                    # zstd seek tables and other metadata frames
+                    pos += 8 + int.from_bytes(buf[pos + 4:pos + 8], 'little')
+                    continue
+                if kind == 'zstd' and magic == ZSTD_MAGIC:
+                    end = _zstd_frame_end(buf, pos)
+                elif kind == 'lz4' and magic == LZ4_MAGIC:
+                    end = _lz4_frame_end(buf, pos)
+                else:
+                    raise ValueError(f"Unknown {kind} frame at byte {pos} of {path}")
+            spans.append((pos, end - pos))
+            pos = end
+    return spans
+
+
+def _group_spans(spans: list) -> list:
+    """
+    Merge neighbouring frames into tasks of about task_bytes compressed bytes.
+    """
+    groups, current, size = [], [], 0
+    for span in spans:
+        current.append(span)
+        size += span[1]
+        if size >= task_bytes:
+            groups.append(current)
+            current, size = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+
+def decompress_frames(task: tuple) -> bytes:
+    """
+    Worker entry point: task is (path, [(offset, length), ...]).
+    """
+    path, spans = task
+    kind = compression_of(path)
+    out = []
+    with open(path, 'rb') as f:
+        for offset, length in spans:
+            f.seek(offset)
+            data = f.read(length)
+            if kind == 'gzip':
+                out.append(gzip.decompress(data))
+            elif kind == 'zstd':
+                out.append(_zstd().ZstdDecompressor().decompressobj().decompress(data))
+            else:
+                out.append(_lz4().decompress(data))
+    return b''.join(out)
+
+
+def iter_chunks(path: str, size: int, workers: int = None):
+    """
+    Yield the decompressed contents of path as consecutive byte chunks
+    (about size bytes each when streaming).
+    """
+    workers = workers or decompress_workers
+    spans = frame_spans(path) if workers > 1 else None
+    if spans and len(spans) > 1:
+        tasks = [(path, group) for group in _group_spans(spans)]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as exe:
+            # keep at most 2 tasks per worker in flight
+            pending = []
+            queue = iter(tasks)
+            for task in queue:
+                pending.append(exe.submit(decompress_frames, task))
+                if len(pending) >= 2 * workers:
+                    break
+            while pending:
+                chunk = pending.pop(0).result()
+                for task in queue:
+                    pending.append(exe.submit(decompress_frames, task))
+                    break
+                yield chunk
+        return
+    with open_binary(path) as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def compress_file(src: str, dst: str, frame_size: int = 1 << 22, level: int = 3) -> str:
+    """
+    Compress src into dst (.gz, .zst or .lz4) as independent frames of
+    frame_size input bytes, so the result can be decompressed in parallel.
+    gzip output is BGZF (fixed 64 KiB members) and stays readable by gzip.
+    """
+    kind = compression_of(dst)
+    if kind is None:
+        raise ValueError(f"Unknown compression for {dst}")
+    step = BGZF_BLOCK if kind == 'gzip' else frame_size
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        while True:
+            data = fin.read(step)
+            if not data:
+                break
+            if kind == 'gzip':
+                packer = zlib.compressobj(level, zlib.DEFLATED, -15)
+                body = packer.compress(data) + packer.flush()
+                fout.write(b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00')
+                fout.write(struct.pack('<H', len(body) + 25))
+                fout.write(body)
+                fout.write(struct.pack('<II', zlib.crc32(data), len(data)))
+            elif kind == 'zstd':
+                fout.write(_zstd().ZstdCompressor(level=level).compress(data))
+            else:
+                fout.write(_lz4().compress(data, compression_level=level))
+        if kind == 'gzip':
+            fout.write(BGZF_EOF)
+    return dst
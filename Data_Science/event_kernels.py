@@ -0,0 +1,73 @@
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Numba kernel for the per-event reductions of event_stats.
+# One compiled pass over the particles of every event yields all columns
+# of event_stats.event_quantities (π⁺ / π⁻ counts, ΣpT, max p) instead of
+# one NumPy reduceat per quantity plus full-length pT / p temporaries.
+# ΣpT is a plain running sum, so it is NOT bit-identical to NumPy's
+# pairwise sum: the two agree to rounding (well within 1e-12 relative for
+# realistic multiplicities). All other columns are identical.
+# Opt-in through event_stats.backend = 'numba': on 240k particles it is no
+# faster than the NumPy path (both about 0.013 s) and every new process
+# pays for the compile (about 2.5 s cold, 0.35 s from the on-disk cache),
+# which each goal4 worker would. benchmark.py reports both backends.
+# Needs the optional numba package; event_stats falls back to NumPy without it.
+
+
+def available() -> bool:
+    return numba is not None
+
+
+def _event_loop(px, py, pz, species, offsets, pos_code, neg_code):
+    n_events = offsets.size - 1
+    n_pos = np.zeros(n_events, dtype=np.int64)
+    n_neg = np.zeros(n_events, dtype=np.int64)
+    sum_pt = np.zeros(n_events, dtype=np.float64)
+    max_p = np.full(n_events, np.nan, dtype=np.float64)
+    for e in range(n_events):
+        start, stop = offsets[e], offsets[e + 1]
+        if stop <= start:
+            continue
+        pos = neg = 0
+        total = 0.0
+        p_max = np.nan
+        for i in range(start, stop):
+            code = species[i]
+            pos += code == pos_code
+            neg += code == neg_code
+            pt = np.hypot(px[i], py[i])
+            total += pt
+            p = np.hypot(pt, pz[i])
+            # same NaN propagation as np.maximum
+            if i == start:
+                p_max = p
+            elif p_max == p_max and not p <= p_max:
+                p_max = p
+        n_pos[e] = pos
+        n_neg[e] = neg
+        sum_pt[e] = total
+        max_p[e] = p_max
+    return n_pos, n_neg, sum_pt, max_p
+
+
+if numba is not None:
+    _event_loop = numba.njit(cache=True)(_event_loop)
+
+
+def event_columns(px, py, pz, species, offsets, pos_code: int, neg_code: int) -> dict:
+    """
+    n_pos, n_neg, sum_pt and max_p per event segment offsets[i]:offsets[i+1]
+    (the event_stats segment reductions of float64 momenta; sum_pt is not
+    bit-identical, it agrees to rounding). Raises ImportError without numba.
+    """
+    if numba is None:
+        raise ImportError("The numba backend needs the numba package (pip install numba)")
+    px, py, pz = (np.asarray(a, dtype=np.float64) for a in (px, py, pz))
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n_pos, n_neg, sum_pt, max_p = _event_loop(px, py, pz, np.asarray(species), offsets, pos_code, neg_code)
+    return {'n_pos': n_pos, 'n_neg': n_neg, 'sum_pt': sum_pt, 'max_p': max_p}
@@ -0,0 +1,171 @@
+import math
+import numpy as np
+from particle_species import DEFAULT_CLASSIFIER, category, classify
+from kinematics import SPECIES_MASS
+from histograms import fill, in_range, bin_centers
+from pairs import segment_members, product_pairs, pair_observables
+
+# Mixed-event (combinatorial) background for the pair observables of pairs.py.
+# Particles of different events cannot come from one decay, so pairing an
+# event with earlier events of similar multiplicity gives the shape of the
+# uncorrelated background under the same-event spectrum.
+# The pool keeps, per multiplicity bin, the first / second species momenta of
+# the last mix_depth events (the oldest are dropped as new ones arrive, like
+# a ring buffer). A block is mixed bin by bin: its events are appended to
+# the pooled ones and every event is paired with the mix_depth events before
+# it, all (event, partner) combinations at once through pairs.product_pairs.
+# The pool belongs to one file, so files can be mixed in parallel.
+
+mix_depth = 5              # Earlier events of the same multiplicity bin every event is mixed with
+# Multiplicity bin edges (particles per event); the last bin is open-ended
+multiplicity_edges = (0, 10, 20, 30, 40, 60, 100)
+
+
+def new_pool(depth: int = None, edges=None) -> dict:
+    return {
+        'depth': depth or mix_depth,
+        'edges': np.asarray(multiplicity_edges if edges is None else edges),
+        'bins': {},
+    }
+
+
+def _ranges(start, count) -> np.ndarray:
+    """
+    Concatenation of arange(start[i], start[i] + count[i]) for all i.
+    """
+    count = np.asarray(count, dtype=np.int64)
+    first = np.zeros(count.size, dtype=np.int64)
+    np.cumsum(count[:-1], out=first[1:])
+    return np.arange(int(count.sum()), dtype=np.int64) + np.repeat(np.asarray(start, dtype=np.int64) - first, count)
+
+
+def _event_list(cols: dict, index, start, count) -> dict:
+    """
+    Momenta of the particles index[start[i]:start[i] + count[i]] of every
+    selected event i, as {'px', 'py', 'pz', 'offsets'}.
+    """
+    particles = index[_ranges(start, count)]
+    offsets = np.zeros(len(count) + 1, dtype=np.int64)
+    np.cumsum(count, out=offsets[1:])
+    return {'px': cols['px'][particles], 'py': cols['py'][particles], 'pz': cols['pz'][particles],
+            'offsets': offsets}
+
+
+def _last_events(events: dict, n: int) -> dict:
+    """
+    The last n events of an event list.
+    """
+    offsets = events['offsets']
+    n = min(n, offsets.size - 1)
+    first = offsets[-1 - n]
+    return {'px': events['px'][first:], 'py': events['py'][first:], 'pz': events['pz'][first:],
+            'offsets': offsets[-1 - n:] - first}
+
+
+def _append_events(a: dict, b: dict) -> dict:
+    if a is None:
+        return b
+    events = {name: np.concatenate([a[name], b[name]]) for name in ('px', 'py', 'pz')}
+    events['offsets'] = np.concatenate([a['offsets'], b['offsets'][1:] + a['offsets'][-1]])
+    return events
+
+
+def _momenta(events: dict, index) -> tuple:
+    return events['px'][index], events['py'][index], events['pz'][index]
+
+
+def _mixed(a: dict, a_events, b: dict, b_events, mass_a: float, mass_b: float, chunk, observables):
+    """
+    Pair observables of a-particles of a_events[k] x b-particles of b_events[k].
+    """
+    a_start, b_start = a['offsets'][a_events], b['offsets'][b_events]
+    a_count = a['offsets'][a_events + 1] - a_start
+    b_count = b['offsets'][b_events + 1] - b_start
+    for _, i, j in product_pairs(a_start, a_count, b_start, b_count, chunk):
+        yield pair_observables(_momenta(a, i), _momenta(b, j), mass_a, mass_b, observables)
+
+
+def iter_mixed_pairs(pool: dict, cols: dict, first: str = 'pi+', second: str = 'pi-', species=None,
+                     classifier: dict = None, chunk: int = None, observables=None):
+    """
+    Yield observables of mixed-event pairs for the events of cols, each
+    mixed with the pool.depth previous events of its multiplicity bin (from
+    this block or the pool), then leave the newest events in the pool.
+    Unlike species are mixed both ways (first of the event x second of the
+    partner and the reverse); like-sign pairs once.
+    """
+    classifier = DEFAULT_CLASSIFIER if classifier is None else classifier
+    if species is None:
+        species = classify(cols['pdg'], classifier)
+    depth = pool['depth']
+    offsets = cols['event_offsets']
+    multiplicity_bin = np.searchsorted(pool['edges'], np.diff(offsets), side='right') - 1
+    first_idx = np.flatnonzero(species == category(first, classifier))
+    second_idx = first_idx if second == first else np.flatnonzero(species == category(second, classifier))
+    first_start, n_first = segment_members(first_idx, offsets)
+    second_start, n_second = segment_members(second_idx, offsets)
+    mass_a, mass_b = SPECIES_MASS[first], SPECIES_MASS[second]
+
+    for b in np.unique(multiplicity_bin):
+        events = np.flatnonzero(multiplicity_bin == b)
+        old = pool['bins'].get(int(b))
+        n_old = old['first']['offsets'].size - 1 if old else 0
+        seq_first = _append_events(old and old['first'],
+                                   _event_list(cols, first_idx, first_start[events], n_first[events]))
+        seq_second = seq_first if second == first else _append_events(
+            old and old['second'], _event_list(cols, second_idx, second_start[events], n_second[events]))
+        # event s of the sequence is mixed with its partners s-1 .. s-depth
+        s = np.arange(n_old, n_old + events.size)
+        n_partners = np.minimum(s, depth)
+        event = np.repeat(s, n_partners)
+        partner = event - 1 - (_ranges(np.zeros_like(s), n_partners))
+        yield from _mixed(seq_first, event, seq_second, partner, mass_a, mass_b, chunk, observables)
+        if second != first:
+            yield from _mixed(seq_first, partner, seq_second, event, mass_a, mass_b, chunk, observables)
+        pool['bins'][int(b)] = {'first': _last_events(seq_first, depth),
+                                'second': _last_events(seq_second, depth)}
+
+
+def fill_mixed(hists: dict, pool: dict, cols: dict, first: str = 'pi+', second: str = 'pi-',
+               species=None, classifier: dict = None) -> int:
+    """
+    Fill every histogram of hists (keyed by observable) with mixed-event
+    pairs of cols; returns the number of pairs.
+    """
+    n_pairs = 0
+    observables = tuple(hists)
+    for pairs in iter_mixed_pairs(pool, cols, first, second, species, classifier, observables=observables):
+        for name, hist in hists.items():
+            fill(hist, pairs[name])
+        n_pairs += pairs[observables[0]].size
+    return n_pairs
+
+
+def _window(hist: dict, window) -> int:
+    centers = bin_centers(hist)
+    inside = (centers >= window[0]) & (centers < window[1])
+    return int(in_range(hist)[0][inside].sum())
+
+
+def background_excess(same: dict, mixed: dict, signal_window, norm_window) -> dict:
+    """
+    Excess of the same-event spectrum over the mixed-event background in
+    signal_window, with the mixed spectrum scaled to the same-event one in
+    norm_window (a region without resonances). Poisson uncertainties.
+    """
+    same_norm, mixed_norm = _window(same, norm_window), _window(mixed, norm_window)
+    scale = same_norm / mixed_norm if mixed_norm else 0.0
+    same_signal, mixed_signal = _window(same, signal_window), _window(mixed, signal_window)
+    background = scale * mixed_signal
+    excess = same_signal - background
+    # the scale factor itself carries the uncertainty of both normalisation counts
+    scale_rel2 = (1 / same_norm + 1 / mixed_norm) if same_norm and mixed_norm else 0.0
+    unc = math.sqrt(same_signal + scale * scale * mixed_signal + background * background * scale_rel2)
+    return {
+        'same': same_signal,
+        'background': background,
+        'scale': scale,
+        'excess': excess,
+        'excess_unc': unc,
+        'significance': excess / unc if unc else 0.0,
+    }
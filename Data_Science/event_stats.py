@@ -0,0 +1,91 @@
+import warnings
+import numpy as np
+from particle_species import DEFAULT_CLASSIFIER, category, classify
+from kinematics import transverse_momentum, momentum
+import event_kernels
+
+# Per-event quantities as segment reductions over event_offsets.
+# Particles of event i are cols[...][offsets[i]:offsets[i+1]], so a sum, max
+# or count per event is one ufunc.reduceat over the particle arrays instead
+# of a Python loop over events and their particle lines.
+# np.ufunc.reduceat returns values[start] for an empty segment; the helpers
+# below only reduce over non-empty events and fill empty ones with `empty`.
+# backend = 'numba' runs the fused per-event kernel of event_kernels
+# instead (opt-in: not faster here and compiled in every new process).
+# Its sum_pt is a sequential sum and NOT bit-identical to the pairwise
+# NumPy sum (equal to rounding). Without numba installed it falls back to
+# the NumPy path with a RuntimeWarning.
+
+backend = 'numpy'          # 'numpy' or 'numba' (needs numba, see event_kernels)
+
+
+def segment_reduce(ufunc, values, offsets, empty=0):
+    """
+    ufunc.reduce of values over every event segment offsets[i]:offsets[i+1].
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    values = np.asarray(values)
+    n_events = offsets.size - 1
+    dtype = np.result_type(values.dtype, np.min_scalar_type(empty)) if n_events else values.dtype
+    out = np.full(n_events, empty, dtype=dtype)
+    full = np.flatnonzero(offsets[1:] > offsets[:-1])
+    if full.size:
+        first = offsets[0]
+        # empty events in between have zero width and drop out of reduceat
+        out[full] = ufunc.reduceat(values[first:offsets[-1]], offsets[full] - first)
+    return out
+
+
+def segment_sum(values, offsets) -> np.ndarray:
+    return segment_reduce(np.add, values, offsets, 0)
+
+
+def segment_max(values, offsets, empty=np.nan) -> np.ndarray:
+    return segment_reduce(np.maximum, values, offsets, empty)
+
+
+def segment_count(mask, offsets) -> np.ndarray:
+    """
+    Number of True entries of a particle mask per event.
+    """
+    return segment_sum(np.asarray(mask, dtype=np.int64), offsets)
+
+
+def event_quantities(cols: dict, classifier: dict = None, species=None) -> dict:
+    """
+    Per-event arrays of a column dict: event_id, multiplicity, n_pos / n_neg
+    (π⁺ / π⁻), sum_pt and max_p (NaN for events without particles).
+    species can pass already classified particles.
+    With backend = 'numba', sum_pt only agrees with the NumPy backend to
+    rounding; if numba is missing the NumPy backend is used.
+    """
+    classifier = DEFAULT_CLASSIFIER if classifier is None else classifier
+    offsets = cols['event_offsets']
+    if species is None:
+        species = classify(cols['pdg'], classifier)
+    if backend == 'numba' and event_kernels.available():
+        kernel = event_kernels.event_columns(cols['px'], cols['py'], cols['pz'], species, offsets,
+                                             category('pi+', classifier), category('pi-', classifier))
+        return {'event_id': cols['event_id'], 'multiplicity': np.diff(offsets), **kernel}
+    if backend == 'numba':
+        warnings.warn("numba is not installed, using the NumPy backend", RuntimeWarning, stacklevel=2)
+    pt = transverse_momentum(cols['px'], cols['py'])
+    p = momentum(cols['px'], cols['py'], cols['pz'], pt=pt)
+    return {
+        'event_id': cols['event_id'],
+        'multiplicity': np.diff(offsets),
+        'n_pos': segment_count(species == category('pi+', classifier), offsets),
+        'n_neg': segment_count(species == category('pi-', classifier), offsets),
+        'sum_pt': segment_sum(pt, offsets),
+        'max_p': segment_max(p, offsets),
+    }
+
+
+def batch_sums(per_event, batch_size: int) -> np.ndarray:
+    """
+    Sums over consecutive batches of batch_size events (last one may be partial).
+    """
+    per_event = np.asarray(per_event)
+    if per_event.size == 0:
+        return np.zeros(0, dtype=per_event.dtype)
+    return np.add.reduceat(per_event, np.arange(0, per_event.size, batch_size))
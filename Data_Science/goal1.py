@@ -1,4 +1,5 @@
 import math
+from compressed_io import open_text
 
 def calculate_p(px, py, pz):    #This function calculates the momentum of a particle given its components.
     # expects px, py, pz as arguments
@@ -13,9 +14,9 @@ def calculate_pseudorapidity(pz, p):               #pseudorapidity is the n with
     theta = math.acos(pz / p)
     return -math.log(math.tan(theta / 2))
 
-def calculate_azimuthal_angle():
-    pass      #solve if you finish early
+def calculate_azimuthal_angle(px, py):    #azimuthal angle phi in the transverse plane, in (-pi, pi]
     # expects px, py as arguments
+    return math.atan2(py, px)
 
 def check_type(pdg_code):      #this function checks the type of particle based on the pdg code
     if pdg_code == 211:
@@ -31,7 +32,7 @@ def check_type(pdg_code):      #this function checks the type of particle based
 
 # Open the input file
 # Deschide fișierul de intrare
-with open("data_science/output-Set0.txt", 'r') as infile:
+with open_text("data_science/output-Set0.txt") as infile:
     first_line = infile.readline().strip()
     event_id, num_particles = map(int, first_line.split())
     lines_list = [line.strip().split() for line in infile]
@@ -51,3 +52,4 @@ for i in range(num_particles):
     p=calculate_p(px, py, pz)
     print("Pseudorapidity:", calculate_pseudorapidity(pz, p))
     print("pT:", calculate_pT (px, py))
+    print("Azimuthal angle:", calculate_azimuthal_angle(px, py))
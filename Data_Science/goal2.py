@@ -1,6 +1,8 @@
 import math
 import matplotlib.pyplot as plt
 import numpy as np
+from bootstrap import bootstrap_asymmetry
+from compressed_io import open_text
 
 threshold = 0.05
 
@@ -48,7 +50,7 @@ poz_per_batch = []
 neg_per_batch = []
 
 try:
-    with open("data_science/output-Set1.txt", 'r') as infile:
+    with open_text("data_science/output-Set1.txt") as infile:
         first_line = infile.readline().strip()
         event_id, num_particles = first_line.split()[:2]
         event_id = int(event_id)
@@ -113,6 +115,12 @@ if sig > threshold:
 else:
     print("The significance is not large compared to the threshold.")
 
+# Bootstrap the batch counts for a confidence interval on the asymmetry
+boot = bootstrap_asymmetry(poz_per_batch, neg_per_batch, n_replicates=2000, seed=2025)
+print(f"The pion asymmetry is {boot['asym']:.4f} ± {boot['asym_err']:.4f} "
+      f"({boot['confidence']:.0%} CI [{boot['ci_low']:.4f}, {boot['ci_high']:.4f}])")
+print(f"The bootstrap significance is {boot['significance']:.2f}")
+
 # Plotting
 plt.figure(figsize=(10,6))
 plt.plot([i*batch_size for i in range(num_batches)], poz_per_batch, label="Positive pions", color="Blue")
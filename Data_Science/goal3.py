@@ -1,6 +1,18 @@
 import math
 import time
-import matplotlib.pyplot as plt
+from particle_reader import read_particles, new_error_report, error_summary
+from particle_cache import load_particles
+from kinematics import transverse_momentum, momentum
+from particle_species import species_counts, classify
+from job_pool import run_ordered
+from precision import momentum_dtype, as_precision, total
+from pairs import PAIR_BINS, new_pair_histograms, fill_pairs
+from event_mixing import new_pool, fill_mixed, background_excess
+from instrumentation import (new_run, recording, stage, count, merge_runs, run_report, write_report,
+                             print_stages)
+from selection import select
+from plotting import line_plot, new_plotter, submit_plot, close_plotter
+from results_store import load_store, save_store, split_cached, record
 
 # Calculates average and statistical uncertainty
 def calculate_average_and_uncertainty(total, count):
@@ -10,16 +22,10 @@ def calculate_average_and_uncertainty(total, count):
     uncertainty = math.sqrt(total) / count if count > 0 else 0
     return avg, uncertainty
 
-# Determines particle type based on PDG code (1 for positive pion, -1 for negative pion, 0 otherwise)
-def check_type(pdg_code):
-    if pdg_code == 211:
-        return 1
-    elif pdg_code == -211:
-        return -1
-    else:
-        return 0
-
 batch_size = 1000
+use_cache = True  # Keep a binary .npcache sidecar next to each data file
+selection = None  # Particle cut, e.g. "pT > 0.5 and abs(eta) < 2.4" (see selection.py)
+precision = 'float64'  # 'float32' keeps px, py, pz in float32 (half the memory traffic, sums stay float64)
 max_particles = 10000000  # Limit to first 50000 particles per file
 file_paths = [
     "data_science/output-Set0.txt",
@@ -39,72 +45,57 @@ file_paths = [
 ]
 
 threshold = 0.05
-avg_F_static_list = []
-avg_P_list = []
-avg_pT_list = []
-avg_p_list = []
-file_labels = []
-start_time = time.time()
-
-for filename in file_paths:
-    total_poz = 0
-    total_neg = 0
-    total_events = 0
-    batch_poz = 0
-    batch_neg = 0
-    batch_events = 0
-    sum_pT = 0
-    sum_p = 0
+pair_background = True       # Test the same-event π⁺π⁻ mass spectrum against a mixed-event background
+signal_window = (0.70, 0.85)  # π⁺π⁻ mass window (GeV/c²) tested for an excess, around the ρ⁰
+norm_window = (1.2, 2.0)      # Mass range where the mixed-event background is scaled to the same-event spectrum
+workers = None       # Worker processes (None = one per CPU core)
+max_pending = None   # Files queued in the pool at once (None = 2 per worker)
+incremental = True   # Reuse stored results of files that did not change since the last run
+results_file = 'goal3_results.json'  # Persistent per-file results store
+profile_file = 'goal3_profile.json'  # Stage timings / counters of each run (None = off, see instrumentation.py)
+profile_capture = ()  # Add 'cprofile' and / or 'tracemalloc' to the profile (slower)
+
+
+# Computes the statistics of one file; runs in a worker process
+def analyse_file(filename):
+    # the stage timings of this file travel back with its result
+    run = new_run()
+    with recording(run, profile_capture if profile_file else ()):
+        result = _analyse_file(filename)
+    result['run'] = run
+    return result
+
+
+def _analyse_file(filename):
     try:
-        with open(filename, 'r') as infile:
-            first_line = infile.readline().strip()
-            event_id, num_particles = first_line.split()[:2]
-            event_id = int(event_id)
-            num_particles = int(num_particles)
-            particle_count = 0
-            for line in infile:
-                if particle_count >= max_particles:
-                    break
-                parts = line.strip().split()
-                if not parts or len(parts) < 4:
-                    continue
-                try:
-                    pdg_code = int(parts[-1])
-                    px = float(parts[0])
-                    py = float(parts[1])
-                    pz = float(parts[2])
-                except ValueError:
-                    continue
-                t = check_type(pdg_code)
-                if t == 1:
-                    batch_poz += 1
-                elif t == -1:
-                    batch_neg += 1
-                # Calculate pT and p for each particle
-                pT = math.sqrt(px**2 + py**2)
-                p = math.sqrt(px**2 + py**2 + pz**2)
-                sum_pT += pT
-                sum_p += p
-                batch_events += 1
-                particle_count += 1
-                if batch_events % batch_size == 0:
-                    total_poz += batch_poz
-                    total_neg += batch_neg
-                    total_events += batch_events
-                    batch_poz = 0
-                    batch_neg = 0
-                    batch_events = 0
-            # Add any remaining batch
-            if batch_events > 0:
-                total_poz += batch_poz
-                total_neg += batch_neg
-                total_events += batch_events
+        report = new_error_report()
+        with stage('load'):
+            if use_cache:
+                cols = load_particles(filename, max_particles=max_particles,
+                                      momentum_dtype=momentum_dtype(precision), report=report)
+            else:
+                cols = as_precision(read_particles(filename, max_particles=max_particles, report=report),
+                                    precision)
+        if selection:
+            with stage('select'):
+                cols = select(cols, selection)
     except FileNotFoundError:
-        print(f"File {filename} not found.")
-        continue
+        return {'file': filename, 'error': f"File {filename} not found."}
     except IOError as e:
-        print(f"Error reading file {filename}: {e}")
-        continue
+        return {'file': filename, 'error': f"Error reading file {filename}: {e}"}
+
+    px, py, pz, pdg = cols['px'], cols['py'], cols['pz'], cols['pdg']
+    count('particles', pdg.size)
+    count('events', cols['event_id'].size)
+    with stage('statistics'):
+        species = species_counts(pdg)
+        total_poz = species['pi+']
+        total_neg = species['pi-']
+        total_events = pdg.size
+        # Calculate pT and p for all particles at once
+        pT = transverse_momentum(px, py)
+        sum_pT = total(pT)
+        sum_p = total(momentum(px, py, pz, pt=pT))
 
     avg_poz, unc_poz = calculate_average_and_uncertainty(total_poz, total_events)
     avg_neg, unc_neg = calculate_average_and_uncertainty(total_neg, total_events)
@@ -112,54 +103,135 @@ for filename in file_paths:
     comb_uncert = math.sqrt(unc_poz**2 + unc_neg**2)
     significance = mean_diff / comb_uncert if comb_uncert != 0 else 0
 
-    # F static = mean_diff (difference in averages)
-    avg_F_static_list.append(mean_diff)
-    # P value = significance
-    avg_P_list.append(significance)
-    # Average pT and p
-    avg_pT = sum_pT / total_events if total_events else 0
-    avg_p = sum_p / total_events if total_events else 0
-    avg_pT_list.append(avg_pT)
-    avg_p_list.append(avg_p)
-    file_labels.append(filename.split('/')[-1])
-
-    print(f"\nResults for {filename}:")
-    print(f"  Total events: {total_events}")
-    print(f"  Positive pions: {total_poz}, Negative pions: {total_neg}")
-    print(f"  Average positive pions/event: {avg_poz:.6f} ± {unc_poz:.6f}")
-    print(f"  Average negative pions/event: {avg_neg:.6f} ± {unc_neg:.6f}")
-    print(f"  Mean difference (F static): {mean_diff:.6f}")
-    print(f"  Combined uncertainty: {comb_uncert:.6f}")
-    print(f"  Significance (P value): {significance:.2f} sigma")
-    print(f"  Average pT: {avg_pT:.6f}")
-    print(f"  Average p: {avg_p:.6f}")
-    if abs(significance) > threshold:
+    with stage('pairs'):
+        pairs = pair_excess(cols) if pair_background else None
+
+    return {
+        'file': filename,
+        'particles': total_events,
+        'total_poz': total_poz,
+        'total_neg': total_neg,
+        'species': species,
+        'avg_poz': avg_poz,
+        'unc_poz': unc_poz,
+        'avg_neg': avg_neg,
+        'unc_neg': unc_neg,
+        'mean_diff': mean_diff,
+        'comb_uncert': comb_uncert,
+        'significance': significance,
+        'avg_pT': sum_pT / total_events if total_events else 0,
+        'avg_p': sum_p / total_events if total_events else 0,
+        'rejected': error_summary(report),
+        'pairs': pairs,
+    }
+
+
+def pair_excess(cols):
+    # Same-event vs mixed-event π⁺π⁻ mass spectra of one file
+    species = classify(cols['pdg'])
+    same = new_pair_histograms({'mass': PAIR_BINS['mass']})
+    mixed = new_pair_histograms({'mass': PAIR_BINS['mass']})
+    fill_pairs(same, cols, species=species)
+    fill_mixed(mixed, new_pool(), cols, species=species)
+    return background_excess(same['mass'], mixed['mass'], signal_window, norm_window)
+
+
+def print_results(result):
+    print(f"\nResults for {result['file']}:")
+    print(f"  Total events: {result['particles']}")
+    print(f"  Positive pions: {result['total_poz']}, Negative pions: {result['total_neg']}")
+    print("  Species: " + ", ".join(f"{name}={n}" for name, n in result['species'].items() if n))
+    print(f"  Average positive pions/event: {result['avg_poz']:.6f} ± {result['unc_poz']:.6f}")
+    print(f"  Average negative pions/event: {result['avg_neg']:.6f} ± {result['unc_neg']:.6f}")
+    print(f"  Mean difference (F static): {result['mean_diff']:.6f}")
+    print(f"  Combined uncertainty: {result['comb_uncert']:.6f}")
+    print(f"  Significance (P value): {result['significance']:.2f} sigma")
+    print(f"  Average pT: {result['avg_pT']:.6f}")
+    print(f"  Average p: {result['avg_p']:.6f}")
+    if result['pairs']:
+        pairs = result['pairs']
+        print(f"  π⁺π⁻ pairs in {signal_window[0]:.2f}-{signal_window[1]:.2f} GeV/c²: {pairs['same']} same-event, "
+              f"{pairs['background']:.1f} mixed-event background, excess {pairs['excess']:.1f} ± "
+              f"{pairs['excess_unc']:.1f} ({pairs['significance']:.2f} sigma)")
+    if result['rejected']:
+        print("  Rejected lines: " + ", ".join(f"{reason}={n}" for reason, n in result['rejected'].items()))
+    if abs(result['significance']) > threshold:
         print("  The difference is statistically significant.")
     else:
         print("  The difference is not statistically significant.")
 
-end_time = time.time()
-
-# Plot 1: Average F static and P value per file
-plt.figure(figsize=(8,5))
-plt.plot(file_labels, avg_F_static_list, marker='o', label='Average F static')
-plt.plot(file_labels, avg_P_list, marker='s', label='Average P value')
-plt.xlabel('File')
-plt.ylabel('Value')
-plt.title('Average F static and P value per file')
-plt.legend()
-plt.tight_layout()
-plt.show()
-
-# Plot 2: Average pT and p per file
-plt.figure(figsize=(8,5))
-plt.plot(file_labels, avg_pT_list, marker='o', label='Average pT')
-plt.plot(file_labels, avg_p_list, marker='s', label='Average p')
-plt.xlabel('File')
-plt.ylabel('Value')
-plt.title('Average pT and p per file')
-plt.legend()
-plt.tight_layout()
-plt.show()
-
-print(f"\nTotal execution time: {end_time - start_time:.2f} seconds")
\ No newline at end of file
+
+def main():
+    avg_F_static_list = []
+    avg_P_list = []
+    avg_pT_list = []
+    avg_p_list = []
+    file_labels = []
+    start_time = time.time()
+
+    config = {'max_particles': max_particles, 'selection': selection, 'precision': precision,
+              'pair_background': pair_background, 'signal_window': list(signal_window),
+              'norm_window': list(norm_window), 'summary_version': 3}
+    store = load_store(results_file) if incremental else {'files': {}}
+    cached, todo, fps = split_cached(store, file_paths, config)
+    if cached:
+        print(f"Reusing stored results for {len(cached)} unchanged files")
+    # New / changed files are analysed in parallel, results come back in file_paths order
+    fresh = run_ordered(analyse_file, todo, workers, max_pending)
+    run = new_run()
+    for filename in file_paths:
+        if filename in cached:
+            result = cached[filename]
+        else:
+            _, result = next(fresh)
+            run = merge_runs(run, result.pop('run'))
+            if incremental and 'error' not in result:
+                record(store, filename, config, result, fps[filename])
+        if 'error' in result:
+            print(result['error'])
+            continue
+        # F static = mean_diff (difference in averages)
+        avg_F_static_list.append(result['mean_diff'])
+        # P value = significance
+        avg_P_list.append(result['significance'])
+        # Average pT and p
+        avg_pT_list.append(result['avg_pT'])
+        avg_p_list.append(result['avg_p'])
+        file_labels.append(filename.split('/')[-1])
+        print_results(result)
+
+    fresh.close()
+    if incremental and todo:
+        save_store(store, results_file)
+    end_time = time.time()
+
+    # Both summary plots are written to PNG by the plotting process
+    plotter = new_plotter()
+    # Plot 1: Average F static and P value per file
+    submit_plot(plotter, line_plot, {
+        'file': 'goal3_fstatic_pvalue.png',
+        'x': file_labels,
+        'series': [(avg_F_static_list, 'Average F static', 'o'), (avg_P_list, 'Average P value', 's')],
+        'xlabel': 'File', 'ylabel': 'Value',
+        'title': 'Average F static and P value per file',
+    })
+    # Plot 2: Average pT and p per file
+    submit_plot(plotter, line_plot, {
+        'file': 'goal3_momentum.png',
+        'x': file_labels,
+        'series': [(avg_pT_list, 'Average pT', 'o'), (avg_p_list, 'Average p', 's')],
+        'xlabel': 'File', 'ylabel': 'Value',
+        'title': 'Average pT and p per file',
+    })
+    close_plotter(plotter)
+
+    print(f"\nTotal execution time: {end_time - start_time:.2f} seconds")
+    if profile_file:
+        report = run_report(run, 'goal3', end_time - start_time, files=len(todo), cached_files=len(cached))
+        write_report(report, profile_file)
+        print("Stage times (summed over workers):")
+        print_stages(report)
+        print(f"Saved profile: {profile_file}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -2,12 +2,39 @@ import math
 import time
 import os
 import concurrent.futures
-import matplotlib.pyplot as plt
+import functools
 import numpy as np
+from particle_reader import select_events
+from particle_cache import load_particles
+from particle_index import load_event_index, read_event_range, read_events
+from particle_species import DEFAULT_CLASSIFIER, classify
+from bootstrap import bootstrap_job, name_seed
+from event_stats import event_quantities, batch_sums
+from precision import momentum_dtype, as_precision, total
+from shared_arrays import start_tracker, create_shared_array, attach_shared_array, release_shared_array
+from selection import select
+from plotting import new_figure, new_plotter, submit_plot, close_plotter
+from results_store import load_store, save_store, split_cached, record
+from instrumentation import (new_run, recording, stage, count, merge_runs, run_report, write_report,
+                             print_stages)
 
 # Configuration
 batch_size = 1000          # Number of events per batch for memory-efficient processing
 sigma_threshold = 3.0      # Significance threshold (σ units)
+use_cache = True           # Keep a binary .npcache sidecar next to each data file
+selection = None           # Particle cut applied before counting, e.g. "pT > 0.2" (see selection.py)
+precision = 'float64'      # 'float32' keeps px, py, pz in float32 (half the memory traffic, sums stay float64)
+max_events = 50000         # Events analysed per file
+sample_mode = 'head'       # 'head' = first max_events events, 'random' = random sample over the whole file
+sample_seed = 12345        # Seed for the random event sample
+chunks_per_file = None     # Event chunks per file for the worker pool (None = enough to use every core)
+shared_results = True      # Workers write per-batch counts into shared memory instead of returning lists
+bootstrap_replicates = 2000  # Bootstrap resamples of the batch counts per file (0 = off)
+bootstrap_seed = 2025      # Seed for the bootstrap resampling
+incremental = True         # Reuse stored summaries of files that did not change since the last run
+results_file = 'goal4_results.json'  # Persistent per-file results store
+profile_file = 'goal4_profile.json'  # Stage timings / counters of each run (None = off, see instrumentation.py)
+profile_capture = ()       # Add 'cprofile' and / or 'tracemalloc' to the profile (slower)
 file_paths = [
     'data_science/output-Set0.txt',
     'data_science/output-Set1.txt',
@@ -22,8 +49,8 @@ file_paths = [
     'data_science/output-Set10.txt',
 ]
 
-# Pre-compile PDG lookup for O(1) mapping
-TYPE_MAP = {211: 1, -211: -1}
+# Species categories from the pre-compiled PDG lookup table
+SPECIES = DEFAULT_CLASSIFIER['names']
 
 
 def calculate_average_and_uncertainty(total_count: float, n_events: int) -> tuple[float, float]:
@@ -34,61 +61,127 @@ def calculate_average_and_uncertainty(total_count: float, n_events: int) -> tupl
     return avg, unc
 
 
-def process_file(path: str) -> dict:
+def plan_events(path: str):
     """
-    Process one data file, tally π⁺/π⁻ and record per-batch counts.
-    Returns summary and batch-wise lists.
-    """
-    total_pos = 0
-    total_neg = 0
-    batch_pos = 0
-    batch_neg = 0
-    pos_batches, neg_batches = [], []
-    event_count = 0
-    max_events = 50000
+    Choose the events of a file to analyse: range(0, n) for the head of the
+    file or a sorted array of event numbers for a random sample.
+    Builds the event index (and the .npcache sidecar) on the first run.
+    """
+    if use_cache:
+        n_total = load_particles(path, momentum_dtype=momentum_dtype(precision))['event_id'].size
+    else:
+        n_total = load_event_index(path)['offset'].size
+    if sample_mode == 'random' and max_events < n_total:
+        rng = np.random.default_rng(sample_seed)
+        return np.sort(rng.choice(n_total, size=max_events, replace=False))
+    return range(0, min(n_total, max_events))
+
+
+def split_events(events, n_chunks: int) -> list:
+    """
+    Split the planned events into at most n_chunks pieces whose boundaries
+    fall on whole batches, so the per-chunk batch lists just concatenate.
+    """
+    n = len(events)
+    per_chunk = max(1, math.ceil(n / max(n_chunks, 1) / batch_size)) * batch_size
+    return [events[i:i + per_chunk] for i in range(0, n, per_chunk)] or [events]
+
+
+def read_chunk(path: str, events) -> dict:
+    if use_cache:
+        return select_events(load_particles(path, momentum_dtype=momentum_dtype(precision)), events)
+    if isinstance(events, range):
+        return as_precision(read_event_range(path, events.start, events.stop), precision)
+    return as_precision(read_events(path, events), precision)
+
+
+def count_chunk(task: tuple) -> dict:
+    """
+    Tally π⁺/π⁻ for one chunk of events of a file (runs in a worker process).
+    task is (path, events, slot). With a slot (shm_name, n_slots, first_slot)
+    the per-batch counts are written into the shared count array and only
+    the scalar tallies are returned.
+    """
+    run = new_run()
+    with recording(run, profile_capture if profile_file else ()):
+        part = _count_chunk(*task)
+    part['run'] = run
+    return part
+
+
+def _count_chunk(path: str, events, slot) -> dict:
     start = time.perf_counter()
+    with stage('load'):
+        cols = read_chunk(path, events)
+    if selection:
+        with stage('select'):
+            cols = select(cols, selection)
+    event_count = cols['event_id'].size
+    count('particles', cols['pdg'].size)
+    count('events', event_count)
 
-    with open(path, 'r') as f:
-        readline = f.readline
-        while event_count < max_events:
-            header = readline()
-            if not header:
-                break
-            parts = header.split()
-            if len(parts) != 2:
-                continue
-            event_count += 1
-            n_particles = int(parts[1])
-
-            ev_pos = ev_neg = 0
-            for _ in range(n_particles):
-                line = readline()
-                if not line:
-                    break
-                pdg = int(line.rsplit(' ', 1)[-1])
-                typ = TYPE_MAP.get(pdg, 0)
-                if typ > 0:
-                    ev_pos += 1
-                elif typ < 0:
-                    ev_neg += 1
-
-            total_pos += ev_pos
-            total_neg += ev_neg
-            batch_pos += ev_pos
-            batch_neg += ev_neg
-
-            if event_count % batch_size == 0:
-                pos_batches.append(batch_pos)
-                neg_batches.append(batch_neg)
-                batch_pos = 0
-                batch_neg = 0
-
-    # capture any remaining batch
-    if batch_pos or batch_neg:
-        pos_batches.append(batch_pos)
-        neg_batches.append(batch_neg)
-
-    elapsed = time.perf_counter() - start
+    # per-event multiplicity, π⁺/π⁻ counts, sum pT and max p as segment reductions
+    with stage('statistics'):
+        species = classify(cols['pdg'])
+        per_event = event_quantities(cols, species=species)
+        pos_batches = batch_sums(per_event['n_pos'], batch_size)
+        neg_batches = batch_sums(per_event['n_neg'], batch_size)
+
+    part = {
+        'events': event_count,
+        'total_pos': int(per_event['n_pos'].sum()),
+        'total_neg': int(per_event['n_neg'].sum()),
+        'n_batches': pos_batches.size,
+        'species': np.bincount(species, minlength=len(SPECIES)).tolist(),
+        'multiplicity_hist': np.bincount(per_event['multiplicity']).tolist(),
+        'sum_pt': total(per_event['sum_pt']),
+        'max_p': float(np.nanmax(per_event['max_p'], initial=0.0)),
+    }
+    if slot is None:
+        part['pos_batches'] = pos_batches.tolist()
+        part['neg_batches'] = neg_batches.tolist()
+    else:
+        shm_name, n_slots, first = slot
+        shm, counts = attach_shared_array(shm_name, (2, n_slots))
+        counts[0, first:first + pos_batches.size] = pos_batches
+        counts[1, first:first + neg_batches.size] = neg_batches
+        del counts
+        release_shared_array(shm)
+    part['time_s'] = time.perf_counter() - start
+    return part
+
+
+def batch_slots(tasks: list) -> list:
+    """
+    First slot of every chunk in a shared (2, n_slots) batch-count array.
+    """
+    firsts, n_slots = [], 0
+    for _, events, _ in tasks:
+        firsts.append(n_slots)
+        n_slots += math.ceil(len(events) / batch_size)
+    return firsts + [n_slots]
+
+
+def merge_chunks(path: str, parts: list) -> dict:
+    """
+    Combine the chunk tallies of one file (in file order) into its summary.
+    """
+    event_count = sum(part['events'] for part in parts)
+    total_pos = sum(part['total_pos'] for part in parts)
+    total_neg = sum(part['total_neg'] for part in parts)
+    species = np.sum([part['species'] for part in parts], axis=0, dtype=np.int64).tolist()
+    multiplicity = np.zeros(max(len(part['multiplicity_hist']) for part in parts), dtype=np.int64)
+    for part in parts:
+        multiplicity[:len(part['multiplicity_hist'])] += part['multiplicity_hist']
+    sum_pt = math.fsum(part['sum_pt'] for part in parts)
+    pos_batches = [n for part in parts for n in part['pos_batches']]
+    neg_batches = [n for part in parts for n in part['neg_batches']]
+    # a trailing partial batch is only kept if it saw any pions
+    if event_count % batch_size and not (pos_batches[-1] or neg_batches[-1]):
+        pos_batches.pop()
+        neg_batches.pop()
+
+    elapsed = sum(part['time_s'] for part in parts)
     avg_pos, unc_pos = calculate_average_and_uncertainty(total_pos, event_count)
     avg_neg, unc_neg = calculate_average_and_uncertainty(total_neg, event_count)
     diff = abs(total_pos - total_neg)
@@ -109,19 +202,47 @@ def process_file(path: str) -> dict:
         'significance': sig,
         'significant': sig > sigma_threshold,
         'time_s': elapsed,
+        'species': dict(zip(SPECIES, species)),
+        'multiplicity_hist': multiplicity.tolist(),
+        'mean_multiplicity': float(multiplicity @ np.arange(multiplicity.size)) / event_count if event_count else 0.0,
+        'mean_sum_pt': sum_pt / event_count if event_count else 0.0,
+        'max_p': max(part['max_p'] for part in parts),
         'pos_batches': pos_batches,
-        'neg_batches': neg_batches
+        'neg_batches': neg_batches,
+        'run': functools.reduce(merge_runs, [part['run'] for part in parts]),
     }
 
 
-def plot_batches(summary: dict) -> None:
+def process_file(path: str, workers: int = 1) -> dict:
+    """
+    Process one data file, tally π⁺/π⁻ and record per-batch counts.
+    With workers > 1 the file is split into event chunks that are
+    counted in parallel. Returns summary and batch-wise lists.
+    """
+    start = time.perf_counter()
+    chunks = split_events(plan_events(path), workers)
+    tasks = [(path, events, None) for events in chunks]
+    if workers > 1 and len(tasks) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as exe:
+            parts = list(exe.map(count_chunk, tasks))
+    else:
+        parts = [count_chunk(task) for task in tasks]
+    summary = merge_chunks(path, parts)
+    # the stage timings of the chunks are for analyse_files' profile, not part of the summary
+    summary.pop('run')
+    summary['time_s'] = time.perf_counter() - start
+    return summary
+
+
+def plot_batches(summary: dict) -> str:
     """
-    Generate and save a plot of π⁺/π⁻ counts per batch for a file.
+    Generate and save a plot of π⁺/π⁻ counts per batch for a file
+    (runs in the plotting process); returns the file name.
     """
     pos = summary['pos_batches']
     neg = summary['neg_batches']
     batches = np.arange(1, len(pos)+1) * batch_size
-    fig, ax = plt.subplots()
+    fig, ax = new_figure((6.4, 4.8))
     ax.plot(batches, pos, label='π⁺ per batch')
     ax.plot(batches, neg, label='π⁻ per batch')
     ax.set_xlabel('Events processed')
@@ -139,29 +260,158 @@ def plot_batches(summary: dict) -> None:
     ax.text(0.02, 0.95, '\n'.join(stats), transform=ax.transAxes,
             fontsize=8, va='top', bbox=dict(facecolor='white', alpha=0.7))
     fname = f"{os.path.splitext(os.path.basename(summary['file']))[0]}_batches.png"
-    plt.tight_layout()
+    fig.tight_layout()
     fig.savefig(fname)
-    plt.close(fig)
-    print(f"Saved plot: {fname}")
+    return fname
+
+
+def analysis_config() -> dict:
+    """
+    Settings a stored summary depends on; changing any of them reprocesses every file.
+    """
+    return {
+        'batch_size': batch_size,
+        'max_events': max_events,
+        'sample_mode': sample_mode,
+        'sample_seed': sample_seed,
+        'bootstrap_replicates': bootstrap_replicates,
+        'bootstrap_seed': bootstrap_seed,
+        'selection': selection,
+        'precision': precision,
+        'summary_version': 3,
+    }
+
+
+def file_seed(path: str):
+    """
+    Bootstrap seed of path, derived from bootstrap_seed and the file name only,
+    so it does not change when file_paths is reordered or extended.
+    """
+    return name_seed(bootstrap_seed, os.path.basename(path))
+
+
+def plot_events(summary: dict) -> str:
+    """
+    Event multiplicity distribution of a file (runs in the plotting process).
+    """
+    hist = np.asarray(summary['multiplicity_hist'])
+    fig, ax = new_figure((6.4, 4.8))
+    ax.step(np.arange(hist.size), hist, where='mid')
+    ax.set_xlabel('Particles per event')
+    ax.set_ylabel('Events')
+    ax.set_title(f"Multiplicity for {os.path.basename(summary['file'])} "
+                 f"(mean {summary['mean_multiplicity']:.1f})")
+    fname = f"{os.path.splitext(os.path.basename(summary['file']))[0]}_multiplicity.png"
+    fig.tight_layout()
+    fig.savefig(fname)
+    return fname
+
+
+def analyse_files(paths: list, seeds: list, exe, workers: int, plotter) -> list:
+    """
+    Summaries of paths (in order), computed on the worker pool exe.
+    seeds holds the bootstrap seed of every path.
+    """
+    n_chunks = chunks_per_file or math.ceil(workers / len(paths))
+    # index/cache every file first, then spread all chunks of all files over the pool
+    with stage('plan'):
+        plans = list(exe.map(plan_events, paths))
+    tasks = [(path, events, None) for path, planned in zip(paths, plans)
+             for events in split_events(planned, n_chunks)]
+    if shared_results:
+        # workers write their per-batch counts straight into shared memory
+        firsts = batch_slots(tasks)
+        shm, counts = create_shared_array((2, firsts[-1]))
+        tasks = [(path, events, (shm.name, firsts[-1], first))
+                 for (path, events, _), first in zip(tasks, firsts)]
+    results = []
+    try:
+        # chunks come back in task order, i.e. file by file
+        file_parts = []
+        for i, part in enumerate(exe.map(count_chunk, tasks)):
+            path, _, slot = tasks[i]
+            if shared_results:
+                first = slot[2]
+                part['pos_batches'] = counts[0, first:first + part['n_batches']].tolist()
+                part['neg_batches'] = counts[1, first:first + part['n_batches']].tolist()
+            file_parts.append(part)
+            if i + 1 == len(tasks) or tasks[i + 1][0] != path:
+                summary = merge_chunks(path, file_parts)
+                results.append(summary)
+                # render while the remaining files are still being counted
+                submit_plot(plotter, plot_batches, summary)
+                submit_plot(plotter, plot_events, summary)
+                file_parts = []
+    finally:
+        if shared_results:
+            del counts
+            release_shared_array(shm, unlink=True)
+
+    if bootstrap_replicates:
+        # resample the batch counts of every file in parallel, one seed per file
+        boot_tasks = [(s['pos_batches'], s['neg_batches'], bootstrap_replicates, seed)
+                      for s, seed in zip(results, seeds)]
+        with stage('bootstrap'):
+            for summary, boot in zip(results, exe.map(bootstrap_job, boot_tasks)):
+                summary['bootstrap'] = boot
+    return results
+
+
+def print_summary(summary: dict, cached: bool = False) -> None:
+    print(f"\nFile: {summary['file']}")
+    print(f"  Events: {summary['events']}, π⁺={summary['total_pos']}, π⁻={summary['total_neg']}")
+    print(f"  Avg±unc: π⁺={summary['avg_pos']:.3f}±{summary['unc_pos']:.3f}, π⁻={summary['avg_neg']:.3f}±{summary['unc_neg']:.3f}")
+    print(f"  Δ={summary['diff']}, σ_tot={summary['combined_unc']:.3f}, Signif={summary['significance']:.2f}σ")
+    print("  Species: " + ", ".join(f"{name}={n}" for name, n in summary['species'].items() if n))
+    print(f"  Per event: multiplicity={summary['mean_multiplicity']:.2f}, "
+          f"ΣpT={summary['mean_sum_pt']:.3f} GeV/c, max p={summary['max_p']:.3f} GeV/c")
+    if 'bootstrap' in summary:
+        boot = summary['bootstrap']
+        print(f"  Asymmetry={boot['asym']:.4f}±{boot['asym_err']:.4f} "
+              f"({boot['confidence']:.0%} CI [{boot['ci_low']:.4f}, {boot['ci_high']:.4f}]), "
+              f"bootstrap Signif={boot['significance']:.2f}σ")
+    print(f"  Time: {summary['time_s']:.3f}s" + (" (cached)" if cached else ""))
 
 
 def main():
-    workers = min(len(file_paths), os.cpu_count() or 1)
+    workers = os.cpu_count() or 1
     start_all = time.perf_counter()
-    print(f"Processing {len(file_paths)} files with {workers} workers...")
+    config = analysis_config()
+    store = load_store(results_file) if incremental else {'files': {}}
+    cached, todo, fps = split_cached(store, file_paths, config)
+    print(f"Processing {len(todo)} of {len(file_paths)} files with {workers} workers "
+          f"({len(cached)} unchanged)...")
+    if shared_results:
+        start_tracker()
+    plotter = new_plotter()
 
-    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as exe:
-        results = list(exe.map(process_file, file_paths))
+    computed = {}
+    # wall time of the main-process stages, plus the stages of every worker chunk
+    main_run, worker_run = new_run(), new_run()
+    if todo:
+        with recording(main_run), concurrent.futures.ProcessPoolExecutor(max_workers=workers) as exe:
+            for summary in analyse_files(todo, [file_seed(path) for path in todo], exe, workers, plotter):
+                worker_run = merge_runs(worker_run, summary.pop('run'))
+                computed[summary['file']] = summary
+        if incremental:
+            for path, summary in computed.items():
+                record(store, path, config, summary, fps[path])
+            save_store(store, results_file)
+    results = [cached[path] if path in cached else computed[path] for path in file_paths]
 
     for summary in results:
-        plot_batches(summary)
-        print(f"\nFile: {summary['file']}")
-        print(f"  Events: {summary['events']}, π⁺={summary['total_pos']}, π⁻={summary['total_neg']}")
-        print(f"  Avg±unc: π⁺={summary['avg_pos']:.3f}±{summary['unc_pos']:.3f}, π⁻={summary['avg_neg']:.3f}±{summary['unc_neg']:.3f}")
-        print(f"  Δ={summary['diff']}, σ_tot={summary['combined_unc']:.3f}, Signif={summary['significance']:.2f}σ")
-        print(f"  Time: {summary['time_s']:.3f}s")
+        print_summary(summary, summary['file'] in cached)
 
+    with recording(main_run), stage('plots'):
+        close_plotter(plotter)
     print(f"Total time: {time.perf_counter() - start_all:.3f}s")
+    if profile_file:
+        report = run_report(merge_runs(main_run, worker_run), 'goal4', time.perf_counter() - start_all,
+                            files=len(todo), cached_files=len(cached), workers=workers)
+        write_report(report, profile_file)
+        print("Stage times (plan / bootstrap / plots: wall; others summed over workers):")
+        print_stages(report)
+        print(f"Saved profile: {profile_file}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
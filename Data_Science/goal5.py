@@ -1,7 +1,18 @@
 import math
+import os
 import time
-import matplotlib.pyplot as plt
-from scipy.stats import f_oneway
+import numpy as np
+from particle_reader import iter_blocks, split_columns, new_error_report, error_summary
+from particle_cache import load_particles, is_fresh
+from kinematics import transverse_momentum, momentum, pseudorapidity, work_buffer
+from particle_species import DEFAULT_CLASSIFIER, category, classify
+from histograms import new_histogram, fill, save_histograms, bin_centers, in_range
+from streaming_stats import new_moments, update_moments, one_way_anova
+from selection import iter_selected
+from precision import momentum_dtype, as_precision
+from pairs import new_pair_histograms, fill_pairs
+from instrumentation import new_run, recording, stage, count, timed_iter, run_report, write_report, print_stages
+from plotting import line_plot, new_figure, new_plotter, submit_plot, close_plotter
 
 # Calculates average and statistical uncertainty
 def calculate_average_and_uncertainty(total, count):
@@ -11,19 +22,22 @@ def calculate_average_and_uncertainty(total, count):
     uncertainty = math.sqrt(total) / count if count > 0 else 0
     return avg, uncertainty
 
-# Determines particle type based on PDG code (1 for positive pion, -1 for negative pion, 0 otherwise)
-def check_type(pdg_code):
-    if pdg_code == 211:
-        return 1
-    elif pdg_code == -211:
-        return -1
-    else:
-        return 0
-    
-start_time=time.time()
 
 batch_size = 1000
+use_cache = True  # Keep a binary .npcache sidecar next to each data file
+selection = None  # Particle cut, e.g. "pT > 0.5 and abs(eta) < 2.4" (see selection.py)
+precision = 'float64'  # 'float32' keeps px, py, pz in float32 (half the memory traffic, sums stay float64)
 max_particles = 100000  # Limit to first 50000 particles per file
+save_spectra = True  # Write pT / p / eta histograms per species to <file>_spectra.npz
+# Spectrum binning: name -> (low, high, number of bins, log binning)
+spectra_bins = {
+    'pT': (0.0, 5.0, 100, False),
+    'p': (0.01, 100.0, 80, True),
+    'eta': (-8.0, 8.0, 160, False),
+}
+save_pairs = True  # Write same-event π⁺π⁻ mass / opening angle / Δφ histograms to <file>_pairs.npz
+profile_file = 'goal5_profile.json'  # Stage timings / counters of each run (None = off, see instrumentation.py)
+profile_capture = ()  # Add 'cprofile' and / or 'tracemalloc' to the profile (slower)
 file_paths = [
     "data_science/output-Set1.txt",
     "data_science/output-Set2.txt",
@@ -41,164 +55,204 @@ file_paths = [
 ]
 
 threshold = 0.05
-avg_F_static_list = []
-avg_P_list = []
-avg_pT_list = []
-avg_p_list = []
-file_labels = []
-start_time = time.time()
-
-for filename in file_paths:
-    total_poz = 0
-    total_neg = 0
-    total_events = 0
-    batch_poz = 0
-    batch_neg = 0
-    batch_events = 0
-    sum_pT = 0
-    sum_p = 0
-    try:
-        with open(filename, 'r') as infile:
-            first_line = infile.readline().strip()
-            event_id, num_particles = first_line.split()[:2]
-            event_id = int(event_id)
-            num_particles = int(num_particles)
-            particle_count = 0
-            for line in infile:
-                if particle_count >= max_particles:
-                    break
-                parts = line.strip().split()
-                if not parts or len(parts) < 4:
-                    continue
-                try:
-                    pdg_code = int(parts[-1])
-                    px = float(parts[0])
-                    py = float(parts[1])
-                    pz = float(parts[2])
-                except ValueError:
-                    continue
-                t = check_type(pdg_code)
-                if t == 1:
-                    batch_poz += 1
-                elif t == -1:
-                    batch_neg += 1
-                # Calculate pT and p for each particle
-                pT = math.sqrt(px**2 + py**2)
-                p = math.sqrt(px**2 + py**2 + pz**2)
-                sum_pT += pT
-                sum_p += p
-                batch_events += 1
-                particle_count += 1
-                if batch_events % batch_size == 0:
-                    total_poz += batch_poz
-                    total_neg += batch_neg
-                    total_events += batch_events
-                    batch_poz = 0
-                    batch_neg = 0
-                    batch_events = 0
-            # Add any remaining batch
-            if batch_events > 0:
-                total_poz += batch_poz
-                total_neg += batch_neg
-                total_events += batch_events
-    except FileNotFoundError:
-        print(f"File {filename} not found.")
-        continue
-    except IOError as e:
-        print(f"Error reading file {filename}: {e}")
-        continue
-
-    avg_poz, unc_poz = calculate_average_and_uncertainty(total_poz, total_events)
-    avg_neg, unc_neg = calculate_average_and_uncertainty(total_neg, total_events)
-    mean_diff = avg_poz - avg_neg
-    comb_uncert = math.sqrt(unc_poz**2 + unc_neg**2)
-    significance = mean_diff / comb_uncert if comb_uncert != 0 else 0
-
-    # F static = mean_diff (difference in averages)
-    avg_F_static_list.append(mean_diff)
-    # P value = significance
-    avg_P_list.append(significance)
-    # Average pT and p
-    avg_pT = sum_pT / total_events if total_events else 0
-    avg_p = sum_p / total_events if total_events else 0
-    avg_pT_list.append(avg_pT)
-    avg_p_list.append(avg_p)
-    file_labels.append(filename.split('/')[-1])
-
-# ANOVA for average pT and p across files
-pt_groups = []
-p_groups = []
-for filename in file_paths:
-    pt_vals = []
-    p_vals = []
-    try:
-        with open(filename, 'r') as infile:
-            first_line = infile.readline().strip()
-            event_id, num_particles = first_line.split()[:2]
-            event_id = int(event_id)
-            num_particles = int(num_particles)
-            particle_count = 0
-            for line in infile:
-                if particle_count >= max_particles:
-                    break
-                parts = line.strip().split()
-                if not parts or len(parts) < 4:
-                    continue
-                try:
-                    px = float(parts[0])
-                    py = float(parts[1])
-                    pz = float(parts[2])
-                except ValueError:
-                    continue
-                pt_vals.append(math.sqrt(px**2 + py**2))
-                p_vals.append(math.sqrt(px**2 + py**2 + pz**2))
-                particle_count += 1
-    except Exception:
-        continue
-    pt_groups.append(pt_vals)
-    p_groups.append(p_vals)
-
-# One-way ANOVA for pT
-f_stat_pt, p_value_pt = f_oneway(*pt_groups)
-print(f"ANOVA for pT: F-statistic = {f_stat_pt:.4f}, p-value = {p_value_pt:.4g}")
-
-
-# Print per-file results using collected statistics
-print("\nPer-file results:")
-for i, label in enumerate(file_labels):
-    print(f"\nResults for {label}:")
-    print(f"  Mean difference (F static): {avg_F_static_list[i]:.6f}")
-    print(f"  Significance (P value): {avg_P_list[i]:.2f} sigma")
-    print(f"  Average pT: {avg_pT_list[i]:.6f}")
-    print(f"  Average p: {avg_p_list[i]:.6f}")
-    if abs(avg_P_list[i]) > threshold:
-        print("  The difference is statistically significant.")
+
+def particle_blocks(filename, report=None):
+    # Stream the file in blocks so memory does not grow with max_particles:
+    # slices of the memory-mapped sidecar when it is fresh (or, for the whole
+    # file, once it is built block by block), parsed text blocks otherwise
+    dtype = momentum_dtype(precision)
+    if use_cache and (max_particles is None or is_fresh(filename, dtype)):
+        blocks = split_columns(load_particles(filename, max_particles=max_particles,
+                                              momentum_dtype=dtype, report=report))
     else:
-        print("  The difference is not statistically significant.")
-
-
-# Plot 1: Average F static and P value per file
-plt.figure(figsize=(8,5))
-plt.plot(file_labels, avg_F_static_list, marker='o', label='Average F static')
-plt.plot(file_labels, avg_P_list, marker='s', label='Average P value')
-plt.xlabel('File')
-plt.ylabel('Value')
-plt.title('Average F static and P value per file')
-plt.legend()
-plt.tight_layout()
-plt.show()
-
-# Plot 2: Average pT and p per file
-plt.figure(figsize=(8,5))
-plt.plot(file_labels, avg_pT_list, marker='o', label='Average pT')
-plt.plot(file_labels, avg_p_list, marker='s', label='Average p')
-plt.xlabel('File')
-plt.ylabel('Value')
-plt.title('Average pT and p per file')
-plt.legend()
-plt.tight_layout()
-plt.show()
-
-
-end_time=time.time()
-print(f"Total processing time: {end_time - start_time:.2f} seconds")
+        blocks = (as_precision(cols, precision)
+                  for cols in iter_blocks(filename, max_particles=max_particles, report=report))
+    return iter_selected(blocks, selection) if selection else blocks
+
+PI_PLUS = category('pi+')
+PI_MINUS = category('pi-')
+
+
+def plot_spectra(task: tuple) -> str:
+    # Per-species pT spectra of one file (runs in the plotting process)
+    label, hist = task
+    fig, ax = new_figure()
+    centers = bin_centers(hist)
+    for code, counts in enumerate(in_range(hist)):
+        if counts.any():
+            ax.step(centers, counts, where='mid', label=DEFAULT_CLASSIFIER['names'][code])
+    ax.set_yscale('log')
+    ax.set_xlabel('pT (GeV/c)')
+    ax.set_ylabel('Particles per bin')
+    ax.set_title(f'pT spectra for {label}')
+    ax.legend(fontsize=7)
+    fig.tight_layout()
+    fname = f"{os.path.splitext(label)[0]}_pT_spectra.png"
+    fig.savefig(fname)
+    return fname
+
+
+def plot_pair_mass(task: tuple) -> str:
+    # Same-event π⁺π⁻ invariant mass of one file (runs in the plotting process)
+    label, hist = task
+    fig, ax = new_figure()
+    ax.step(bin_centers(hist), in_range(hist)[0], where='mid')
+    ax.set_xlabel('m(π⁺π⁻) (GeV/c²)')
+    ax.set_ylabel('Pairs per bin')
+    ax.set_title(f'π⁺π⁻ invariant mass for {label}')
+    fig.tight_layout()
+    fname = f"{os.path.splitext(label)[0]}_pair_mass.png"
+    fig.savefig(fname)
+    return fname
+
+
+def main():
+    run = new_run()
+    start = time.perf_counter()
+    with recording(run, profile_capture if profile_file else ()):
+        analyse_all()
+    if profile_file:
+        report = run_report(run, 'goal5', time.perf_counter() - start, files=len(file_paths))
+        write_report(report, profile_file)
+        print("Stage times:")
+        print_stages(report)
+        print(f"Saved profile: {profile_file}")
+
+
+def analyse_all():
+    avg_F_static_list = []
+    avg_P_list = []
+    avg_pT_list = []
+    avg_p_list = []
+    file_labels = []
+    rejected_list = []
+    pairs_list = []
+    start_time = time.time()
+    plotter = new_plotter()
+    # Per-file pT / p accumulators (count, mean, M2) for the ANOVA across files
+    pt_groups = []
+    p_groups = []
+    buffers = {}
+    for filename in file_paths:
+        total_poz = 0
+        total_neg = 0
+        pt_stats = new_moments()
+        p_stats = new_moments()
+        # One row per particle species in every spectrum
+        spectra = {name: new_histogram(*bins, n_categories=len(DEFAULT_CLASSIFIER['names']))
+                   for name, bins in spectra_bins.items()}
+        pair_hists = new_pair_histograms()
+        n_pairs = 0
+        report = new_error_report()
+        try:
+            for cols in timed_iter('load', particle_blocks(filename, report)):
+                px, py, pz, pdg = cols['px'], cols['py'], cols['pz'], cols['pdg']
+                count('particles', pdg.size)
+                count('events', cols['event_id'].size)
+                with stage('statistics'):
+                    species = classify(pdg)
+                    total_poz += int(np.count_nonzero(species == PI_PLUS))
+                    total_neg += int(np.count_nonzero(species == PI_MINUS))
+                    # Calculate pT and p for the whole block at once, into reused buffers
+                    pT = transverse_momentum(px, py, out=work_buffer(buffers, 'pT', px.size, px.dtype))
+                    p = momentum(px, py, pz, out=work_buffer(buffers, 'p', px.size, px.dtype), pt=pT)
+                    pt_stats = update_moments(pt_stats, pT)
+                    p_stats = update_moments(p_stats, p)
+                if save_spectra:
+                    with stage('spectra'):
+                        eta = pseudorapidity(px, py, pz, out=work_buffer(buffers, 'eta', px.size, px.dtype), p=p)
+                        fill(spectra['pT'], pT, species)
+                        fill(spectra['p'], p, species)
+                        fill(spectra['eta'], eta, species)
+                if save_pairs:
+                    with stage('pairs'):
+                        n_pairs += fill_pairs(pair_hists, cols, species=species)
+        except FileNotFoundError:
+            print(f"File {filename} not found.")
+            continue
+        except IOError as e:
+            print(f"Error reading file {filename}: {e}")
+            continue
+
+        total_events = pt_stats['n']
+        if save_spectra:
+            spectra_file = f"{os.path.splitext(os.path.basename(filename))[0]}_spectra.npz"
+            save_histograms(spectra_file, spectra)
+            print(f"Saved spectra: {spectra_file}")
+            # rendered by the plotting process while the next file is read
+            submit_plot(plotter, plot_spectra, (os.path.basename(filename), spectra['pT']))
+        if save_pairs:
+            pairs_file = f"{os.path.splitext(os.path.basename(filename))[0]}_pairs.npz"
+            save_histograms(pairs_file, pair_hists)
+            print(f"Saved pair histograms: {pairs_file} ({n_pairs} π⁺π⁻ pairs)")
+            submit_plot(plotter, plot_pair_mass, (os.path.basename(filename), pair_hists['mass']))
+        pt_groups.append(pt_stats)
+        p_groups.append(p_stats)
+
+        avg_poz, unc_poz = calculate_average_and_uncertainty(total_poz, total_events)
+        avg_neg, unc_neg = calculate_average_and_uncertainty(total_neg, total_events)
+        mean_diff = avg_poz - avg_neg
+        comb_uncert = math.sqrt(unc_poz**2 + unc_neg**2)
+        significance = mean_diff / comb_uncert if comb_uncert != 0 else 0
+
+        # F static = mean_diff (difference in averages)
+        avg_F_static_list.append(mean_diff)
+        # P value = significance
+        avg_P_list.append(significance)
+        # Average pT and p
+        avg_pT = pt_stats['mean']
+        avg_p = p_stats['mean']
+        avg_pT_list.append(avg_pT)
+        avg_p_list.append(avg_p)
+        file_labels.append(filename.split('/')[-1])
+        rejected_list.append(error_summary(report))
+        pairs_list.append(n_pairs)
+
+    # One-way ANOVA for pT
+    f_stat_pt, p_value_pt = one_way_anova(pt_groups)
+    print(f"ANOVA for pT: F-statistic = {f_stat_pt:.4f}, p-value = {p_value_pt:.4g}")
+
+
+    # Print per-file results using collected statistics
+    print("\nPer-file results:")
+    for i, label in enumerate(file_labels):
+        print(f"\nResults for {label}:")
+        print(f"  Mean difference (F static): {avg_F_static_list[i]:.6f}")
+        print(f"  Significance (P value): {avg_P_list[i]:.2f} sigma")
+        print(f"  Average pT: {avg_pT_list[i]:.6f}")
+        print(f"  Average p: {avg_p_list[i]:.6f}")
+        if save_pairs:
+            print(f"  Same-event π⁺π⁻ pairs: {pairs_list[i]}")
+        if rejected_list[i]:
+            print("  Rejected lines: " + ", ".join(f"{reason}={n}" for reason, n in rejected_list[i].items()))
+        if abs(avg_P_list[i]) > threshold:
+            print("  The difference is statistically significant.")
+        else:
+            print("  The difference is not statistically significant.")
+
+
+    # Plot 1: Average F static and P value per file
+    submit_plot(plotter, line_plot, {
+        'file': 'goal5_fstatic_pvalue.png',
+        'x': file_labels,
+        'series': [(avg_F_static_list, 'Average F static', 'o'), (avg_P_list, 'Average P value', 's')],
+        'xlabel': 'File', 'ylabel': 'Value',
+        'title': 'Average F static and P value per file',
+    })
+    # Plot 2: Average pT and p per file
+    submit_plot(plotter, line_plot, {
+        'file': 'goal5_momentum.png',
+        'x': file_labels,
+        'series': [(avg_pT_list, 'Average pT', 'o'), (avg_p_list, 'Average p', 's')],
+        'xlabel': 'File', 'ylabel': 'Value',
+        'title': 'Average pT and p per file',
+    })
+    close_plotter(plotter)
+
+
+    end_time=time.time()
+    print(f"Total processing time: {end_time - start_time:.2f} seconds")
+
+
+if __name__ == '__main__':
+    main()
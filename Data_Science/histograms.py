@@ -0,0 +1,109 @@
+import numpy as np
+
+# Fixed-bin streaming histograms.
+# A histogram is a plain dict:
+#   'edges'  - n_bins + 1 bin edges (linear, or logarithmic with log=True)
+#   'log'    - True for log10 binning
+#   'counts' - int64 array of shape (n_categories, n_bins + 2); column 0 is the
+#              underflow (and NaN), column -1 the overflow
+# Filling a block is one np.bincount, so spectra over a whole file cost
+# constant memory, and histograms with the same binning add up exactly
+# across blocks, chunks and worker processes.
+
+
+def new_histogram(low: float, high: float, n_bins: int, log: bool = False, n_categories: int = 1) -> dict:
+    if log:
+        edges = np.logspace(np.log10(low), np.log10(high), n_bins + 1)
+    else:
+        edges = np.linspace(low, high, n_bins + 1)
+    return {
+        'edges': edges,
+        'log': bool(log),
+        'counts': np.zeros((n_categories, n_bins + 2), dtype=np.int64),
+    }
+
+
+def bin_index(hist: dict, values) -> np.ndarray:
+    """
+    Bin of every value: 0 = underflow / NaN, 1..n_bins, n_bins + 1 = overflow.
+    Bins are half-open [edge_i, edge_i+1).
+    """
+    edges = hist['edges']
+    n_bins = edges.size - 1
+    values = np.asarray(values)
+    if values.dtype != np.float32:
+        values = values.astype(np.float64, copy=False)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if hist['log']:
+            t = np.log10(values)
+            low, high = np.log10(edges[0]), np.log10(edges[-1])
+        else:
+            t = values.copy()
+            low, high = edges[0], edges[-1]
+        t -= low
+        t *= n_bins / (high - low)
+    np.floor(t, out=t)
+    # fmax/fmin (unlike clip) turn NaN into the underflow bin
+    np.fmax(t, -1, out=t)
+    np.fmin(t, n_bins, out=t)
+    return t.astype(np.intp) + 1
+
+
+def fill(hist: dict, values, categories=None) -> dict:
+    """
+    Add a block of values (optionally with a category per value, e.g. the
+    particle_species category) to hist in place.
+    """
+    counts = hist['counts']
+    n_cat, width = counts.shape
+    index = bin_index(hist, values)
+    if categories is not None:
+        index += np.asarray(categories, dtype=np.intp) * width
+    counts += np.bincount(index, minlength=n_cat * width).reshape(n_cat, width)
+    return hist
+
+
+def merge_histograms(a: dict, b: dict) -> dict:
+    """
+    Sum of two histograms with the same binning.
+    """
+    if a['log'] != b['log'] or not np.array_equal(a['edges'], b['edges']):
+        raise ValueError("Histograms have different binning")
+    return {'edges': a['edges'], 'log': a['log'], 'counts': a['counts'] + b['counts']}
+
+
+def bin_centers(hist: dict) -> np.ndarray:
+    edges = hist['edges']
+    if hist['log']:
+        return np.sqrt(edges[:-1] * edges[1:])
+    return 0.5 * (edges[:-1] + edges[1:])
+
+
+def in_range(hist: dict) -> np.ndarray:
+    """
+    Counts without the underflow and overflow columns.
+    """
+    return hist['counts'][:, 1:-1]
+
+
+def save_histograms(path: str, hists: dict) -> None:
+    """
+    Write a {name: histogram} dict to one .npz file.
+    """
+    arrays = {}
+    for name, hist in hists.items():
+        arrays[f'{name}/edges'] = hist['edges']
+        arrays[f'{name}/log'] = np.array(hist['log'])
+        arrays[f'{name}/counts'] = hist['counts']
+    np.savez_compressed(path, **arrays)
+
+
+def load_histograms(path: str) -> dict:
+    hists = {}
+    with np.load(path) as saved:
+        for key in saved.files:
+            name, field = key.rsplit('/', 1)
+            hists.setdefault(name, {})[field] = saved[key]
+    for hist in hists.values():
+        hist['log'] = bool(hist['log'])
+    return hists
@@ -0,0 +1,185 @@
+import contextlib
+import cProfile
+import json
+import os
+import platform
+import pstats
+import time
+import tracemalloc
+
+# Stage timers and counters for the analysis scripts.
+# A run is a plain dict {'stages': {name: {'seconds', 'calls'}}, 'counters':
+# {name: n}} that is recorded into while it is active in a process:
+#     with recording(run):
+#         with stage('statistics'):
+#             ...
+#         count('events', n)
+# The readers call stage() / count() unconditionally; without an active
+# run those are no-ops costing one global lookup per block. Worker
+# processes record their own run and send it back with their result, and
+# merge_runs() adds the runs up, so stage seconds are summed over workers
+# (CPU-side time, not wall time). Stages can nest ('read' contains
+# 'parse'), so their seconds do not add up to the wall time.
+# Optionally each recording also captures cProfile hot spots and the
+# tracemalloc peak, at a noticeable cost in speed.
+
+top_functions = 25         # Hot spots kept in the cProfile part of a report
+
+_active = None             # Run recorded into by stage() / count() in this process
+
+
+def new_run() -> dict:
+    return {'stages': {}, 'counters': {}}
+
+
+@contextlib.contextmanager
+def recording(run: dict, capture=()):
+    """
+    Make run the active run of this process while the block executes.
+    capture can hold 'cprofile' and / or 'tracemalloc'.
+    """
+    global _active
+    previous, _active = _active, run
+    profiler = cProfile.Profile() if 'cprofile' in capture else None
+    trace = 'tracemalloc' in capture and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield run
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            run['cprofile'] = merge_profiles(run.get('cprofile', {}), _profile_entries(profiler))
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            run['tracemalloc_peak_mb'] = max(run.get('tracemalloc_peak_mb', 0.0), peak / (1 << 20))
+        _active = previous
+
+
+def active() -> bool:
+    return _active is not None
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """
+    Add the wall time of the block to stage name of the active run.
+    """
+    run = _active
+    if run is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = run['stages'].setdefault(name, {'seconds': 0.0, 'calls': 0})
+        entry['seconds'] += time.perf_counter() - start
+        entry['calls'] += 1
+
+
+def timed_iter(name: str, iterable):
+    """
+    Yield from iterable, adding the time spent producing each item to stage
+    name (e.g. the I/O behind a block generator).
+    """
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def count(name: str, n: int = 1) -> None:
+    if _active is not None:
+        counters = _active['counters']
+        counters[name] = counters.get(name, 0) + int(n)
+
+
+def _profile_entries(profiler) -> dict:
+    stats = pstats.Stats(profiler).stats
+    return {f"{os.path.basename(file)}:{line}({func})": [calls, tottime, cumtime]
+            for (file, line, func), (_, calls, tottime, cumtime, _) in stats.items()}
+
+
+def merge_profiles(a: dict, b: dict) -> dict:
+    merged = {key: list(value) for key, value in a.items()}
+    for key, value in b.items():
+        entry = merged.setdefault(key, [0, 0.0, 0.0])
+        for i in range(3):
+            entry[i] += value[i]
+    return merged
+
+
+def merge_runs(a: dict, b: dict) -> dict:
+    """
+    Combine two runs (e.g. of two worker tasks) into one.
+    """
+    merged = new_run()
+    for run in (a, b):
+        for name, entry in run['stages'].items():
+            total = merged['stages'].setdefault(name, {'seconds': 0.0, 'calls': 0})
+            total['seconds'] += entry['seconds']
+            total['calls'] += entry['calls']
+        for name, n in run['counters'].items():
+            merged['counters'][name] = merged['counters'].get(name, 0) + n
+    if 'cprofile' in a or 'cprofile' in b:
+        merged['cprofile'] = merge_profiles(a.get('cprofile', {}), b.get('cprofile', {}))
+    if 'tracemalloc_peak_mb' in a or 'tracemalloc_peak_mb' in b:
+        merged['tracemalloc_peak_mb'] = max(a.get('tracemalloc_peak_mb', 0.0), b.get('tracemalloc_peak_mb', 0.0))
+    return merged
+
+
+def run_report(run: dict, script: str, wall_s: float, **info) -> dict:
+    """
+    JSON-ready report of a run: stages sorted by time with their share of
+    the summed stage time, counters, derived rates and optional captures.
+    """
+    stages = sorted(run['stages'].items(), key=lambda item: -item[1]['seconds'])
+    counters = run['counters']
+    rates = {}
+    for name, seconds_of in (('bytes_read', 'read'), ('lines_parsed', 'parse'), ('particles', 'statistics')):
+        seconds = run['stages'].get(seconds_of, {}).get('seconds', 0.0)
+        if name in counters and seconds > 0:
+            rates[f'{name}_per_s_in_{seconds_of}'] = counters[name] / seconds
+    report = {
+        'script': script,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'wall_s': wall_s,
+        'stages': {name: dict(entry) for name, entry in stages},
+        'counters': dict(counters),
+        'rates': rates,
+    }
+    report.update(info)
+    if 'cprofile' in run:
+        hot = sorted(run['cprofile'].items(), key=lambda item: -item[1][1])[:top_functions]
+        report['cprofile'] = [{'function': key, 'calls': calls, 'tottime': tottime, 'cumtime': cumtime}
+                              for key, (calls, tottime, cumtime) in hot]
+    if 'tracemalloc_peak_mb' in run:
+        report['tracemalloc_peak_mb'] = run['tracemalloc_peak_mb']
+    return report
+
+
+def write_report(report: dict, path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=1)
+
+
+def print_stages(report: dict) -> None:
+    """
+    One line per stage: seconds, calls and share of the summed stage time.
+    """
+    total = sum(entry['seconds'] for entry in report['stages'].values()) or 1.0
+    for name, entry in report['stages'].items():
+        print(f"  {name:<12} {entry['seconds']:9.3f} s  {entry['calls']:6d} calls  "
+              f"{100 * entry['seconds'] / total:5.1f}%")
+    if report['counters']:
+        print("  " + ", ".join(f"{name}={n:,}" for name, n in report['counters'].items()))
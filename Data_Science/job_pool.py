@@ -0,0 +1,57 @@
+import concurrent.futures
+import os
+import sys
+import time
+
+# Ordered, bounded process-pool runner for per-file jobs.
+# At most max_pending jobs are queued at any time, results are handed back
+# in input order (so printed output does not depend on scheduling) and a
+# progress line with files/sec and particles/sec goes to stderr.
+
+
+def report_progress(done: int, total: int, particles: int, elapsed: float) -> None:
+    rate = done / elapsed if elapsed > 0 else 0.0
+    prate = particles / elapsed if elapsed > 0 else 0.0
+    print(f"[{done}/{total} files] {rate:.2f} files/s, {prate:,.0f} particles/s",
+          file=sys.stderr, flush=True)
+
+
+def run_ordered(job, items: list, workers: int = None, max_pending: int = None,
+                count_key: str = 'particles', progress: bool = True):
+    """
+    Run job(item) for every item in a process pool and yield (item, result)
+    in input order. count_key names the result entry holding the number of
+    particles the job processed (used for the particles/sec rate).
+    """
+    items = list(items)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    start = time.perf_counter()
+    done = particles = 0
+    finished = {}
+    next_out = 0
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as exe:
+        pending = {}
+        queue = iter(enumerate(items))
+        for i, item in queue:
+            pending[exe.submit(job, item)] = i
+            if len(pending) >= max_pending:
+                break
+        while pending:
+            completed, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in completed:
+                i = pending.pop(future)
+                finished[i] = future.result()
+                done += 1
+                particles += finished[i].get(count_key, 0) if isinstance(finished[i], dict) else 0
+                if progress:
+                    report_progress(done, len(items), particles, time.perf_counter() - start)
+            # top the queue back up
+            for i, item in queue:
+                pending[exe.submit(job, item)] = i
+                if len(pending) >= max_pending:
+                    break
+            while next_out in finished:
+                yield items[next_out], finished.pop(next_out)
+                next_out += 1
@@ -0,0 +1,93 @@
+import numpy as np
+
+# Vectorized kinematics on particle arrays (momenta in GeV/c).
+# Every function takes an optional out= array of the right size, so a hot
+# loop can reuse the same buffers for every block instead of allocating
+# new temporaries.
+
+PION_MASS = 0.13957039     # GeV/c², default mass for rapidity / energy
+
+# Masses (GeV/c²) per species name of particle_species.SPECIES_TABLE
+SPECIES_MASS = {
+    'pi+': 0.13957039, 'pi-': 0.13957039, 'pi0': 0.1349768,
+    'K+': 0.493677, 'K-': 0.493677, 'K0': 0.497611,
+    'p': 0.93827209, 'pbar': 0.93827209, 'n': 0.93956542, 'nbar': 0.93956542,
+    'gamma': 0.0, 'e-': 0.000510999, 'e+': 0.000510999,
+    'mu-': 0.1056584, 'mu+': 0.1056584,
+}
+
+
+def work_buffer(buffers: dict, name: str, n: int, dtype=np.float64) -> np.ndarray:
+    """
+    Length-n view of a reusable scratch array kept in buffers[name];
+    the array only grows when a larger block comes along.
+    """
+    buf = buffers.get(name)
+    if buf is None or buf.size < n or buf.dtype != dtype:
+        buf = np.empty(max(n, 1), dtype=dtype)
+        buffers[name] = buf
+    return buf[:n]
+
+
+def transverse_momentum(px, py, out=None) -> np.ndarray:
+    """
+    pT = sqrt(px² + py²)
+    """
+    return np.hypot(px, py, out=out)
+
+
+def momentum(px, py, pz, out=None, pt=None) -> np.ndarray:
+    """
+    p = sqrt(px² + py² + pz²). Pass pt if it is already known.
+    """
+    if pt is None:
+        pt = transverse_momentum(px, py, out=out)
+    return np.hypot(pt, pz, out=out)
+
+
+def pseudorapidity(px, py, pz, out=None, p=None) -> np.ndarray:
+    """
+    eta = arctanh(pz / p). Particles along the beam axis (pz == ±p) get ±inf
+    and particles at rest get 0, without NaNs or floating point warnings.
+    """
+    if p is None:
+        p = momentum(px, py, pz, out=out)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eta = np.divide(pz, p, out=out)
+        np.arctanh(eta, out=eta)
+    # 0/0 (p == 0) is the only source of NaN left
+    return np.nan_to_num(eta, copy=False, nan=0.0, posinf=np.inf, neginf=-np.inf)
+
+
+def azimuth(px, py, out=None) -> np.ndarray:
+    """
+    phi = atan2(py, px), in (-pi, pi]
+    """
+    return np.arctan2(py, px, out=out)
+
+
+def energy(px, py, pz, mass=PION_MASS, out=None) -> np.ndarray:
+    """
+    E = sqrt(p² + m²), mass can be a scalar or a per-particle array.
+    """
+    e = momentum(px, py, pz, out=out)
+    return np.hypot(e, mass, out=e)
+
+
+def rapidity(px, py, pz, mass=PION_MASS, out=None) -> np.ndarray:
+    """
+    y = arctanh(pz / E). Massless particles along the beam axis get ±inf.
+    """
+    y = energy(px, py, pz, mass, out=out)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(pz, y, out=y)
+        np.arctanh(y, out=y)
+    return np.nan_to_num(y, copy=False, nan=0.0, posinf=np.inf, neginf=-np.inf)
+
+
+def species_masses(categories, classifier: dict) -> np.ndarray:
+    """
+    Per-particle mass from particle_species categories (0 for unknown species).
+    """
+    table = np.array([SPECIES_MASS.get(name, 0.0) for name in classifier['names']])
+    return table[categories]
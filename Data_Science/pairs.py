@@ -0,0 +1,134 @@
+import numpy as np
+from particle_species import DEFAULT_CLASSIFIER, category, classify
+from kinematics import SPECIES_MASS
+from histograms import new_histogram, fill
+
+# Same-event pair observables: invariant mass, opening angle and delta phi
+# of e.g. every pi+ pi- combination of an event.
+# The pairs of one event are the cartesian product of its first- and
+# second-species particles. Instead of a double loop per event, each pair
+# of a block gets a flat pair number: event e owns the pair numbers
+# pair_offsets[e]:pair_offsets[e+1] and its pair k is
+# (first particle k // n_second, second particle k % n_second).
+# Pair numbers are evaluated max_pairs at a time, so a block with
+# high-multiplicity events needs bounded memory like everything else.
+
+max_pairs = 1 << 21        # Pairs evaluated at once (roughly 150 MB of temporaries)
+
+# Pair histogram binning: name -> (low, high, number of bins, log binning)
+PAIR_BINS = {
+    'mass': (0.2, 2.2, 200, False),
+    'opening_angle': (0.0, np.pi, 90, False),
+    'delta_phi': (-np.pi, np.pi, 72, False),
+}
+
+
+def segment_members(indices, offsets) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (start, count) per segment offsets[i]:offsets[i+1] of a sorted array of
+    particle indices: the members of segment i are indices[start[i]:start[i] + count[i]].
+    """
+    bounds = np.searchsorted(indices, offsets)
+    return bounds[:-1], np.diff(bounds)
+
+
+def product_pairs(first_start, n_first, second_start, n_second, chunk: int = None):
+    """
+    Yield (segment, first, second) index arrays covering the cartesian
+    product first x second of every segment, at most chunk pairs at a time.
+    first / second index the member arrays segment_members describes.
+    """
+    chunk = chunk or max_pairs
+    n_second = np.asarray(n_second, dtype=np.int64)
+    pair_offsets = np.zeros(n_second.size + 1, dtype=np.int64)
+    np.cumsum(np.asarray(n_first, dtype=np.int64) * n_second, out=pair_offsets[1:])
+    n_pairs = int(pair_offsets[-1])
+    for start in range(0, n_pairs, chunk):
+        k = np.arange(start, min(start + chunk, n_pairs), dtype=np.int64)
+        segment = np.searchsorted(pair_offsets, k, side='right') - 1
+        local = k - pair_offsets[segment]
+        width = n_second[segment]
+        yield segment, first_start[segment] + local // width, second_start[segment] + local % width
+
+
+def pair_observables(a: tuple, b: tuple, mass_a: float, mass_b: float, observables=None) -> dict:
+    """
+    Invariant mass, opening angle and delta phi (wrapped to [-pi, pi)) of
+    pairs of momenta a = (px, py, pz), b = (px, py, pz) with the given masses.
+    observables limits the work to some of them (default: all of PAIR_BINS).
+    """
+    observables = PAIR_BINS if observables is None else observables
+    px1, py1, pz1 = a
+    px2, py2, pz2 = b
+    out = {}
+    if 'mass' in observables or 'opening_angle' in observables:
+        p1 = np.sqrt(px1 * px1 + py1 * py1 + pz1 * pz1)
+        p2 = np.sqrt(px2 * px2 + py2 * py2 + pz2 * pz2)
+        dot = px1 * px2 + py1 * py2 + pz1 * pz2
+    if 'mass' in observables:
+        # m² = m1² + m2² + 2 (E1 E2 - p1·p2), no cancellation between large E and |p|
+        m2 = np.sqrt(p1 * p1 + mass_a * mass_a) * np.sqrt(p2 * p2 + mass_b * mass_b)
+        m2 -= dot
+        m2 *= 2
+        m2 += mass_a * mass_a + mass_b * mass_b
+        out['mass'] = np.sqrt(np.maximum(m2, 0, out=m2), out=m2)
+    if 'opening_angle' in observables:
+        norm = p1 * p2
+        cos = np.divide(dot, norm, out=np.ones_like(dot), where=norm > 0)
+        np.clip(cos, -1.0, 1.0, out=cos)
+        out['opening_angle'] = np.arccos(cos, out=cos)
+    if 'delta_phi' in observables:
+        dphi = np.arctan2(py1, px1) - np.arctan2(py2, px2)
+        dphi += np.pi
+        np.mod(dphi, 2 * np.pi, out=dphi)
+        dphi -= np.pi
+        out['delta_phi'] = dphi
+    return out
+
+
+def _momenta(cols: dict, index) -> tuple:
+    return cols['px'][index], cols['py'][index], cols['pz'][index]
+
+
+def iter_pairs(cols: dict, first: str = 'pi+', second: str = 'pi-', species=None,
+               classifier: dict = None, chunk: int = None, observables=None):
+    """
+    Yield pair observables of all same-event first x second pairs of a
+    column dict, chunk pairs at a time, plus 'event' (the index of the
+    event in cols). For first == second every unordered pair appears once.
+    species can pass already classified particles.
+    """
+    classifier = DEFAULT_CLASSIFIER if classifier is None else classifier
+    if species is None:
+        species = classify(cols['pdg'], classifier)
+    offsets = cols['event_offsets']
+    first_idx = np.flatnonzero(species == category(first, classifier))
+    second_idx = first_idx if second == first else np.flatnonzero(species == category(second, classifier))
+    first_start, n_first = segment_members(first_idx, offsets)
+    second_start, n_second = segment_members(second_idx, offsets)
+    for event, i, j in product_pairs(first_start, n_first, second_start, n_second, chunk):
+        if second == first:
+            keep = i < j
+            event, i, j = event[keep], i[keep], j[keep]
+        pairs = pair_observables(_momenta(cols, first_idx[i]), _momenta(cols, second_idx[j]),
+                                 SPECIES_MASS[first], SPECIES_MASS[second], observables)
+        pairs['event'] = event
+        yield pairs
+
+
+def new_pair_histograms(bins: dict = None) -> dict:
+    return {name: new_histogram(*spec) for name, spec in (bins or PAIR_BINS).items()}
+
+
+def fill_pairs(hists: dict, cols: dict, first: str = 'pi+', second: str = 'pi-', species=None,
+               classifier: dict = None) -> int:
+    """
+    Fill every histogram of hists (keyed by observable) with the same-event
+    pairs of cols; returns the number of pairs.
+    """
+    n_pairs = 0
+    for pairs in iter_pairs(cols, first, second, species, classifier, observables=tuple(hists)):
+        for name, hist in hists.items():
+            fill(hist, pairs[name])
+        n_pairs += pairs['event'].size
+    return n_pairs
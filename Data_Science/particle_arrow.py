@@ -0,0 +1,148 @@
+import argparse
+import os
+import numpy as np
+from particle_reader import iter_blocks, event_index
+
+# Parquet / Arrow IPC copies of the particle files, for pandas, DuckDB & co.
+# One row per particle with columns px, py, pz, pdg, event_id. Every block
+# of particle_reader (which always starts on an event header) becomes one
+# Parquet row group / one Arrow record batch, so no event straddles two of
+# them and readers can stream group by group.
+# particle_reader.read_particles / iter_blocks read these files directly;
+# with columns= only the requested particle columns are decoded (event_id
+# is always read, it defines the events).
+# Events without particles have no rows, so they are not kept.
+# Needs the optional pyarrow package.
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+FIELDS = ('px', 'py', 'pz', 'pdg', 'event_id')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet / Arrow files need the pyarrow package (pip install pyarrow)") from None
+    return pyarrow
+
+
+def columnar_format(path: str):
+    """
+    'parquet', 'arrow' or None, from the file extension.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PARQUET_SUFFIXES:
+        return 'parquet'
+    if ext in ARROW_SUFFIXES:
+        return 'arrow'
+    return None
+
+
+def _schema(pa, momentum_dtype):
+    momentum = pa.from_numpy_dtype(np.dtype(momentum_dtype))
+    return pa.schema([('px', momentum), ('py', momentum), ('pz', momentum),
+                      ('pdg', pa.int32()), ('event_id', pa.int64())])
+
+
+def _block_table(pa, cols: dict, schema):
+    index = event_index(cols)
+    event_id = np.where(index >= 0, cols['event_id'][np.maximum(index, 0)], -1)
+    arrays = [cols['px'], cols['py'], cols['pz'], cols['pdg'], event_id]
+    return pa.table([pa.array(np.asarray(a, dtype=field.type.to_pandas_dtype()))
+                     for a, field in zip(arrays, schema)], schema=schema)
+
+
+def convert(path: str, out: str, compression: str = 'zstd', block_size: int = None,
+            momentum_dtype=np.float64) -> dict:
+    """
+    Stream a particle text file (plain or compressed) into out (.parquet or
+    .arrow), one row group / record batch per event block.
+    Returns {'particles', 'row_groups'}.
+    """
+    pa = _pyarrow()
+    fmt = columnar_format(out)
+    if fmt is None:
+        raise ValueError(f"Unknown output format for {out} (use .parquet or .arrow)")
+    schema = _schema(pa, momentum_dtype)
+    compression = None if compression == 'none' else compression
+    particles = groups = 0
+    if fmt == 'parquet':
+        writer = pa.parquet.ParquetWriter(out, schema, compression=compression or 'none')
+    else:
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        writer = pa.ipc.new_file(out, schema, options=options)
+    with writer:
+        for cols in iter_blocks(path, block_size):
+            if cols['px'].size == 0:
+                continue
+            table = _block_table(pa, cols, schema)
+            if fmt == 'parquet':
+                writer.write_table(table, row_group_size=table.num_rows)
+            else:
+                for batch in table.to_batches(max_chunksize=table.num_rows):
+                    writer.write_batch(batch)
+            particles += table.num_rows
+            groups += 1
+    return {'particles': particles, 'row_groups': groups}
+
+
+def _columns_from_table(table) -> dict:
+    """
+    Column dict (particle_reader layout) from a table with an event_id column.
+    """
+    event_id = table.column('event_id').to_numpy()
+    cols = {name: table.column(name).to_numpy() for name in table.column_names if name != 'event_id'}
+    # rows with event_id -1 (particles before the first header) can only lead the file
+    lead = int(np.count_nonzero(event_id < 0))
+    body = event_id[lead:]
+    # a new event starts wherever event_id changes
+    starts = lead + np.flatnonzero(np.diff(body, prepend=body[:1] - 1))
+    cols['event_id'] = body[starts - lead].astype(np.int64)
+    cols['event_offsets'] = np.append(starts, event_id.size).astype(np.int64)
+    cols['n_particles'] = np.diff(cols['event_offsets']).astype(np.int32)
+    return cols
+
+
+def iter_columnar_blocks(path: str, columns=None):
+    """
+    Yield column dicts per Parquet row group / Arrow record batch, reading
+    only the requested columns (plus event_id).
+    """
+    pa = _pyarrow()
+    names = [name for name in FIELDS if columns is None or name in columns or name == 'event_id']
+    if columnar_format(path) == 'parquet':
+        parquet = pa.parquet.ParquetFile(path)
+        for group in range(parquet.num_row_groups):
+            yield _columns_from_table(parquet.read_row_group(group, columns=names))
+    else:
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i).select(names)
+                yield _columns_from_table(pa.Table.from_batches([batch]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert output-SetN.txt particle files to Parquet or Arrow IPC.")
+    parser.add_argument("files", nargs='+', help="Particle text files (.txt, .gz, .zst, .lz4).")
+    parser.add_argument("--format", choices=('parquet', 'arrow'), default='parquet', help="Output format.")
+    parser.add_argument("--out-dir", help="Folder for the converted files (default: next to the input).")
+    parser.add_argument("--compression", default='zstd', help="zstd, lz4, none, or snappy / gzip (Parquet only).")
+    parser.add_argument("--float32", action='store_true', help="Store px, py, pz as float32.")
+    args = parser.parse_args()
+
+    suffix = '.parquet' if args.format == 'parquet' else '.arrow'
+    for path in args.files:
+        stem = os.path.basename(path).split('.')[0]
+        out = os.path.join(args.out_dir or os.path.dirname(path), stem + suffix)
+        stats = convert(path, out, args.compression,
+                        momentum_dtype=np.float32 if args.float32 else np.float64)
+        print(f"Wrote {out}: {stats['particles']:,} particles in {stats['row_groups']} row groups "
+              f"({os.path.getsize(out):,} bytes)")
+
+
+if __name__ == '__main__':
+    main()
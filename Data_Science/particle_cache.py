@@ -0,0 +1,186 @@
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from particle_reader import (COLUMNS, empty_columns, iter_blocks, truncate_columns, project_columns,
+                             read_particles, new_error_report, rejected_lines)
+from particle_arrow import columnar_format
+from instrumentation import stage, count
+
+# Columnar binary cache for parsed particle files.
+# The first read of data_science/output-SetN.txt writes one .npy file per
+# column into data_science/output-SetN.txt.npcache/; later runs open them
+# with np.load(mmap_mode='r') instead of parsing the ASCII again.
+# The cache is keyed on the source path, size and mtime and is rebuilt
+# as soon as any of them changes. Lines the parser rejected are kept in
+# errors.npz, so cached reads report them like a fresh parse.
+# The sidecar is written block by block (raw column data first, .npy
+# header once the length is known), so building it holds one parsed
+# block in memory rather than the whole file.
+
+CACHE_SUFFIX = '.npcache'
+CACHE_VERSION = 2
+META_FILE = 'meta.json'
+ERRORS_FILE = 'errors.npz'
+
+
+def cache_dir(path: str) -> str:
+    return path + CACHE_SUFFIX
+
+
+def _source_key(path: str, momentum_dtype) -> dict:
+    st = os.stat(path)
+    return {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(path),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'momentum_dtype': np.dtype(momentum_dtype).name,
+    }
+
+
+def _read_meta(directory: str) -> dict:
+    try:
+        with open(os.path.join(directory, META_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(path: str, momentum_dtype=np.float64) -> bool:
+    """
+    True if the sidecar of path exists and matches the current file.
+    """
+    return _read_meta(cache_dir(path)) == _source_key(path, momentum_dtype)
+
+
+def _finish_column(base: str, dtype, size: int) -> None:
+    """
+    Turn the raw column data in base.raw into base.npy of size elements.
+    """
+    header = {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)), 'fortran_order': False, 'shape': (size,)}
+    with open(base + '.npy', 'wb') as out, open(base + '.raw', 'rb') as raw:
+        np.lib.format.write_array_header_1_0(out, header)
+        shutil.copyfileobj(raw, out)
+    os.remove(base + '.raw')
+
+
+def write_cache(path: str, blocks, momentum_dtype=np.float64, report: dict = None) -> bool:
+    """
+    Write the columns of consecutive blocks of a file (e.g. iter_blocks, or
+    [cols] for a whole file) next to it, one block at a time. report is
+    saved once all blocks are written. The sidecar is built in a temporary
+    directory and moved into place, so readers never see half of it.
+    Returns False if it could not be written.
+    """
+    key = _source_key(path, momentum_dtype)
+    target = cache_dir(path)
+    dtypes = {name: col.dtype for name, col in empty_columns().items()}
+    dtypes.update(dict.fromkeys(('px', 'py', 'pz'), np.dtype(momentum_dtype)))
+    sizes = dict.fromkeys(COLUMNS, 0)
+    tmp = None
+    try:
+        tmp = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(os.path.abspath(path)))
+        shift = 0
+        with contextlib.ExitStack() as files:
+            raw = {name: files.enter_context(open(os.path.join(tmp, name + '.raw'), 'wb')) for name in COLUMNS}
+            for cols in blocks:
+                offsets = cols['event_offsets']
+                cols = dict(cols, event_offsets=offsets[:-1] + shift)
+                shift += int(offsets[-1])
+                for name in COLUMNS:
+                    data = np.ascontiguousarray(cols[name], dtype=dtypes[name])
+                    data.tofile(raw[name])
+                    sizes[name] += data.size
+            np.array([shift], dtype=dtypes['event_offsets']).tofile(raw['event_offsets'])
+            sizes['event_offsets'] += 1
+        for name in COLUMNS:
+            _finish_column(os.path.join(tmp, name), dtypes[name], sizes[name])
+        rows, reasons = rejected_lines(report if report is not None else new_error_report())
+        np.savez(os.path.join(tmp, ERRORS_FILE), rows=rows, reasons=reasons)
+        with open(os.path.join(tmp, META_FILE), 'w') as f:
+            json.dump(key, f)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.rename(tmp, target)
+    except OSError:
+        # another process got there first, or the data folder is read-only
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+        return False
+    return True
+
+
+def _merge_report(report: dict, rows, reasons) -> None:
+    if report is not None and len(rows):
+        report['rows'].append(np.asarray(rows))
+        report['reasons'].append(np.asarray(reasons))
+
+
+def _read_text(path: str, max_particles: int = None, max_events: int = None, momentum_dtype=np.float64,
+               columns=None, report: dict = None) -> dict:
+    cols = read_particles(path, max_particles, max_events, columns, report)
+    for name in ('px', 'py', 'pz'):
+        if name in cols:
+            cols[name] = cols[name].astype(momentum_dtype, copy=False)
+    return cols
+
+
+def build_cache(path: str, momentum_dtype=np.float64, report: dict = None) -> dict:
+    """
+    Parse the file block by block into a sidecar and return its memory-mapped
+    columns. If no sidecar can be written the file is parsed into memory.
+    """
+    errors = new_error_report()
+    write_cache(path, iter_blocks(path, report=errors), momentum_dtype, errors)
+    if is_fresh(path, momentum_dtype):
+        try:
+            return open_cache(path, report)
+        except (OSError, ValueError, KeyError):
+            pass
+    return _read_text(path, momentum_dtype=momentum_dtype, report=report)
+
+
+def open_cache(path: str, report: dict = None) -> dict:
+    """
+    Memory-map the columns of an existing sidecar (no data is copied).
+    """
+    directory = cache_dir(path)
+    cols = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+            for name in COLUMNS}
+    if report is not None:
+        with np.load(os.path.join(directory, ERRORS_FILE)) as errors:
+            _merge_report(report, errors['rows'], errors['reasons'])
+    return cols
+
+
+def load_particles(path: str, max_particles: int = None, max_events: int = None,
+                   momentum_dtype=np.float64, columns=None, report: dict = None) -> dict:
+    """
+    Same columns as particle_reader.read_particles, served from the binary
+    sidecar when it is fresh and (re)built from the text file otherwise.
+    Parquet / Arrow files are already columnar and are read directly.
+    report receives the rejected lines of the whole file when the sidecar
+    is used. A head-limited read (max_particles / max_events) without a
+    fresh sidecar parses just the blocks it needs and builds no sidecar;
+    report then only covers those blocks.
+    """
+    if columnar_format(path):
+        return read_particles(path, max_particles, max_events, columns)
+    cols = None
+    fresh = is_fresh(path, momentum_dtype)
+    if not fresh and (max_particles is not None or max_events is not None):
+        return _read_text(path, max_particles, max_events, momentum_dtype, columns, report)
+    if fresh:
+        try:
+            with stage('cache_open'):
+                cols = open_cache(path, report)
+            count('bytes_mapped', sum(cols[name].nbytes for name in COLUMNS))
+        except (OSError, ValueError, KeyError):
+            pass
+    if cols is None:
+        with stage('cache_build'):
+            cols = build_cache(path, momentum_dtype, report)
+    return truncate_columns(project_columns(cols, columns), max_particles, max_events)
@@ -0,0 +1,147 @@
+import mmap
+import os
+import numpy as np
+from particle_reader import iter_block_bytes, parse_block, _parse_lines
+from compressed_io import compression_of
+from instrumentation import stage, count
+
+# Event index for random access into output-Set*.txt files.
+# For every "event_id n_particles" header the index keeps its byte offset,
+# so an event range or a random sample of events can be cut straight out of
+# a memory-mapped file instead of reading the file from the start.
+# The index is saved next to the data as <file>.evindex.npz and rebuilt
+# when the size or mtime of the data file changes.
+# Only headers parse_block accepts start an event, so event i of the index
+# is event i of read_particles (malformed headers and their particles stay
+# inside the span of the previous event, as when parsing the whole file).
+
+INDEX_SUFFIX = '.evindex.npz'
+INDEX_VERSION = 2          # Bump when the index layout or its event definition changes
+
+
+def index_path(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+def _line_starts(buf: bytes) -> np.ndarray:
+    """
+    Byte offset (inside buf) of every line.
+    """
+    return np.concatenate([[0], np.flatnonzero(np.frombuffer(buf, dtype=np.uint8) == ord('\n')) + 1])
+
+
+def build_event_index(path: str) -> dict:
+    """
+    Scan the file once and return offset / n_particles / event_id per event,
+    plus the file size in 'end' so event i spans offset[i]:offset[i+1]
+    (or offset[-1]:end for the last one).
+    """
+    if compression_of(path):
+        raise ValueError(f"{path} is compressed; byte offsets need the plain file (use the .npcache instead)")
+    st = os.stat(path)
+    offsets, counts, ids = [], [], []
+    pos = 0
+    for buf in iter_block_bytes(path):
+        cols, header_lines = _parse_lines(buf)
+        offsets.append(_line_starts(buf)[header_lines] + pos)
+        counts.append(cols['n_particles'])
+        ids.append(cols['event_id'])
+        pos += len(buf)
+    return {
+        'offset': np.concatenate(offsets) if offsets else np.empty(0, dtype=np.int64),
+        'n_particles': np.concatenate(counts) if counts else np.empty(0, dtype=np.int32),
+        'event_id': np.concatenate(ids) if ids else np.empty(0, dtype=np.int64),
+        'end': st.st_size,
+        'version': INDEX_VERSION,
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+    }
+
+
+def load_event_index(path: str) -> dict:
+    """
+    Load the saved index of path, building (and saving) it when missing or stale.
+    """
+    st = os.stat(path)
+    try:
+        with np.load(index_path(path)) as saved:
+            index = {name: saved[name] for name in saved.files}
+        if (int(index['version']) == INDEX_VERSION and int(index['size']) == st.st_size
+                and int(index['mtime_ns']) == st.st_mtime_ns):
+            index['end'] = int(index['end'])
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    index = build_event_index(path)
+    try:
+        with open(index_path(path), 'wb') as f:
+            np.savez(f, **index)
+    except OSError:
+        pass    # read-only data folder, keep the index in memory only
+    return index
+
+
+def event_bounds(index: dict) -> np.ndarray:
+    """
+    Byte range of every event: bounds[i]:bounds[i+1] is event i.
+    """
+    return np.append(index['offset'], index['end'])
+
+
+def _open_map(path: str):
+    f = open(path, 'rb')
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+
+
+def read_event_range(path: str, start: int, stop: int, index: dict = None) -> dict:
+    """
+    Parse events start..stop-1 only; nothing before them is read.
+    """
+    index = index if index is not None else load_event_index(path)
+    bounds = event_bounds(index)
+    n_events = bounds.size - 1
+    start, stop = max(0, start), min(stop, n_events)
+    if start >= stop:
+        return parse_block(b'')
+    with stage('read'), _open_map(path) as mm:
+        buf = mm[bounds[start]:bounds[stop]]
+    count('bytes_read', len(buf))
+    with stage('parse'):
+        return parse_block(buf)
+
+
+def read_events(path: str, events, index: dict = None) -> dict:
+    """
+    Parse an arbitrary set of events (event numbers, not event ids),
+    returned in increasing file order.
+    """
+    index = index if index is not None else load_event_index(path)
+    bounds = event_bounds(index)
+    events = np.unique(np.asarray(events, dtype=np.int64))
+    events = events[(events >= 0) & (events < bounds.size - 1)]
+    if events.size == 0:
+        return parse_block(b'')
+    # neighbouring events are read as one contiguous slice
+    run_starts = np.flatnonzero(np.diff(events, prepend=-2) != 1)
+    run_stops = np.append(run_starts[1:], events.size)
+    with stage('read'), _open_map(path) as mm:
+        buf = b''.join(mm[bounds[events[a]]:bounds[events[b - 1] + 1]]
+                       for a, b in zip(run_starts, run_stops))
+    count('bytes_read', len(buf))
+    with stage('parse'):
+        return parse_block(buf)
+
+
+def sample_events(path: str, n: int, seed: int = None, index: dict = None) -> dict:
+    """
+    Parse a uniform random sample of n events from the whole file.
+    """
+    index = index if index is not None else load_event_index(path)
+    n_events = index['offset'].size
+    if n >= n_events:
+        return read_event_range(path, 0, n_events, index)
+    rng = np.random.default_rng(seed)
+    return read_events(path, rng.choice(n_events, size=n, replace=False), index)
@@ -0,0 +1,462 @@
+import numpy as np
+from compressed_io import iter_chunks
+from instrumentation import stage, count, timed_iter, active
+
+# Bulk reader for the output-Set*.txt format:
+#   event_id n_particles      <- event header (2 fields)
+#   px py pz pdg              <- one line per particle (4 fields)
+# Whole blocks of the file are turned into NumPy columns in one pass,
+# instead of calling split()/float()/int() for every particle line.
+# Files ending in .gz, .zst or .lz4 are decompressed on the fly (compressed_io);
+# .parquet / .arrow copies (particle_arrow) are read natively, and columns=
+# limits which particle columns are returned (and, for those, decoded).
+
+block_size = 1 << 24       # Bytes read per block (16 MiB)
+search_fanout = 64         # Pieces a failing line range is cut into when locating unparsable lines
+
+COLUMNS = ('px', 'py', 'pz', 'pdg', 'event_id', 'n_particles', 'event_offsets')
+PARTICLE_COLUMNS = ('px', 'py', 'pz', 'pdg')
+
+
+def empty_columns() -> dict:
+    """
+    Return a column dict with no particles and no events.
+    """
+    return {
+        'px': np.empty(0, dtype=np.float64),
+        'py': np.empty(0, dtype=np.float64),
+        'pz': np.empty(0, dtype=np.float64),
+        'pdg': np.empty(0, dtype=np.int32),
+        'event_id': np.empty(0, dtype=np.int64),
+        'n_particles': np.empty(0, dtype=np.int32),
+        'event_offsets': np.zeros(1, dtype=np.int64),
+    }
+
+
+def _line_layout(buf: bytes) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Count the whitespace separated fields on every line of buf.
+    Returns (fields_per_line, first_token_index_per_line).
+    """
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    # Space, tab, CR, LF and the other control bytes all separate fields
+    ws = raw <= 32
+    # A field starts on a non-whitespace byte that follows whitespace (or the buffer start)
+    starts = ~ws
+    starts[1:] &= ws[:-1]
+    newlines = np.flatnonzero(raw == 10)
+    # Line number of every field = number of newlines in front of it
+    line_of_field = np.searchsorted(newlines, np.flatnonzero(starts))
+    fields = np.bincount(line_of_field, minlength=newlines.size + 1)
+    first_token = np.cumsum(fields) - fields
+    return fields, first_token
+
+
+# Reasons recorded for rejected lines in an error report
+REJECT_REASONS = (
+    'unparsable number',        # a field is not a number
+    'wrong field count',        # 1 or 3 fields: neither a header nor a particle
+    'non-finite momentum',      # px / py / pz is nan or inf
+    'non-integer pdg',
+    'bad header',               # non-integer event id / count, or a negative count
+    'particle count mismatch',  # header count differs from the particle lines that follow (line kept)
+)
+
+# Bytes that can appear in a number understood by np.fromstring (plus whitespace)
+_NUMBER_BYTES = np.zeros(256, dtype=bool)
+_NUMBER_BYTES[:33] = True
+_NUMBER_BYTES[np.frombuffer(b'0123456789+-.eEnaifNAIFty', dtype=np.uint8)] = True
+
+
+def new_error_report() -> dict:
+    """
+    Empty error report for parse_block / iter_blocks / read_particles:
+    1-based line numbers and REJECT_REASONS codes of the rejected lines.
+    """
+    return {'rows': [], 'reasons': [], 'lines': 0}
+
+
+def _report(report: dict, lines, reason: str, first_line: int) -> None:
+    if reason != 'particle count mismatch':
+        count('lines_rejected', len(lines))
+    if report is not None and len(lines):
+        lines = np.asarray(lines, dtype=np.int64)
+        report['rows'].append(lines + first_line + 1)
+        report['reasons'].append(np.full(lines.size, REJECT_REASONS.index(reason), dtype=np.uint8))
+
+
+def rejected_lines(report: dict) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (line numbers, reason codes) of all reported lines, in file order.
+    """
+    if not report['rows']:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8)
+    rows = np.concatenate(report['rows'])
+    reasons = np.concatenate(report['reasons'])
+    order = np.argsort(rows, kind='stable')
+    return rows[order], reasons[order]
+
+
+def error_summary(report: dict) -> dict:
+    """
+    {reason: number of lines} for the reasons that occurred.
+    """
+    _, reasons = rejected_lines(report)
+    counts = np.bincount(reasons, minlength=len(REJECT_REASONS))
+    return {reason: int(n) for reason, n in zip(REJECT_REASONS, counts) if n}
+
+
+def _search_lines(buf: bytes, line_starts: np.ndarray, token_starts: np.ndarray, lo: int, hi: int,
+                  bad: list, values: list) -> None:
+    """
+    Find the lines of lo..hi-1 (a range that fails to parse) that
+    np.fromstring cannot read. The range is cut into search_fanout pieces
+    and only the failing ones are searched further, so a few bad lines in a
+    block cost about one extra parse of the block. Bad line numbers go to
+    bad, the numbers of the readable pieces (in order) to values.
+    token_starts[i] = tokens before line i.
+    """
+    if hi - lo == 1:
+        bad.append(lo)
+        return
+    bounds = np.unique(np.linspace(lo, hi, min(search_fanout, hi - lo) + 1).astype(np.int64))
+    for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        piece = _tokens_to_float(buf[line_starts[a]:line_starts[b]], int(token_starts[b] - token_starts[a]))
+        if piece is None:
+            _search_lines(buf, line_starts, token_starts, a, b, bad, values)
+        else:
+            values.append(piece)
+
+
+def _salvage_numbers(buf: bytes, fields: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Numbers of buf without the lines that contain something that is not a
+    number, and the (0-based) numbers of those lines. fields holds the field
+    count of every line (_line_layout).
+    Only called for blocks the fast path could not read.
+    """
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    newlines = np.flatnonzero(raw == 10)
+    line_starts = np.concatenate([[0], newlines + 1, [raw.size]])
+    # stray characters are found in one vectorized pass...
+    bad = np.unique(np.searchsorted(newlines, np.flatnonzero(~_NUMBER_BYTES[raw])))
+    tokens = fields.copy()
+    tokens[bad] = 0
+    token_starts = np.concatenate([[0], np.cumsum(tokens)])
+    if bad.size:
+        raw = raw.copy()
+        for line in bad:
+            span = raw[line_starts[line]:line_starts[line + 1]]
+            span[span != 10] = 32
+        buf = raw.tobytes()
+        values = _tokens_to_float(buf, int(token_starts[-1]))
+        if values is not None:
+            return values, bad
+    # ...malformed numbers made of valid characters (1.2.3, 1e, --) by a search over line ranges
+    more, pieces = [], []
+    _search_lines(buf, line_starts, token_starts, 0, line_starts.size - 1, more, pieces)
+    values = np.concatenate(pieces) if pieces else np.empty(0)
+    return values, np.union1d(bad, more).astype(np.int64)
+
+
+def _tokens_to_float(buf: bytes, n_tokens: int) -> np.ndarray:
+    """
+    All numbers of buf, or None if some token is not a number.
+    """
+    if not n_tokens:
+        return np.empty(0)
+    try:
+        values = np.fromstring(buf, dtype=np.float64, sep=' ')
+    except ValueError:
+        # NumPy >= 2.3 raises where older versions stopped early with a warning
+        return None
+    return values if values.size == n_tokens else None
+
+
+def parse_block(buf: bytes, report: dict = None, first_line: int = 0) -> dict:
+    """
+    Parse a block of whole lines into NumPy columns.
+
+    Lines with 2 fields are event headers, lines with 4 or more fields are
+    particles (px, py, pz from the first three fields, pdg from the last one,
+    like the goal scripts), blank lines are skipped.
+    Anything else is rejected without raising: lines with non-numeric
+    fields or 1 / 3 fields, particles with a non-finite momentum or a
+    non-integer pdg, and malformed headers. With a report (new_error_report)
+    their line numbers (first_line = lines before buf in the file) and
+    reasons are recorded there. Well-formed blocks never leave the
+    vectorized fast path.
+    event_offsets[i] is the index of the first particle of event i and
+    event_offsets[-1] is the total particle count.
+    """
+    return _parse_lines(buf, report, first_line)[0]
+
+
+def _parse_lines(buf: bytes, report: dict = None, first_line: int = 0) -> tuple[dict, np.ndarray]:
+    """
+    parse_block plus the (0-based) line numbers in buf of the accepted
+    event headers, one per event.
+    """
+    fields, first_token = _line_layout(buf)
+    values = _tokens_to_float(buf, int(fields.sum()))
+    if values is None:
+        values, bad = _salvage_numbers(buf, fields)
+        _report(report, bad, 'unparsable number', first_line)
+        fields = fields.copy()
+        fields[bad] = 0
+        first_token = np.cumsum(fields) - fields
+
+    is_header = fields == 2
+    is_particle = fields >= 4
+    odd = (fields == 1) | (fields == 3)
+    if odd.any():
+        _report(report, np.flatnonzero(odd), 'wrong field count', first_line)
+
+    # value checks on the candidate lines, rejected lines are dropped
+    line_no = np.flatnonzero(is_particle)
+    tok = first_token[is_particle]
+    momenta = values[tok], values[tok + 1], values[tok + 2]
+    pdg = values[tok + fields[is_particle] - 1]
+    finite = np.isfinite(momenta[0]) & np.isfinite(momenta[1]) & np.isfinite(momenta[2])
+    integral = pdg == np.round(pdg)
+    if not (finite.all() and integral.all()):
+        _report(report, line_no[~finite], 'non-finite momentum', first_line)
+        _report(report, line_no[finite & ~integral], 'non-integer pdg', first_line)
+        is_particle[line_no[~(finite & integral)]] = False
+        keep = finite & integral
+        momenta = tuple(m[keep] for m in momenta)
+        pdg = pdg[keep]
+
+    line_no = np.flatnonzero(is_header)
+    tok = first_token[is_header]
+    event_id, declared = values[tok], values[tok + 1]
+    good = (event_id == np.round(event_id)) & (declared == np.round(declared)) & (declared >= 0)
+    if not good.all():
+        _report(report, line_no[~good], 'bad header', first_line)
+        is_header[line_no[~good]] = False
+        event_id, declared = event_id[good], declared[good]
+
+    particles_before = np.cumsum(is_particle) - is_particle
+    event_offsets = np.empty(int(is_header.sum()) + 1, dtype=np.int64)
+    event_offsets[:-1] = particles_before[is_header]
+    event_offsets[-1] = pdg.size
+    if report is not None:
+        mismatch = np.diff(event_offsets) != declared
+        _report(report, np.flatnonzero(is_header)[mismatch], 'particle count mismatch', first_line)
+
+    if active():
+        count('lines_parsed', buf.count(b'\n') + (not buf.endswith(b'\n') and len(buf) > 0))
+        count('particles_parsed', pdg.size)
+        count('events_parsed', event_id.size)
+    cols = {
+        'px': momenta[0],
+        'py': momenta[1],
+        'pz': momenta[2],
+        'pdg': pdg.astype(np.int32),
+        'event_id': event_id.astype(np.int64),
+        'n_particles': declared.astype(np.int32),
+        'event_offsets': event_offsets,
+    }
+    return cols, np.flatnonzero(is_header)
+
+
+def _last_header_start(buf: bytes) -> int:
+    """
+    Byte offset of the last event header line in buf (-1 if there is none).
+    Only the lines of the final event are inspected.
+    """
+    end = len(buf)
+    while end > 0:
+        start = buf.rfind(b'\n', 0, end - 1) + 1
+        if len(buf[start:end].split()) == 2:
+            return start
+        end = start
+    return -1
+
+
+def iter_block_bytes(path: str, size: int = None, workers: int = None):
+    """
+    Yield the file as byte blocks that always start on an event header,
+    so no event is split between two blocks. Compressed files (.gz, .zst,
+    .lz4) are decompressed on the fly, multi-frame ones with workers processes.
+    """
+    size = size or block_size
+    pending = b''
+    for chunk in iter_chunks(path, size, workers):
+        buf = pending + chunk
+        cut = _last_header_start(buf[:buf.rfind(b'\n') + 1])
+        if cut <= 0:
+            # a single event larger than the block, keep reading
+            pending = buf
+            continue
+        pending = buf[cut:]
+        yield buf[:cut]
+    if pending:
+        yield pending
+
+
+def particle_columns(cols: dict) -> list:
+    """
+    The per-particle columns present in a (possibly projected) column dict.
+    """
+    return [name for name in PARTICLE_COLUMNS if name in cols]
+
+
+def project_columns(cols: dict, columns=None) -> dict:
+    """
+    Drop the particle columns not listed in columns (event columns always stay).
+    """
+    if columns is None:
+        return cols
+    return {name: value for name, value in cols.items()
+            if name not in PARTICLE_COLUMNS or name in columns}
+
+
+def _parsed_blocks(path: str, size: int = None, columns=None, report: dict = None):
+    from particle_arrow import columnar_format, iter_columnar_blocks
+    if columnar_format(path):
+        yield from iter_columnar_blocks(path, columns)
+        return
+    for buf in timed_iter('read', iter_block_bytes(path, size)):
+        count('bytes_read', len(buf))
+        first_line = report['lines'] if report is not None else 0
+        with stage('parse'):
+            cols = parse_block(buf, report, first_line)
+        if report is not None:
+            report['lines'] += buf.count(b'\n')
+        yield project_columns(cols, columns)
+
+
+def iter_blocks(path: str, size: int = None, max_particles: int = None, columns=None,
+                report: dict = None):
+    """
+    Yield parsed column dicts for consecutive blocks of a file,
+    stopping after the first max_particles particles.
+    Rejected lines are recorded in report (see parse_block).
+    """
+    remaining = max_particles
+    for cols in _parsed_blocks(path, size, columns, report):
+        if remaining is not None:
+            cols = truncate_columns(cols, max_particles=remaining)
+            remaining -= int(cols['event_offsets'][-1])
+        yield cols
+        if remaining is not None and remaining <= 0:
+            break
+
+
+def concat_columns(blocks: list) -> dict:
+    """
+    Join column dicts from consecutive blocks into a single dict.
+    """
+    if not blocks:
+        return empty_columns()
+    if len(blocks) == 1:
+        return blocks[0]
+    out = {name: np.concatenate([b[name] for b in blocks])
+           for name in COLUMNS if name != 'event_offsets' and name in blocks[0]}
+    shift = 0
+    offsets = []
+    for b in blocks:
+        offsets.append(b['event_offsets'][:-1] + shift)
+        shift += int(b['event_offsets'][-1])
+    offsets.append(np.array([shift], dtype=np.int64))
+    out['event_offsets'] = np.concatenate(offsets)
+    return out
+
+
+def truncate_columns(cols: dict, max_particles: int = None, max_events: int = None) -> dict:
+    """
+    Keep only the first max_particles particles and/or the first max_events events.
+    """
+    offsets = cols['event_offsets']
+    n_events = offsets.size - 1
+    n_part = int(offsets[-1])
+    if max_events is not None and max_events < n_events:
+        n_events = max_events
+        n_part = int(offsets[n_events])
+    if max_particles is not None and max_particles < n_part:
+        n_part = max_particles
+        # drop events that start after the last kept particle
+        n_events = min(n_events, int(np.searchsorted(offsets[:-1], n_part, side='left')))
+    if n_events == offsets.size - 1 and n_part == offsets[-1]:
+        return cols
+    out = {name: cols[name][:n_part] for name in particle_columns(cols)}
+    out['event_id'] = cols['event_id'][:n_events]
+    out['n_particles'] = cols['n_particles'][:n_events]
+    out['event_offsets'] = np.append(offsets[:n_events], n_part)
+    return out
+
+
+def split_columns(cols: dict, n_particles: int = 1 << 20):
+    """
+    Yield event-aligned slices of roughly n_particles particles of a column
+    dict, e.g. to stream through a memory-mapped cache block by block.
+    """
+    offsets = cols['event_offsets']
+    n_events = offsets.size - 1
+    start = 0
+    while start < n_events:
+        stop = int(np.searchsorted(offsets, offsets[start] + n_particles, side='right')) - 1
+        stop = min(max(stop, start + 1), n_events)
+        yield select_events(cols, range(start, stop))
+        start = stop
+
+
+def read_particles(path: str, max_particles: int = None, max_events: int = None, columns=None,
+                   report: dict = None) -> dict:
+    """
+    Read a whole particle file (or its first max_particles particles /
+    max_events events) into NumPy columns:
+    px, py, pz (float64), pdg (int32), event_id (int64), n_particles (int32)
+    and event_offsets (int64, one entry per event plus the end).
+    """
+    blocks = []
+    n_part = n_events = 0
+    for cols in iter_blocks(path, columns=columns, report=report):
+        blocks.append(cols)
+        n_part += int(cols['event_offsets'][-1])
+        n_events += cols['event_id'].size
+        if (max_particles is not None and n_part >= max_particles) or \
+           (max_events is not None and n_events >= max_events):
+            break
+    return truncate_columns(concat_columns(blocks), max_particles, max_events)
+
+
+def event_index(cols: dict) -> np.ndarray:
+    """
+    Event number (0-based position in the file) of every particle.
+    """
+    offsets = cols['event_offsets']
+    counts = np.diff(offsets)
+    index = np.repeat(np.arange(counts.size), counts)
+    # particles in front of the first header (if any) belong to no event
+    return np.concatenate([np.full(offsets[0], -1), index]) if offsets[0] else index
+
+
+def select_events(cols: dict, events) -> dict:
+    """
+    Columns of the given events only (event numbers, in the order given).
+    A range is served as a slice of the original arrays, without copying.
+    """
+    offsets = cols['event_offsets']
+    if isinstance(events, range) and events.step == 1:
+        start = min(events.start, offsets.size - 1)
+        stop = max(start, min(events.stop, offsets.size - 1))
+        first, last = int(offsets[start]), int(offsets[stop])
+        out = {name: cols[name][first:last] for name in particle_columns(cols)}
+        out['event_id'] = cols['event_id'][start:stop]
+        out['n_particles'] = cols['n_particles'][start:stop]
+        out['event_offsets'] = offsets[start:stop + 1] - first
+        return out
+    events = np.asarray(events, dtype=np.int64)
+    starts = offsets[events]
+    counts = offsets[events + 1] - starts
+    new_offsets = np.zeros(events.size + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_offsets[1:])
+    # position of every kept particle in the original columns
+    take = np.repeat(starts - new_offsets[:-1], counts) + np.arange(new_offsets[-1])
+    out = {name: cols[name][take] for name in particle_columns(cols)}
+    out['event_id'] = cols['event_id'][events]
+    out['n_particles'] = cols['n_particles'][events]
+    out['event_offsets'] = new_offsets
+    return out
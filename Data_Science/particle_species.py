@@ -0,0 +1,113 @@
+import numpy as np
+
+# Particle species classification for whole PDG arrays.
+# A species table (name -> PDG codes) is compiled once into a dense lookup
+# array over the PDG code range, so classifying N particles is a single
+# fancy-indexing operation instead of an if/elif chain per particle.
+# Category 0 is always 'other' (every code not listed in the table).
+# Tables whose codes span a huge range (nuclei have 10-digit PDG codes)
+# fall back to a binary search over the sorted codes.
+
+max_lut_size = 1 << 16     # Largest code span compiled into a dense lookup array
+
+SPECIES_TABLE = {
+    'pi+': [211],
+    'pi-': [-211],
+    'pi0': [111],
+    'K+': [321],
+    'K-': [-321],
+    'K0': [130, 310, 311, -311],
+    'p': [2212],
+    'pbar': [-2212],
+    'n': [2112],
+    'nbar': [-2112],
+    'gamma': [22],
+    'e-': [11],
+    'e+': [-11],
+    'mu-': [13],
+    'mu+': [-13],
+}
+
+
+def load_species_table(path: str) -> dict:
+    """
+    Read a species table from a text file, one species per line:
+        name code [code ...]
+    Empty lines and lines starting with # are skipped.
+    """
+    table = {}
+    with open(path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if not parts or parts[0].startswith('#'):
+                continue
+            table[parts[0]] = [int(code) for code in parts[1:]]
+    return table
+
+
+def make_classifier(table: dict = None) -> dict:
+    """
+    Compile a species table into a lookup classifier.
+    """
+    table = SPECIES_TABLE if table is None else table
+    names = ['other'] + list(table)
+    codes = [code for species in table.values() for code in species]
+    low = min(codes, default=0)
+    high = max(codes, default=0)
+    dtype = np.uint8 if len(names) < 256 else np.uint16
+    if high - low + 3 > max_lut_size:
+        # a later species wins a code listed twice, as with the dense array
+        category_of = {code: category for category, species in enumerate(table.values(), start=1)
+                       for code in species}
+        sorted_codes = np.array(sorted(category_of), dtype=np.int64)
+        return {'names': names, 'index': {name: i for i, name in enumerate(names)},
+                'codes': sorted_codes,
+                'categories': np.array([category_of[code] for code in sorted_codes.tolist()], dtype=dtype)}
+    # slot 0 and the last slot catch every code outside [low, high]
+    lut = np.zeros(high - low + 3, dtype=dtype)
+    for category, species in enumerate(table.values(), start=1):
+        lut[np.asarray(species, dtype=np.int64) - low + 1] = category
+    return {'names': names, 'index': {name: i for i, name in enumerate(names)},
+            'lut': lut, 'offset': low - 1}
+
+
+DEFAULT_CLASSIFIER = make_classifier()
+
+
+def classify(pdg, classifier: dict = None) -> np.ndarray:
+    """
+    Species category of every PDG code (0 = other).
+    """
+    classifier = DEFAULT_CLASSIFIER if classifier is None else classifier
+    if 'codes' in classifier:
+        return _search_classify(np.asarray(pdg, dtype=np.int64), classifier)
+    lut = classifier['lut']
+    slot = np.asarray(pdg, dtype=np.int64) - classifier['offset']
+    np.clip(slot, 0, lut.size - 1, out=slot)
+    return lut[slot]
+
+
+def _search_classify(pdg: np.ndarray, classifier: dict) -> np.ndarray:
+    codes = classifier['codes']
+    out = np.zeros(pdg.shape, dtype=classifier['categories'].dtype)
+    if codes.size == 0:
+        return out
+    slot = np.searchsorted(codes, pdg)
+    np.clip(slot, 0, codes.size - 1, out=slot)
+    found = codes[slot] == pdg
+    out[found] = classifier['categories'][slot[found]]
+    return out
+
+
+def category(name: str, classifier: dict = None) -> int:
+    classifier = DEFAULT_CLASSIFIER if classifier is None else classifier
+    return classifier['index'][name]
+
+
+def species_counts(pdg, classifier: dict = None) -> dict:
+    """
+    Number of particles of every species in the table (plus 'other').
+    """
+    classifier = DEFAULT_CLASSIFIER if classifier is None else classifier
+    counts = np.bincount(classify(pdg, classifier), minlength=len(classifier['names']))
+    return dict(zip(classifier['names'], counts.tolist()))
@@ -0,0 +1,71 @@
+import concurrent.futures
+from matplotlib.figure import Figure
+
+# Headless plotting off the analysis critical path.
+# Figures are built with matplotlib.figure.Figure (Agg canvas, no pyplot
+# state, never plt.show()) and written straight to PNG. A plotter is a
+# plain dict holding a small process pool: the analysis submits a render
+# job as soon as a file's numbers are ready and keeps going, and
+# close_plotter() waits for the outstanding PNGs at the very end.
+# make_plots = False turns all of it into no-ops for throughput runs.
+
+make_plots = True      # Render PNG figures at all
+plot_workers = 1       # Processes rendering figures next to the analysis
+
+
+def new_figure(figsize=(8, 5)):
+    """
+    Figure plus its single Axes, independent of any GUI backend.
+    """
+    fig = Figure(figsize=figsize)
+    return fig, fig.add_subplot()
+
+
+def line_plot(task: dict) -> str:
+    """
+    Render a simple line plot; task holds 'file', 'x', 'series' as
+    [(y, label, marker), ...], and optional 'xlabel', 'ylabel', 'title'.
+    """
+    fig, ax = new_figure(task.get('figsize', (8, 5)))
+    for y, label, marker in task['series']:
+        ax.plot(task['x'], y, marker=marker, label=label)
+    ax.set_xlabel(task.get('xlabel', ''))
+    ax.set_ylabel(task.get('ylabel', ''))
+    ax.set_title(task.get('title', ''))
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(task['file'])
+    return task['file']
+
+
+def new_plotter(enabled: bool = None, workers: int = None) -> dict:
+    enabled = make_plots if enabled is None else enabled
+    exe = None
+    if enabled:
+        exe = concurrent.futures.ProcessPoolExecutor(max_workers=workers or plot_workers)
+    return {'exe': exe, 'futures': []}
+
+
+def submit_plot(plotter: dict, render, *args) -> None:
+    """
+    Queue render(*args) (a module-level function returning the file name).
+    """
+    if plotter['exe'] is not None:
+        plotter['futures'].append(plotter['exe'].submit(render, *args))
+
+
+def close_plotter(plotter: dict) -> list:
+    """
+    Wait for every queued figure, print and return the saved file names.
+    """
+    saved = []
+    if plotter['exe'] is None:
+        return saved
+    try:
+        for future in plotter['futures']:
+            saved.append(future.result())
+            print(f"Saved plot: {saved[-1]}")
+    finally:
+        plotter['exe'].shutdown()
+        plotter['futures'] = []
+    return saved
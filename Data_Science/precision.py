@@ -0,0 +1,74 @@
+import math
+import numpy as np
+
+# Reduced-precision compute mode.
+# The momenta in output-SetN.txt carry about six significant digits, so
+# px, py, pz fit float32 without losing anything the file holds, and every
+# kinematics / aggregation pass then streams half the bytes through memory.
+# Only storage and per-particle maths drop to float32: totals are taken in
+# float64 (np.add.reduce with dtype=float64 sums a block pairwise), goal4
+# combines chunk totals with math.fsum and streamed moments use Welford
+# updates (streaming_stats), so long streams of blocks do not drift.
+
+PRECISIONS = {'float64': np.float64, 'float32': np.float32}
+
+
+def momentum_dtype(precision: str) -> np.dtype:
+    """
+    NumPy dtype for px, py, pz in the given precision mode.
+    """
+    try:
+        return np.dtype(PRECISIONS[precision])
+    except KeyError:
+        raise ValueError(f"Unknown precision {precision!r} (use {', '.join(PRECISIONS)})") from None
+
+
+def as_precision(cols: dict, precision: str) -> dict:
+    """
+    Column dict with px, py, pz in the given precision (no copy if they already are).
+    """
+    dtype = momentum_dtype(precision)
+    cols = dict(cols)
+    for name in ('px', 'py', 'pz'):
+        if name in cols:
+            cols[name] = np.asarray(cols[name]).astype(dtype, copy=False)
+    return cols
+
+
+def total(values) -> float:
+    """
+    Sum of an array accumulated in float64, whatever its dtype.
+    """
+    return float(np.add.reduce(np.asarray(values).ravel(), dtype=np.float64))
+
+
+def precision_loss(reference: dict, reduced: dict) -> dict:
+    """
+    {name: {'reference', 'reduced', 'abs_diff', 'rel_diff'}} for the numeric
+    entries two result dicts have in common, e.g. a float64 and a float32
+    run of the same analysis.
+    """
+    loss = {}
+    for name, ref in reference.items():
+        value = reduced.get(name)
+        if isinstance(ref, bool) or not isinstance(ref, (int, float, np.number)) \
+                or not isinstance(value, (int, float, np.number)):
+            continue
+        diff = abs(float(value) - float(ref))
+        loss[name] = {
+            'reference': float(ref),
+            'reduced': float(value),
+            'abs_diff': diff,
+            'rel_diff': diff / abs(ref) if ref else (0.0 if diff == 0 else math.inf),
+        }
+    return loss
+
+
+def worst_loss(loss: dict) -> tuple:
+    """
+    (name, rel_diff) of the entry of precision_loss with the largest relative error.
+    """
+    if not loss:
+        return None, 0.0
+    name = max(loss, key=lambda k: loss[k]['rel_diff'])
+    return name, loss[name]['rel_diff']
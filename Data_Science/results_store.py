@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+
+# Persistent per-file results for incremental re-analysis.
+# A store is a JSON file mapping each data file to its content fingerprint
+# (size, mtime and a hash of a few sampled 64 KiB windows), the analysis
+# settings and the summary dict that was computed for it. A rerun only
+# analyses files that are new, changed, or were analysed with other
+# settings, and reuses the stored summaries for everything else.
+
+STORE_VERSION = 1
+sample_bytes = 1 << 16     # Bytes hashed per sampled window
+n_samples = 4              # Windows spread evenly over the file (plus the last bytes)
+
+
+def fingerprint(path: str):
+    """
+    {'size', 'mtime_ns', 'sample_hash'} of a file, None if it cannot be read.
+    """
+    try:
+        st = os.stat(path)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(st.st_size.to_bytes(8, 'little'))
+        with open(path, 'rb') as f:
+            step = max(st.st_size // n_samples, 1)
+            for offset in list(range(0, st.st_size, step))[:n_samples] + [max(st.st_size - sample_bytes, 0)]:
+                f.seek(offset)
+                digest.update(f.read(sample_bytes))
+    except OSError:
+        return None
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sample_hash': digest.hexdigest()}
+
+
+def load_store(store_path: str) -> dict:
+    """
+    Load a results store, or start an empty one (missing, unreadable or old format).
+    """
+    try:
+        with open(store_path, 'r') as f:
+            store = json.load(f)
+        if store.get('version') == STORE_VERSION:
+            return store
+    except (OSError, ValueError):
+        pass
+    return {'version': STORE_VERSION, 'files': {}}
+
+
+def save_store(store: dict, store_path: str) -> None:
+    """
+    Write the store atomically, so an interrupted run never leaves a broken file.
+    """
+    tmp = store_path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(store, f, indent=1)
+    os.replace(tmp, store_path)
+
+
+def lookup(store: dict, path: str, config: dict, fp: dict = None):
+    """
+    Stored result of path if its fingerprint and the analysis config still
+    match, else None.
+    """
+    entry = store['files'].get(os.path.abspath(path))
+    fp = fp if fp is not None else fingerprint(path)
+    if entry is None or fp is None or entry['fingerprint'] != fp or entry['config'] != config:
+        return None
+    return entry['result']
+
+
+def record(store: dict, path: str, config: dict, result: dict, fp: dict = None) -> None:
+    fp = fp if fp is not None else fingerprint(path)
+    if fp is not None:
+        store['files'][os.path.abspath(path)] = {'fingerprint': fp, 'config': config, 'result': result}
+
+
+def split_cached(store: dict, paths: list, config: dict) -> tuple[dict, list, dict]:
+    """
+    ({path: stored result}, [paths to analyse], {path: fingerprint}).
+    Fingerprints are taken before the analysis, so a file that changes while
+    it is being analysed is picked up again on the next run.
+    """
+    cached, todo, fps = {}, [], {}
+    for path in paths:
+        fps[path] = fingerprint(path)
+        result = lookup(store, path, config, fps[path])
+        if result is None:
+            todo.append(path)
+        else:
+            cached[path] = result
+    return cached, todo, fps
@@ -0,0 +1,321 @@
+import ast
+import functools
+import numpy as np
+from particle_reader import event_index, select_events
+from particle_species import DEFAULT_CLASSIFIER, category, classify
+from kinematics import transverse_momentum, momentum, pseudorapidity, azimuth, energy, rapidity, species_masses
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+# Selection language for particle / event cuts, e.g.
+#   "pT > 0.5 and abs(eta) < 2.4 and pdg in (211, -211)"
+#   "species in ('pi+', 'pi-') and p < 10"
+#   "n_particles >= 20 and count(species == 'pi+' and pT > 1) >= 2"   (event level)
+# The text is parsed once with the Python ast module (only the whitelisted
+# names, functions and operators below are accepted, nothing is eval'd) and
+# compiled into a tree of NumPy calls producing a boolean mask for a whole
+# block of columns. When numexpr is installed, expressions it can handle are
+# also evaluated through it. Derived variables (pT, eta, ...) are only
+# computed for blocks of expressions that use them, once per block.
+
+backend = 'auto'           # 'numpy', 'numexpr' or 'auto' (numexpr when installed and possible)
+
+# Per-particle variables
+PARTICLE_VARIABLES = ('px', 'py', 'pz', 'pdg', 'pT', 'p', 'eta', 'phi', 'y', 'E', 'mass',
+                      'species', 'event_id', 'n_particles')
+# Per-event variables (level='event'), plus count(<particle cut>)
+EVENT_VARIABLES = ('event_id', 'n_particles')
+
+FUNCTIONS = {
+    'abs': np.abs, 'sqrt': np.sqrt, 'log': np.log, 'log10': np.log10, 'exp': np.exp,
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan, 'arctanh': np.arctanh,
+    'min': np.minimum, 'max': np.maximum,
+}
+NUMEXPR_FUNCTIONS = ('abs', 'sqrt', 'log', 'log10', 'exp', 'sin', 'cos', 'tan', 'arctanh')
+
+BINARY_OPS = {
+    ast.Add: (np.add, '+'), ast.Sub: (np.subtract, '-'), ast.Mult: (np.multiply, '*'),
+    ast.Div: (np.true_divide, '/'), ast.Pow: (np.power, '**'), ast.Mod: (np.mod, '%'),
+}
+COMPARE_OPS = {
+    ast.Lt: (np.less, '<'), ast.LtE: (np.less_equal, '<='), ast.Gt: (np.greater, '>'),
+    ast.GtE: (np.greater_equal, '>='), ast.Eq: (np.equal, '=='), ast.NotEq: (np.not_equal, '!='),
+}
+
+
+def _particle_variable(env: dict, name: str):
+    cache = env['cache']
+    if name in cache:
+        return cache[name]
+    cols = env['cols']
+    if name == 'event':
+        value = event_index(cols)
+    elif name in ('px', 'py', 'pz', 'pdg'):
+        value = cols[name]
+    elif name == 'pT':
+        value = transverse_momentum(cols['px'], cols['py'])
+    elif name == 'p':
+        value = momentum(cols['px'], cols['py'], cols['pz'], pt=_particle_variable(env, 'pT'))
+    elif name == 'eta':
+        value = pseudorapidity(cols['px'], cols['py'], cols['pz'], p=_particle_variable(env, 'p'))
+    elif name == 'phi':
+        value = azimuth(cols['px'], cols['py'])
+    elif name == 'species':
+        value = classify(cols['pdg'], env['classifier'])
+    elif name == 'mass':
+        value = species_masses(_particle_variable(env, 'species'), env['classifier'])
+    elif name == 'E':
+        value = energy(cols['px'], cols['py'], cols['pz'], _particle_variable(env, 'mass'))
+    elif name == 'y':
+        value = rapidity(cols['px'], cols['py'], cols['pz'], _particle_variable(env, 'mass'))
+    else:
+        # event columns broadcast to their particles (-1 before the first header)
+        index = _particle_variable(env, 'event')
+        value = np.where(index >= 0, cols[name][index], -1)
+    cache[name] = value
+    return value
+
+
+def _event_variable(env: dict, name: str):
+    return env['cols'][name]
+
+
+def _compile(node, level: str, names: set):
+    """
+    (function of env, numexpr source or None) for an ast node.
+    """
+    if isinstance(node, ast.Expression):
+        return _compile(node.body, level, names)
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile(value, level, names) for value in node.values]
+        reduce = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        sep = ' & ' if isinstance(node.op, ast.And) else ' | '
+        funcs = [f for f, _ in parts]
+        src = '(' + sep.join(s for _, s in parts) + ')' if all(s for _, s in parts) else None
+        return (lambda env: functools.reduce(reduce, (f(env) for f in funcs))), src
+
+    if isinstance(node, ast.UnaryOp):
+        f, s = _compile(node.operand, level, names)
+        if isinstance(node.op, ast.Not):
+            return (lambda env: np.logical_not(f(env))), s and f'~({s})'
+        if isinstance(node.op, ast.USub):
+            return (lambda env: np.negative(f(env))), s and f'-({s})'
+        if isinstance(node.op, ast.UAdd):
+            return f, s
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+        op, sym = BINARY_OPS[type(node.op)]
+        (fa, sa), (fb, sb) = _compile(node.left, level, names), _compile(node.right, level, names)
+        return (lambda env: op(fa(env), fb(env))), sa and sb and f'({sa} {sym} {sb})'
+
+    if isinstance(node, ast.Compare):
+        terms = []
+        operands = [node.left] + node.comparators
+        left = _operand(operands, 0, level, names)
+        for i, (op, comparator) in enumerate(zip(node.ops, node.comparators)):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                negate = isinstance(op, ast.NotIn)
+                terms.append(_membership(left, comparator, negate, _is_species(operands[i])))
+                left = None     # a chain continuing after 'in' has no left operand
+                continue
+            if type(op) not in COMPARE_OPS or left is None:
+                raise ValueError(f"Unsupported comparison: {ast.unparse(node)}")
+            right = _operand(operands, i + 1, level, names)
+            func, sym = COMPARE_OPS[type(op)]
+            (fa, sa), (fb, sb) = left, right
+            terms.append(((lambda env, func=func, fa=fa, fb=fb: func(fa(env), fb(env))),
+                          sa and sb and f'({sa} {sym} {sb})'))
+            left = right
+        if len(terms) == 1:
+            return terms[0]
+        funcs = [f for f, _ in terms]
+        src = '(' + ' & '.join(s for _, s in terms) + ')' if all(s for _, s in terms) else None
+        return (lambda env: functools.reduce(np.logical_and, (f(env) for f in funcs))), src
+
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, str):
+            raise ValueError(f"Species name '{node.value}' can only be compared with species")
+        value = _constant(node)
+        return (lambda env: value), repr(value)
+
+    if isinstance(node, ast.Name):
+        allowed = PARTICLE_VARIABLES if level == 'particle' else EVENT_VARIABLES
+        if node.id not in allowed:
+            raise ValueError(f"Unknown {level} variable '{node.id}' (known: {', '.join(allowed)})")
+        names.add(node.id)
+        getter = _particle_variable if level == 'particle' else _event_variable
+        name = node.id
+        return (lambda env: getter(env, name)), name
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        name = node.func.id
+        if name == 'count' and level == 'event' and len(node.args) == 1:
+            inner, _ = _compile(node.args[0], 'particle', set())
+            return (lambda env: _count_per_event(env, inner)), None
+        if name in FUNCTIONS:
+            args = [_compile(arg, level, names) for arg in node.args]
+            func = FUNCTIONS[name]
+            funcs = [f for f, _ in args]
+            src = None
+            if name in NUMEXPR_FUNCTIONS and all(s for _, s in args):
+                src = f"{name}({', '.join(s for _, s in args)})"
+            return (lambda env: func(*(f(env) for f in funcs))), src
+        raise ValueError(f"Unknown function '{name}' (known: {', '.join(FUNCTIONS)}"
+                         + (", count" if level == 'event' else "") + ")")
+
+    raise ValueError(f"Unsupported expression: {ast.unparse(node)}")
+
+
+def _is_species(node) -> bool:
+    return isinstance(node, ast.Name) and node.id == 'species'
+
+
+def _operand(operands: list, i: int, level: str, names: set):
+    """
+    Compile operand i of a comparison chain. A species name is only
+    accepted where every operand it is compared with is species.
+    """
+    node = operands[i]
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        neighbours = operands[max(i - 1, 0):i] + operands[i + 1:i + 2]
+        if not all(_is_species(other) for other in neighbours):
+            raise ValueError(f"Species name '{node.value}' can only be compared with species")
+        value = _constant(node)
+        return (lambda env: value), repr(value)
+    return _compile(node, level, names)
+
+
+def _constant(node):
+    value = node.value
+    if isinstance(value, str):
+        # strings are species names of the PDG table
+        try:
+            return category(value)
+        except KeyError:
+            raise ValueError(f"Unknown species '{value}'") from None
+    if isinstance(value, (bool, int, float)):
+        return value
+    raise ValueError(f"Unsupported constant: {value!r}")
+
+
+def _membership(left, node, negate: bool, species: bool):
+    if not isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+        raise ValueError(f"'in' needs a tuple of constants, got {ast.unparse(node)}")
+    values = []
+    for item in node.elts:
+        sign = 1
+        if isinstance(item, ast.UnaryOp) and isinstance(item.op, (ast.USub, ast.UAdd)):
+            sign = -1 if isinstance(item.op, ast.USub) else 1
+            item = item.operand
+        if not isinstance(item, ast.Constant) or (sign < 0 and isinstance(item.value, str)):
+            raise ValueError(f"'in' needs a tuple of constants, got {ast.unparse(node)}")
+        if isinstance(item.value, str) and not species:
+            raise ValueError(f"Species name '{item.value}' can only be compared with species")
+        values.append(sign * _constant(item))
+    fa, sa = left
+    src = None
+    if sa and values:
+        src = '(' + ' | '.join(f'({sa} == {v!r})' for v in values) + ')'
+        src = f'~{src}' if negate else src
+    return (lambda env: np.isin(fa(env), values, invert=negate)), src
+
+
+def _count_per_event(env: dict, inner) -> np.ndarray:
+    """
+    Number of particles of every event passing a particle-level cut.
+    """
+    cols = env['cols']
+    particle_env = {'cols': cols, 'cache': env['cache'], 'classifier': env['classifier']}
+    mask = _as_mask(inner(particle_env), cols['pdg'].size)
+    index = _particle_variable(particle_env, 'event')
+    return np.bincount(index[mask & (index >= 0)], minlength=cols['event_id'].size)
+
+
+def _as_mask(value, n: int) -> np.ndarray:
+    value = np.asarray(value)
+    if value.dtype != np.bool_:
+        raise ValueError("Selection does not evaluate to a true/false condition")
+    return np.broadcast_to(value, (n,)) if value.ndim == 0 else value
+
+
+@functools.lru_cache(maxsize=64)
+def compile_selection(text: str, level: str = 'particle') -> dict:
+    """
+    Compile a selection once; cached per text, so worker processes can just
+    pass the string around. level is 'particle' or 'event'.
+    """
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Invalid selection {text!r}: {e.msg}") from None
+    names = set()
+    func, src = _compile(tree, level, names)
+    return {'text': text, 'level': level, 'func': func, 'numexpr': src, 'names': tuple(sorted(names))}
+
+
+def apply_selection(selection, cols: dict, classifier: dict = None) -> np.ndarray:
+    """
+    Boolean mask over the particles (or events, for level='event') of a
+    column dict. selection is a compiled selection or its text.
+    """
+    if isinstance(selection, str):
+        selection = compile_selection(selection)
+    env = {'cols': cols, 'cache': {}, 'classifier': classifier or DEFAULT_CLASSIFIER}
+    particle = selection['level'] == 'particle'
+    n = cols['pdg'].size if particle else cols['event_id'].size
+    use_numexpr = numexpr is not None and selection['numexpr'] and backend in ('auto', 'numexpr')
+    if use_numexpr:
+        getter = _particle_variable if particle else _event_variable
+        local = {name: getter(env, name) for name in selection['names']}
+        value = numexpr.evaluate(selection['numexpr'], local_dict=local)
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            value = selection['func'](env)
+    return _as_mask(value, n)
+
+
+def filter_particles(cols: dict, mask) -> dict:
+    """
+    Keep only the masked particles; every event stays, with n_particles and
+    event_offsets updated to the particles left in it.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    offsets = cols['event_offsets']
+    index = event_index(cols)
+    counts = np.bincount(index[mask & (index >= 0)], minlength=cols['event_id'].size)
+    new_offsets = np.empty(counts.size + 1, dtype=np.int64)
+    new_offsets[0] = np.count_nonzero(mask[:offsets[0]])
+    np.cumsum(counts, out=new_offsets[1:])
+    new_offsets[1:] += new_offsets[0]
+    out = {name: cols[name][mask] for name in ('px', 'py', 'pz', 'pdg')}
+    out['event_id'] = cols['event_id']
+    out['n_particles'] = counts.astype(np.int32)
+    out['event_offsets'] = new_offsets
+    return out
+
+
+def select(cols: dict, selection, classifier: dict = None) -> dict:
+    """
+    Columns passing a selection: particles for particle-level cuts,
+    whole events for event-level ones.
+    """
+    if isinstance(selection, str):
+        selection = compile_selection(selection)
+    mask = apply_selection(selection, cols, classifier)
+    if selection['level'] == 'event':
+        return select_events(cols, np.flatnonzero(mask))
+    return filter_particles(cols, mask)
+
+
+def iter_selected(blocks, selection, classifier: dict = None):
+    """
+    Apply a selection to every column dict of a block iterator.
+    """
+    if isinstance(selection, str):
+        selection = compile_selection(selection)
+    for cols in blocks:
+        yield select(cols, selection, classifier)
@@ -0,0 +1,46 @@
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+# NumPy arrays backed by multiprocessing.shared_memory.
+# The parent allocates the array once, workers attach to it by name and
+# write their results in place, so only small scalars travel back through
+# the process pool instead of pickled lists.
+
+
+def start_tracker() -> None:
+    """
+    Start the shared-memory resource tracker in the parent. Call it before the
+    worker pool is created, so workers report to the parent's tracker instead
+    of starting their own (which would unlink the blocks when they exit).
+    """
+    resource_tracker.ensure_running()
+
+
+def create_shared_array(shape, dtype=np.int64) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    """
+    Allocate a zero-filled shared array. The caller owns the block and must
+    close() and unlink() it when done.
+    """
+    nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array.fill(0)
+    return shm, array
+
+
+def attach_shared_array(name: str, shape, dtype=np.int64) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    """
+    Open an array created by create_shared_array in another process.
+    Only close() the returned block; the creator unlinks it.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def release_shared_array(shm: shared_memory.SharedMemory, unlink: bool = False) -> None:
+    """
+    Close (and optionally unlink) a block. Views on it must be dropped first.
+    """
+    shm.close()
+    if unlink:
+        shm.unlink()
@@ -0,0 +1,72 @@
+import numpy as np
+from scipy.stats import f as f_distribution
+
+# Streaming count / mean / M2 accumulators (Welford, merged with Chan's formula).
+# An accumulator is a plain dict, so it can be updated one NumPy block at a
+# time, merged across chunks and sent back from worker processes.
+
+
+def new_moments() -> dict:
+    return {'n': 0, 'mean': 0.0, 'm2': 0.0}
+
+
+def merge_moments(a: dict, b: dict) -> dict:
+    """
+    Combine two accumulators as if all their values had been seen by one.
+    """
+    n = a['n'] + b['n']
+    if n == 0:
+        return new_moments()
+    delta = b['mean'] - a['mean']
+    return {
+        'n': n,
+        'mean': a['mean'] + delta * b['n'] / n,
+        'm2': a['m2'] + b['m2'] + delta * delta * a['n'] * b['n'] / n,
+    }
+
+
+def block_moments(values) -> dict:
+    """
+    Accumulator for a single block of values.
+    """
+    values = np.asarray(values)
+    if values.size == 0:
+        return new_moments()
+    # float32 blocks are reduced in float64 without an upcast copy
+    mean = np.float64(values.mean(dtype=np.float64))
+    dev = values - mean
+    return {'n': int(values.size), 'mean': float(mean), 'm2': float(np.dot(dev, dev))}
+
+
+def update_moments(acc: dict, values) -> dict:
+    """
+    Add a block of values to acc (returns the updated accumulator).
+    """
+    return merge_moments(acc, block_moments(values))
+
+
+def variance(acc: dict, ddof: int = 1) -> float:
+    if acc['n'] <= ddof:
+        return float('nan')
+    return acc['m2'] / (acc['n'] - ddof)
+
+
+def one_way_anova(groups: list) -> tuple[float, float]:
+    """
+    One-way ANOVA from per-group accumulators.
+    Same F statistic and p-value as scipy.stats.f_oneway on the raw values.
+    """
+    groups = [g for g in groups if g['n'] > 0]
+    k = len(groups)
+    n_total = sum(g['n'] for g in groups)
+    if k < 2 or n_total <= k:
+        return float('nan'), float('nan')
+    grand_mean = sum(g['n'] * g['mean'] for g in groups) / n_total
+    ss_between = sum(g['n'] * (g['mean'] - grand_mean) ** 2 for g in groups)
+    ss_within = sum(g['m2'] for g in groups)
+    df_between = k - 1
+    df_within = n_total - k
+    if ss_within == 0:
+        return float('inf'), 0.0
+    f_stat = (ss_between / df_between) / (ss_within / df_within)
+    return f_stat, float(f_distribution.sf(f_stat, df_between, df_within))
@@ -0,0 +1,98 @@
+import argparse
+import os
+import numpy as np
+from particle_species import SPECIES_TABLE
+
+# Synthetic output-SetN.txt files in the exact format of the real data:
+#   event_id n_particles
+#   px py pz pdg            (n_particles lines)
+# Useful for benchmarks and tests, since the real files live off-repo.
+
+DEFAULT_MIX = {'pi+': 0.3, 'pi-': 0.3, 'pi0': 0.15, 'K+': 0.05, 'K-': 0.05,
+               'p': 0.05, 'pbar': 0.02, 'gamma': 0.08}
+
+
+def parse_mix(text: str) -> dict:
+    """
+    "pi+=0.3,pi-=0.3,p=0.1" -> {'pi+': 0.3, 'pi-': 0.3, 'p': 0.1}
+    """
+    mix = {}
+    for item in text.split(','):
+        name, weight = item.split('=')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def generate_events(n_events: int, mean_multiplicity: float = 30.0, mix: dict = None,
+                    rng: np.random.Generator = None, first_event: int = 0) -> str:
+    """
+    Text of n_events synthetic events. Multiplicities are Poisson, px/py are
+    Gaussian with 0.5 GeV/c width, pz with 2 GeV/c, PDG codes follow mix
+    (species name -> weight, names from particle_species.SPECIES_TABLE).
+    """
+    mix = mix or DEFAULT_MIX
+    rng = rng or np.random.default_rng()
+    codes = np.array([SPECIES_TABLE[name][0] for name in mix])
+    weights = np.array(list(mix.values()), dtype=np.float64)
+    counts = rng.poisson(mean_multiplicity, size=n_events)
+    n = int(counts.sum())
+    px = rng.normal(0.0, 0.5, n).tolist()
+    py = rng.normal(0.0, 0.5, n).tolist()
+    pz = rng.normal(0.0, 2.0, n).tolist()
+    pdg = rng.choice(codes, size=n, p=weights / weights.sum()).tolist()
+    particles = ['%.6f %.6f %.6f %d' % row for row in zip(px, py, pz, pdg)]
+
+    lines = []
+    start = 0
+    for event_id, count in enumerate(counts.tolist(), start=first_event):
+        lines.append(f'{event_id} {count}')
+        lines.extend(particles[start:start + count])
+        start += count
+    return '\n'.join(lines) + '\n'
+
+
+def generate_file(path: str, n_events: int, mean_multiplicity: float = 30.0, mix: dict = None,
+                  seed=None, events_per_block: int = 10000) -> int:
+    """
+    Write a synthetic particle file; returns the number of bytes written.
+    """
+    rng = np.random.default_rng(seed)
+    written = 0
+    with open(path, 'w', newline='\n') as f:
+        for first in range(0, n_events, events_per_block):
+            block = min(events_per_block, n_events - first)
+            written += f.write(generate_events(block, mean_multiplicity, mix, rng, first))
+    return written
+
+
+def generate_set(folder: str, n_files: int, n_events: int, mean_multiplicity: float = 30.0,
+                 mix: dict = None, seed: int = 0) -> list:
+    """
+    Write output-Set0.txt ... output-Set{n_files-1}.txt into folder.
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(n_files):
+        path = os.path.join(folder, f'output-Set{i}.txt')
+        generate_file(path, n_events, mean_multiplicity, mix, seed=[seed, i])
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic output-SetN.txt particle files.")
+    parser.add_argument("folder", help="Folder to write the files to.")
+    parser.add_argument("--files", type=int, default=1, help="Number of files.")
+    parser.add_argument("--events", type=int, default=10000, help="Events per file.")
+    parser.add_argument("--multiplicity", type=float, default=30.0, help="Mean particles per event.")
+    parser.add_argument("--mix", type=parse_mix, default=None,
+                        help="Species mix, e.g. 'pi+=0.3,pi-=0.3,p=0.1'.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    args = parser.parse_args()
+
+    for path in generate_set(args.folder, args.files, args.events, args.multiplicity, args.mix, args.seed):
+        print(f"Wrote {path} ({os.path.getsize(path):,} bytes)")
+
+
+if __name__ == '__main__':
+    main()
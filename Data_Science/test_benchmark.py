@@ -0,0 +1,35 @@
+import unittest
+from unittest import mock
+import benchmark
+import event_stats
+import goal3
+import goal4
+
+SETTINGS = {goal3: ('use_cache', 'precision', 'max_particles'),
+            goal4: ('use_cache', 'precision', 'max_events', 'sample_mode'),
+            event_stats: ('backend',)}
+
+
+def current_settings() -> dict:
+    return {(module.__name__, name): getattr(module, name) for module, names in SETTINGS.items() for name in names}
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_small_run_leaves_settings_alone(self):
+        before = current_settings()
+        report = benchmark.run_benchmark(200, 4.0, repeat=1, seed=1, precision='float32')
+        self.assertEqual(current_settings(), before)
+        self.assertGreater(report['particles'], 0)
+        for stage in ('parse', 'goal3', 'goal4', 'events_numpy'):
+            self.assertGreater(report['stages'][stage]['seconds'], 0)
+        self.assertTrue(report['precision_loss'])
+
+    def test_settings_restored_after_an_error(self):
+        before = current_settings()
+        with mock.patch.object(goal3, 'analyse_file', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            benchmark.precision_check('output-Set0.txt', 'float32')
+        self.assertEqual(current_settings(), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import math
+import unittest
+from unittest import mock
+import numpy as np
+import bootstrap
+from bootstrap import asymmetry, bootstrap_replicates, bootstrap_asymmetry, file_seeds, name_seed
+
+
+class TestBootstrap(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.pos = rng.poisson(50, size=37)
+        self.neg = rng.poisson(45, size=37)
+
+    def test_seed_reproducibility(self):
+        a = bootstrap_asymmetry(self.pos, self.neg, 500, seed=7)
+        self.assertEqual(a, bootstrap_asymmetry(self.pos, self.neg, 500, seed=7))
+        self.assertNotEqual(a, bootstrap_asymmetry(self.pos, self.neg, 500, seed=8))
+        seq = file_seeds(7, 3)[1]
+        np.testing.assert_array_equal(bootstrap_replicates(self.pos, self.neg, 50, seq),
+                                      bootstrap_replicates(self.pos, self.neg, 50, file_seeds(7, 3)[1]))
+        self.assertEqual(name_seed(7, 'output-Set1.txt').entropy, name_seed(7, 'output-Set1.txt').entropy)
+        self.assertNotEqual(name_seed(7, 'output-Set1.txt').entropy, name_seed(7, 'output-Set2.txt').entropy)
+
+    def test_result_does_not_depend_on_max_cells(self):
+        expected = bootstrap_replicates(self.pos, self.neg, 101, seed=3)
+        for cells in (1, 37, 40, 3 * 37 + 1):
+            with mock.patch.object(bootstrap, 'max_cells', cells):
+                np.testing.assert_array_equal(bootstrap_replicates(self.pos, self.neg, 101, seed=3), expected)
+
+    def test_empty_and_all_zero_batches(self):
+        self.assertTrue(np.isnan(bootstrap_replicates([], [], 10)).all())
+        for pos, neg in (([], []), ([0, 0, 0], [0, 0, 0])):
+            result = bootstrap_asymmetry(pos, neg, 100, seed=1)
+            self.assertTrue(math.isnan(result['asym']))
+            self.assertTrue(math.isnan(result['asym_err']))
+            self.assertTrue(math.isnan(result['significance']))
+
+    def test_asymmetry(self):
+        np.testing.assert_array_equal(asymmetry([3, 0, 1], [1, 0, 1]), [0.5, np.nan, 0.0])
+
+    def test_interval_coverage_on_binomial_sample(self):
+        # 40 batches of 100 charged pions with P(π⁺) = 0.55, i.e. A = 0.1
+        rng = np.random.default_rng(11)
+        trials, covered = 200, 0
+        for _ in range(trials):
+            pos = rng.binomial(100, 0.55, size=40)
+            result = bootstrap_asymmetry(pos, 100 - pos, 500, seed=rng)
+            covered += result['ci_low'] <= 0.1 <= result['ci_high']
+        self.assertGreater(covered / trials, 0.88)
+        self.assertLess(covered / trials, 0.99)
+
+
+if __name__ == '__main__':
+    unittest.main()
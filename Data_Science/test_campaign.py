@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import campaign
+import goal4
+from synthetic_data import generate_set
+
+
+class TestSharding(unittest.TestCase):
+    def test_shards_partition_the_files(self):
+        files = {f'output-Set{i}.txt': f'data/output-Set{i}.txt' for i in range(50)}
+        shards = [campaign.shard_files(files, i, 4) for i in range(4)]
+        self.assertEqual(sorted(k for shard in shards for k in shard), sorted(files))
+        self.assertTrue(all(shards))
+        # a file's shard does not depend on the other files
+        some = dict(list(files.items())[:7])
+        self.assertEqual(campaign.shard_files(some, 2, 4), {k: p for k, p in shards[2].items() if k in some})
+
+    def test_parse_shard(self):
+        self.assertEqual(campaign.parse_shard('1/3'), (1, 3))
+        for text in ('3/3', '-1/2', '1', 'a/b'):
+            with self.assertRaises(Exception):
+                campaign.parse_shard(text)
+
+    def test_glob_root(self):
+        self.assertEqual(campaign.glob_root('data_science/output-*.txt'), 'data_science')
+        self.assertEqual(campaign.glob_root('output-*.txt'), '.')
+        self.assertEqual(campaign.glob_root(os.path.join(os.sep, 'runs', '*', 'out.txt')),
+                         os.path.join(os.sep, 'runs'))
+
+
+class TestCampaign(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.data = os.path.join(self.folder, 'data_science')
+        self.files = generate_set(self.data, 3, 40, 10.0, seed=5)
+        self.pattern = os.path.join(self.data, 'output-Set*.txt')
+        self.out = os.path.join(self.folder, 'campaign')
+        self.settings = mock.patch.multiple(goal4, bootstrap_replicates=50, use_cache=False,
+                                            profile_file=None, max_events=1000)
+        self.settings.start()
+
+    def tearDown(self):
+        self.settings.stop()
+        shutil.rmtree(self.folder)
+
+    def test_manifest(self):
+        manifest = os.path.join(self.data, 'files.txt')
+        with open(manifest, 'w') as f:
+            f.write("# campaign\n" + "\n".join(os.path.basename(p) for p in self.files) + "\n\n"
+                    + os.path.basename(self.files[0]) + "  # twice\n")
+        files = campaign.campaign_files(manifest)
+        self.assertEqual(list(files), ['output-Set0.txt', 'output-Set1.txt', 'output-Set2.txt'])
+        self.assertEqual(files, campaign.campaign_files(patterns=[self.pattern]))
+
+    def test_relative_and_absolute_paths_share_keys(self):
+        cwd = os.getcwd()
+        os.chdir(self.folder)
+        try:
+            relative = campaign.campaign_files(patterns=['data_science/output-Set*.txt'])
+        finally:
+            os.chdir(cwd)
+        absolute = campaign.campaign_files(patterns=[self.pattern])
+        self.assertEqual(list(relative), list(absolute))
+
+    def test_key_clash_is_an_error(self):
+        other = os.path.join(self.folder, 'other')
+        generate_set(other, 1, 5, seed=1)
+        with self.assertRaises(ValueError):
+            campaign.campaign_files(patterns=[self.pattern, os.path.join(other, '*.txt')])
+
+    def test_sharded_run_matches_single_run(self):
+        files = campaign.campaign_files(patterns=[self.pattern])
+        for index in range(2):
+            campaign.run_shard(files, index, 2, self.out, workers=1)
+        stats = campaign.run_shard(files, 0, 2, self.out, workers=1)
+        self.assertEqual(stats['analysed'], 0)
+        sharded, missing = campaign.merge_shards(self.out, files)
+        self.assertEqual(missing, [])
+        self.assertEqual([s['file'] for s in sharded], list(files.values()))
+
+        single_out = os.path.join(self.folder, 'single')
+        campaign.run_shard(files, 0, 1, single_out, workers=1)
+        single, _ = campaign.merge_shards(single_out, files)
+        for a, b in zip(single, sharded):
+            a.pop('time_s'), b.pop('time_s')
+            self.assertEqual(a, b)
+
+    def test_seeds_do_not_depend_on_other_files(self):
+        files = campaign.campaign_files(patterns=[self.pattern])
+        campaign.run_shard(files, 0, 1, self.out, workers=1)
+        full, _ = campaign.merge_shards(self.out, files)
+        # a campaign without output-Set0.txt gives the other files the same bootstrap
+        fewer = dict(list(files.items())[1:])
+        fewer_out = os.path.join(self.folder, 'fewer')
+        campaign.run_shard(fewer, 0, 1, fewer_out, workers=1)
+        part, _ = campaign.merge_shards(fewer_out, fewer)
+        self.assertEqual([s['bootstrap'] for s in part], [s['bootstrap'] for s in full[1:]])
+
+    def test_reduce_reports_missing_files(self):
+        files = campaign.campaign_files(patterns=[self.pattern])
+        campaign.run_shard(files, 0, 1, self.out, workers=1)
+        extra = os.path.join(self.data, 'extra.txt')
+        summaries, missing = campaign.merge_shards(self.out, dict(files, **{'extra.txt': extra}))
+        self.assertEqual(len(summaries), len(files))
+        self.assertEqual(missing, [extra])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import gzip
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import compressed_io
+from compressed_io import compress_file, frame_spans, open_text, iter_chunks
+from particle_reader import read_particles
+from synthetic_data import generate_file
+
+
+class TestCompressedInput(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'output-Set0.txt')
+        generate_file(self.path, 3000, 10.0, seed=7)
+        self.plain = read_particles(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def assertSameColumns(self, cols):
+        for name, column in self.plain.items():
+            np.testing.assert_array_equal(cols[name], column)
+
+    def test_plain_gzip_stream(self):
+        with open(self.path, 'rb') as fin, gzip.open(self.path + '.gz', 'wb') as fout:
+            fout.write(fin.read())
+        self.assertIsNone(frame_spans(self.path + '.gz'))
+        self.assertSameColumns(read_particles(self.path + '.gz'))
+
+    def test_bgzf_frames(self):
+        gz = compress_file(self.path, self.path + '.gz')
+        spans = frame_spans(gz)
+        self.assertGreater(len(spans), 1)
+        self.assertEqual(sum(length for _, length in spans), os.path.getsize(gz))
+        with gzip.open(gz, 'rb') as f, open(self.path, 'rb') as plain:
+            self.assertEqual(f.read(), plain.read())
+        self.assertSameColumns(read_particles(gz))
+
+    def test_parallel_decompression(self):
+        gz = compress_file(self.path, self.path + '.gz')
+        old = compressed_io.task_bytes
+        compressed_io.task_bytes = 1 << 16
+        try:
+            with open(self.path, 'rb') as plain:
+                self.assertEqual(b''.join(iter_chunks(gz, 1 << 16, workers=2)), plain.read())
+        finally:
+            compressed_io.task_bytes = old
+
+    def test_open_text(self):
+        gz = compress_file(self.path, self.path + '.gz')
+        with open_text(gz) as f, open(self.path) as plain:
+            self.assertEqual(f.readline(), plain.readline())
+
+    @unittest.skipUnless(importlib.util.find_spec('zstandard'), "zstandard not installed")
+    def test_zstd_frames(self):
+        zst = compress_file(self.path, self.path + '.zst', frame_size=1 << 16)
+        self.assertGreater(len(frame_spans(zst)), 1)
+        self.assertSameColumns(read_particles(zst))
+
+    @unittest.skipUnless(importlib.util.find_spec('lz4'), "lz4 not installed")
+    def test_lz4_frames(self):
+        lz = compress_file(self.path, self.path + '.lz4', frame_size=1 << 16)
+        self.assertGreater(len(frame_spans(lz)), 1)
+        self.assertSameColumns(read_particles(lz))
+
+
+if __name__ == '__main__':
+    unittest.main()
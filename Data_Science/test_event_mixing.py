@@ -0,0 +1,77 @@
+import unittest
+import numpy as np
+from event_mixing import new_pool, iter_mixed_pairs, fill_mixed, background_excess
+from pairs import pair_observables, new_pair_histograms, fill_pairs
+from particle_reader import select_events
+from kinematics import PION_MASS
+from test_pairs import random_events
+
+
+def brute_force(cols, depth, edges, first_pdg=211, second_pdg=-211):
+    """
+    Sorted mixed-event masses from explicit loops over events and partners.
+    """
+    offsets = cols['event_offsets']
+    bins = np.searchsorted(edges, np.diff(offsets), side='right') - 1
+    history = {}
+    masses = []
+
+    def momenta(e, pdg):
+        idx = [i for i in range(offsets[e], offsets[e + 1]) if cols['pdg'][i] == pdg]
+        return [np.array([cols[c][i] for c in ('px', 'py', 'pz')]) for i in idx]
+
+    def mass(a, b):
+        pairs = pair_observables(tuple(np.array([x]) for x in a), tuple(np.array([x]) for x in b),
+                                 PION_MASS, PION_MASS)
+        return pairs['mass'][0]
+
+    for e in range(offsets.size - 1):
+        partners = history.setdefault(bins[e], [])
+        for t in partners[-depth:]:
+            masses += [mass(a, b) for a in momenta(e, first_pdg) for b in momenta(t, second_pdg)]
+            if first_pdg != second_pdg:
+                masses += [mass(a, b) for a in momenta(t, first_pdg) for b in momenta(e, second_pdg)]
+        partners.append(e)
+    return np.sort(masses)
+
+
+class TestEventMixing(unittest.TestCase):
+    def setUp(self):
+        self.cols = random_events(np.random.default_rng(5), n_events=60)
+        self.edges = (0, 4, 8)
+
+    def mixed_masses(self, blocks, first='pi+', second='pi-', depth=3):
+        pool = new_pool(depth, self.edges)
+        masses = [p['mass'] for cols in blocks for p in iter_mixed_pairs(pool, cols, first, second, chunk=9)]
+        return np.sort(np.concatenate(masses))
+
+    def test_matches_explicit_loops(self):
+        np.testing.assert_allclose(self.mixed_masses([self.cols]),
+                                   brute_force(self.cols, 3, self.edges), rtol=1e-9)
+
+    def test_pool_carries_across_blocks(self):
+        blocks = [select_events(self.cols, range(a, b)) for a, b in ((0, 17), (17, 18), (18, 60))]
+        np.testing.assert_allclose(self.mixed_masses(blocks), self.mixed_masses([self.cols]), rtol=1e-12)
+
+    def test_like_sign(self):
+        np.testing.assert_allclose(self.mixed_masses([self.cols], 'pi+', 'pi+'),
+                                   brute_force(self.cols, 3, self.edges, 211, 211), rtol=1e-9)
+
+    def test_pool_is_bounded(self):
+        pool = new_pool(2, self.edges)
+        fill_mixed(new_pair_histograms(), pool, self.cols)
+        for entry in pool['bins'].values():
+            self.assertLessEqual(entry['first']['offsets'].size - 1, 2)
+
+    def test_background_excess(self):
+        same, mixed = new_pair_histograms(), new_pair_histograms()
+        fill_pairs(same, self.cols)
+        fill_mixed(mixed, new_pool(3, self.edges), self.cols)
+        result = background_excess(same['mass'], mixed['mass'], (0.2, 2.2), (0.2, 2.2))
+        # normalised on the whole range, nothing is left over
+        self.assertAlmostEqual(result['excess'], 0.0, places=6)
+        self.assertEqual(result['same'], same['mass']['counts'][0, 1:-1].sum())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from unittest import mock
+import numpy as np
+import event_stats
+import event_kernels
+from event_stats import segment_sum, segment_max, segment_count, event_quantities, batch_sums
+from particle_reader import parse_block
+
+
+class TestSegments(unittest.TestCase):
+    def test_empty_events(self):
+        offsets = np.array([0, 2, 2, 5, 5])
+        values = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(segment_sum(values, offsets).tolist(), [3.0, 0.0, 12.0, 0.0])
+        np.testing.assert_array_equal(segment_max(values, offsets), [2.0, np.nan, 5.0, np.nan])
+        self.assertEqual(segment_count(values > 1.5, offsets).tolist(), [1, 0, 3, 0])
+
+    def test_leading_particles_and_no_events(self):
+        offsets = np.array([1, 3])
+        self.assertEqual(segment_sum([9, 1, 2], offsets).tolist(), [3])
+        self.assertEqual(segment_sum([], np.array([0])).size, 0)
+
+    def test_batch_sums(self):
+        self.assertEqual(batch_sums([1, 2, 3, 4, 5], 2).tolist(), [3, 7, 5])
+        self.assertEqual(batch_sums([], 2).size, 0)
+
+
+class TestEventQuantities(unittest.TestCase):
+    def test_quantities(self):
+        cols = parse_block(b"0 3\n3.0 4.0 0.0 211\n0.0 0.0 1.0 -211\n1.0 0.0 0.0 211\n"
+                           b"1 0\n"
+                           b"2 1\n0.0 0.0 2.0 22\n")
+        q = event_quantities(cols)
+        self.assertEqual(q['multiplicity'].tolist(), [3, 0, 1])
+        self.assertEqual(q['n_pos'].tolist(), [2, 0, 0])
+        self.assertEqual(q['n_neg'].tolist(), [1, 0, 0])
+        np.testing.assert_allclose(q['sum_pt'], [6.0, 0.0, 0.0])
+        np.testing.assert_array_equal(q['max_p'], [5.0, np.nan, 2.0])
+
+    def test_numba_backend_without_numba_falls_back(self):
+        cols = parse_block(b"0 2\n3.0 4.0 0.0 211\n0.0 0.0 1.0 -211\n1 1\n0.0 0.0 2.0 22\n")
+        expected = event_quantities(cols)
+        with mock.patch.object(event_kernels, 'numba', None), mock.patch.object(event_stats, 'backend', 'numba'):
+            with self.assertWarns(RuntimeWarning):
+                q = event_quantities(cols)
+        self.assertEqual(list(q), list(expected))
+        for name in expected:
+            np.testing.assert_array_equal(q[name], expected[name])
+
+
+@unittest.skipUnless(event_kernels.available(), "numba is not installed")
+class TestNumbaBackend(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        sizes = rng.integers(0, 300, size=500)
+        sizes[::9] = 0
+        sizes[7] = 3000         # NumPy sums this one pairwise, the kernel sequentially
+        n = int(sizes.sum()) + 2
+        # two particles before the first header
+        self.cols = {
+            'px': rng.normal(size=n), 'py': rng.normal(size=n), 'pz': rng.normal(size=n) * 4,
+            'pdg': rng.choice([211, -211, 111, 2212], size=n).astype(np.int32),
+            'event_id': np.arange(sizes.size),
+            'event_offsets': np.concatenate([[2], 2 + np.cumsum(sizes)]),
+        }
+        self.old_backend = event_stats.backend
+
+    def tearDown(self):
+        event_stats.backend = self.old_backend
+
+    def quantities(self, backend):
+        event_stats.backend = backend
+        return event_quantities(self.cols)
+
+    def test_matches_numpy(self):
+        expected = self.quantities('numpy')
+        result = self.quantities('numba')
+        self.assertEqual(list(result), list(expected))
+        for name in expected:
+            self.assertEqual(result[name].dtype, expected[name].dtype)
+            if name == 'sum_pt':
+                np.testing.assert_allclose(result[name], expected[name], rtol=1e-12)
+            else:
+                np.testing.assert_array_equal(result[name], expected[name])
+
+    def test_numpy_is_the_default(self):
+        self.assertEqual(self.old_backend, 'numpy')
+
+
+if __name__ == '__main__':
+    unittest.main()
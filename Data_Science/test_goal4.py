@@ -0,0 +1,103 @@
+import concurrent.futures
+import os
+import shutil
+import tempfile
+import unittest
+from multiprocessing import shared_memory
+from unittest import mock
+import goal4
+from particle_reader import read_particles
+from plotting import new_plotter
+from synthetic_data import generate_file
+
+
+def reference_counts(path: str, n_events: int, batch_size: int) -> tuple[list, list]:
+    """
+    Per-batch π⁺ / π⁻ counts of the first n_events events, one event at a time.
+    """
+    cols = read_particles(path)
+    offsets = cols['event_offsets']
+    pos, neg = [], []
+    for e in range(n_events):
+        if e % batch_size == 0:
+            pos.append(0)
+            neg.append(0)
+        pdg = cols['pdg'][offsets[e]:offsets[e + 1]].tolist()
+        pos[-1] += pdg.count(211)
+        neg[-1] += pdg.count(-211)
+    if n_events % batch_size and not (pos[-1] or neg[-1]):
+        pos.pop()
+        neg.pop()
+    return pos, neg
+
+
+class TestGoal4(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'output-Set0.txt')
+        generate_file(self.path, 3000, 5.0, seed=8)
+        # 500 more events without pions: a partial last batch that only has them is dropped
+        with open(self.path, 'a') as f:
+            for e in range(3000, 3500):
+                f.write(f"{e} 1\n0.1 0.2 0.3 111\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    @staticmethod
+    def comparable(summary: dict) -> dict:
+        return {key: value for key, value in summary.items() if key not in ('time_s', 'run')}
+
+    def test_chunking_does_not_change_results(self):
+        for max_events in (3500, 2750):
+            with self.subTest(max_events=max_events), mock.patch.object(goal4, 'max_events', max_events):
+                pos, neg = reference_counts(self.path, max_events, goal4.batch_size)
+                summary = goal4.process_file(self.path, workers=1)
+                self.assertNotIn('run', summary)
+                single = self.comparable(summary)
+                self.assertEqual(single['events'], max_events)
+                self.assertEqual((single['pos_batches'], single['neg_batches']), (pos, neg))
+                self.assertEqual((single['total_pos'], single['total_neg']), (sum(pos), sum(neg)))
+                for workers in (3, 7):
+                    chunked = self.comparable(goal4.process_file(self.path, workers=workers))
+                    # ΣpT is summed per chunk, so it only agrees to rounding
+                    self.assertAlmostEqual(chunked.pop('mean_sum_pt'), single['mean_sum_pt'], places=12)
+                    self.assertEqual(chunked, {k: v for k, v in single.items() if k != 'mean_sum_pt'})
+
+    def test_bootstrap_does_not_depend_on_file_order(self):
+        other = os.path.join(self.folder, 'output-Set1.txt')
+        generate_file(other, 1000, 5.0, seed=9)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=2) as exe:
+            runs = [goal4.analyse_files(paths, [goal4.file_seed(p) for p in paths], exe, 2,
+                                        new_plotter(enabled=False))
+                    for paths in ([self.path, other], [other, self.path], [other])]
+        boots = [{s['file']: s['bootstrap'] for s in run} for run in runs]
+        self.assertEqual(boots[0], boots[1])
+        self.assertEqual(boots[2][other], boots[0][other])
+        self.assertNotEqual(goal4.file_seed(self.path).entropy, goal4.file_seed(other).entropy)
+
+    def test_shared_results_match_returned_lists(self):
+        created = []
+        create_shared_array = goal4.create_shared_array
+
+        def create(*args, **kwargs):
+            shm, array = create_shared_array(*args, **kwargs)
+            created.append(shm.name)
+            return shm, array
+
+        summaries = {}
+        goal4.start_tracker()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=2) as exe:
+            for shared in (True, False):
+                with mock.patch.multiple(goal4, shared_results=shared, create_shared_array=create):
+                    result = goal4.analyse_files([self.path, self.path], [1, 2], exe, 4, new_plotter(enabled=False))
+                summaries[shared] = [self.comparable(s) for s in result]
+        self.assertEqual(summaries[True], summaries[False])
+        # the block is only used with shared_results and is unlinked afterwards
+        self.assertEqual(len(created), 1)
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=created[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import goal5
+import particle_reader
+from particle_cache import load_particles, is_fresh
+from particle_reader import concat_columns, read_particles
+from synthetic_data import generate_file
+
+
+class TestParticleBlocks(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'output-Set1.txt')
+        generate_file(self.path, 2000, 10.0, seed=6)
+        self.expected = read_particles(self.path, max_particles=5000)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def blocks(self) -> list:
+        with mock.patch.object(particle_reader, 'block_size', 1 << 14):
+            return list(goal5.particle_blocks(self.path))
+
+    def assertSameColumns(self, blocks: list):
+        cols = concat_columns(blocks)
+        for name in self.expected:
+            np.testing.assert_array_equal(cols[name], self.expected[name], err_msg=name)
+
+    def test_cold_cache_streams_the_text(self):
+        with mock.patch.multiple(goal5, use_cache=True, max_particles=5000, selection=None), \
+                mock.patch.object(goal5, 'load_particles', side_effect=AssertionError("file materialised")):
+            blocks = self.blocks()
+        self.assertGreater(len(blocks), 1)
+        self.assertLess(max(b['pdg'].size for b in blocks), 5000)
+        self.assertSameColumns(blocks)
+        self.assertFalse(is_fresh(self.path))
+
+    def test_fresh_cache_is_sliced(self):
+        load_particles(self.path)
+        with mock.patch.multiple(goal5, use_cache=True, max_particles=5000, selection=None):
+            self.assertSameColumns(self.blocks())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from synthetic_data import generate_set
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestGoalScripts(unittest.TestCase):
+    """
+    goal1 / goal2 are plain scripts: run them on a small generated data set.
+    """
+    def run_script(self, name: str) -> str:
+        with tempfile.TemporaryDirectory() as folder:
+            generate_set(os.path.join(folder, 'data_science'), 2, 30, 10.0, seed=4)
+            env = dict(os.environ, MPLBACKEND='Agg', PYTHONPATH=HERE)
+            done = subprocess.run([sys.executable, os.path.join(HERE, name)], cwd=folder, env=env,
+                                  capture_output=True, text=True, timeout=120)
+        self.assertEqual(done.returncode, 0, done.stderr)
+        return done.stdout
+
+    def test_goal1(self):
+        self.assertIn("Event ID: 0", self.run_script('goal1.py'))
+
+    def test_goal2(self):
+        self.assertIn("The bootstrap significance is", self.run_script('goal2.py'))
+
+
+if __name__ == '__main__':
+    unittest.main()
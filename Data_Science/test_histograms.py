@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from histograms import new_histogram, fill, merge_histograms, in_range, save_histograms, load_histograms
+
+
+class TestHistograms(unittest.TestCase):
+    def setUp(self):
+        self.values = np.random.default_rng(1).normal(0.0, 2.0, size=20000)
+
+    def test_blockwise_fill_matches_numpy(self):
+        hist = new_histogram(-5.0, 5.0, 40)
+        for block in np.array_split(self.values, 9):
+            fill(hist, block)
+        expected, _ = np.histogram(self.values, bins=hist['edges'])
+        np.testing.assert_array_equal(in_range(hist)[0], expected)
+        self.assertEqual(hist['counts'][0, 0], np.count_nonzero(self.values < -5.0))
+        self.assertEqual(hist['counts'][0, -1], np.count_nonzero(self.values >= 5.0))
+
+    def test_nan_and_inf(self):
+        hist = fill(new_histogram(0.0, 1.0, 4), [np.nan, -np.inf, np.inf, 0.5])
+        self.assertEqual(hist['counts'].tolist(), [[2, 0, 0, 1, 0, 1]])
+
+    def test_log_bins_and_categories(self):
+        values = np.abs(self.values) + 1e-3
+        categories = (values > 1.0).astype(int)
+        hist = fill(new_histogram(1e-3, 10.0, 20, log=True, n_categories=2), values, categories)
+        for c in (0, 1):
+            expected, _ = np.histogram(values[categories == c], bins=hist['edges'])
+            np.testing.assert_array_equal(in_range(hist)[c], expected)
+
+    def test_merge(self):
+        a = fill(new_histogram(-5.0, 5.0, 10), self.values[:5000])
+        b = fill(new_histogram(-5.0, 5.0, 10), self.values[5000:])
+        both = fill(new_histogram(-5.0, 5.0, 10), self.values)
+        np.testing.assert_array_equal(merge_histograms(a, b)['counts'], both['counts'])
+        with self.assertRaises(ValueError):
+            merge_histograms(a, new_histogram(-5.0, 5.0, 11))
+
+    def test_save_and_load(self):
+        hists = {'pT': fill(new_histogram(0.0, 5.0, 10), np.abs(self.values)),
+                 'p': fill(new_histogram(0.01, 100.0, 10, log=True), np.abs(self.values))}
+        fd, path = tempfile.mkstemp(suffix='.npz')
+        os.close(fd)
+        try:
+            save_histograms(path, hists)
+            loaded = load_histograms(path)
+        finally:
+            os.remove(path)
+        self.assertTrue(loaded['p']['log'])
+        np.testing.assert_array_equal(loaded['pT']['counts'], hists['pT']['counts'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import unittest
+import instrumentation
+from instrumentation import (new_run, recording, stage, count, timed_iter, merge_runs, run_report, write_report,
+                             active)
+from particle_reader import read_particles
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_inactive_is_noop(self):
+        self.assertFalse(active())
+        with stage('parse'):
+            count('lines', 3)
+
+    def test_stages_and_counters(self):
+        run = new_run()
+        with recording(run):
+            for _ in range(3):
+                with stage('parse'):
+                    count('lines', 2)
+            self.assertEqual(list(timed_iter('read', range(4))), [0, 1, 2, 3])
+        self.assertFalse(active())
+        self.assertEqual(run['stages']['parse']['calls'], 3)
+        self.assertEqual(run['stages']['read']['calls'], 5)
+        self.assertEqual(run['counters'], {'lines': 6})
+
+    def test_nested_recording_restores_outer_run(self):
+        outer, inner = new_run(), new_run()
+        with recording(outer):
+            with recording(inner):
+                count('events')
+            count('events', 2)
+        self.assertEqual(inner['counters'], {'events': 1})
+        self.assertEqual(outer['counters'], {'events': 2})
+
+    def test_merge_runs(self):
+        a = {'stages': {'parse': {'seconds': 1.0, 'calls': 2}}, 'counters': {'lines': 5}}
+        b = {'stages': {'parse': {'seconds': 0.5, 'calls': 1}, 'read': {'seconds': 2.0, 'calls': 1}},
+             'counters': {'lines': 1, 'bytes_read': 10}}
+        merged = merge_runs(a, b)
+        self.assertEqual(merged['stages']['parse'], {'seconds': 1.5, 'calls': 3})
+        self.assertEqual(merged['counters'], {'lines': 6, 'bytes_read': 10})
+        self.assertEqual(a['counters'], {'lines': 5})
+
+    def test_reader_counters_and_report(self):
+        fd, path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w') as f:
+            f.write("0 2\n0.1 0.2 0.3 211\n0.1 x 0.3 211\n1 0\n")
+        run = new_run()
+        try:
+            with recording(run, capture=('cprofile', 'tracemalloc')):
+                read_particles(path)
+        finally:
+            os.remove(path)
+        counters = run['counters']
+        self.assertEqual(counters['bytes_read'], 38)
+        self.assertEqual(counters['lines_parsed'], 4)
+        self.assertEqual(counters['particles_parsed'], 1)
+        self.assertEqual(counters['lines_rejected'], 1)
+        self.assertIn('parse', run['stages'])
+
+        report = run_report(run, 'test', 1.0, files=1)
+        self.assertEqual(report['files'], 1)
+        self.assertLessEqual(len(report['cprofile']), instrumentation.top_functions)
+        self.assertGreater(report['tracemalloc_peak_mb'], 0)
+        with tempfile.TemporaryDirectory() as folder:
+            out = os.path.join(folder, 'profile.json')
+            write_report(report, out)
+            with open(out) as f:
+                self.assertEqual(json.load(f)['counters'], counters)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import concurrent.futures
+import contextlib
+import io
+import time
+import unittest
+from unittest import mock
+import job_pool
+from job_pool import run_ordered
+
+
+def sleepy_job(item: tuple) -> dict:
+    index, delay = item
+    time.sleep(delay)
+    return {'index': index, 'particles': 10 * index}
+
+
+class CountingExecutor(concurrent.futures.ProcessPoolExecutor):
+    """
+    Process pool that remembers the most jobs it ever had outstanding.
+    """
+    most_outstanding = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.futures = []
+
+    def submit(self, *args, **kwargs):
+        self.futures = [f for f in self.futures if not f.done()]
+        future = super().submit(*args, **kwargs)
+        self.futures.append(future)
+        CountingExecutor.most_outstanding = max(CountingExecutor.most_outstanding, len(self.futures))
+        return future
+
+
+class TestRunOrdered(unittest.TestCase):
+    def setUp(self):
+        # later items finish first
+        self.items = [(i, 0.05 * (6 - i)) for i in range(6)]
+
+    def test_results_in_input_order(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            results = list(run_ordered(sleepy_job, self.items, workers=3))
+        self.assertEqual([item for item, _ in results], self.items)
+        self.assertEqual([result['index'] for _, result in results], list(range(6)))
+
+    def test_max_pending_bounds_the_queue(self):
+        CountingExecutor.most_outstanding = 0
+        with mock.patch.object(job_pool.concurrent.futures, 'ProcessPoolExecutor', CountingExecutor):
+            results = list(run_ordered(sleepy_job, self.items, workers=2, max_pending=3, progress=False))
+        self.assertEqual(len(results), 6)
+        self.assertGreater(CountingExecutor.most_outstanding, 1)
+        self.assertLessEqual(CountingExecutor.most_outstanding, 3)
+
+    def test_progress_lines(self):
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            list(run_ordered(sleepy_job, self.items, workers=2))
+        lines = err.getvalue().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertEqual([line.split(']')[0] for line in lines], [f"[{n}/6 files" for n in range(1, 7)])
+        self.assertIn("particles/s", lines[-1])
+
+    def test_no_progress(self):
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            list(run_ordered(sleepy_job, self.items[:2], workers=1, progress=False))
+        self.assertEqual(err.getvalue(), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import math
+import unittest
+import warnings
+import numpy as np
+from kinematics import (transverse_momentum, momentum, pseudorapidity, azimuth,
+                        energy, rapidity, work_buffer, PION_MASS)
+
+
+class TestKinematics(unittest.TestCase):
+    def setUp(self):
+        self.px = np.array([0.3, -1.2, 0.0, 0.5])
+        self.py = np.array([0.4, 0.5, 0.0, -0.5])
+        self.pz = np.array([1.0, -2.0, 3.0, 0.0])
+
+    def test_matches_scalar_formulas(self):
+        p = momentum(self.px, self.py, self.pz)
+        eta = pseudorapidity(self.px, self.py, self.pz)
+        for i in (0, 1, 3):
+            p_i = math.sqrt(self.px[i]**2 + self.py[i]**2 + self.pz[i]**2)
+            theta = math.acos(self.pz[i] / p_i)
+            self.assertAlmostEqual(p[i], p_i, places=12)
+            self.assertAlmostEqual(eta[i], -math.log(math.tan(theta / 2)), places=10)
+        self.assertAlmostEqual(transverse_momentum(self.px, self.py)[0], 0.5)
+        self.assertAlmostEqual(azimuth(self.px, self.py)[3], -math.pi / 4)
+
+    def test_beam_axis_and_rest_are_guarded(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            eta = pseudorapidity(np.zeros(3), np.zeros(3), np.array([2.0, -2.0, 0.0]))
+        self.assertEqual(eta.tolist(), [np.inf, -np.inf, 0.0])
+
+    def test_rapidity(self):
+        e = energy(self.px, self.py, self.pz)
+        y = rapidity(self.px, self.py, self.pz)
+        np.testing.assert_allclose(y, 0.5 * np.log((e + self.pz) / (e - self.pz)))
+        self.assertAlmostEqual(energy(np.zeros(1), np.zeros(1), np.zeros(1))[0], PION_MASS)
+
+    def test_out_buffers_are_reused(self):
+        buffers = {}
+        out = work_buffer(buffers, 'eta', 4)
+        result = pseudorapidity(self.px, self.py, self.pz, out=out)
+        self.assertIs(result, out)
+        self.assertTrue(np.shares_memory(work_buffer(buffers, 'eta', 2), out))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import itertools
+import unittest
+import numpy as np
+from pairs import iter_pairs, fill_pairs, new_pair_histograms, pair_observables
+from kinematics import PION_MASS
+
+
+def random_events(rng, n_events=40):
+    sizes = rng.integers(0, 12, size=n_events)
+    n = int(sizes.sum())
+    return {
+        'px': rng.normal(size=n), 'py': rng.normal(size=n), 'pz': rng.normal(size=n),
+        'pdg': rng.choice([211, -211, 111, 2212], size=n).astype(np.int32),
+        'event_id': np.arange(n_events),
+        'n_particles': sizes.astype(np.int32),
+        'event_offsets': np.concatenate([[0], np.cumsum(sizes)]),
+    }
+
+
+def brute_force(cols, first_pdg, second_pdg):
+    """
+    Sorted masses from a double loop per event.
+    """
+    masses = []
+    offsets = cols['event_offsets']
+    for e in range(offsets.size - 1):
+        idx = range(offsets[e], offsets[e + 1])
+        a = [i for i in idx if cols['pdg'][i] == first_pdg]
+        b = [i for i in idx if cols['pdg'][i] == second_pdg]
+        combos = itertools.combinations(a, 2) if first_pdg == second_pdg else itertools.product(a, b)
+        for i, j in combos:
+            p = [np.array([cols[c][k] for c in ('px', 'py', 'pz')]) for k in (i, j)]
+            e_tot = sum(np.sqrt(v @ v + PION_MASS ** 2) for v in p)
+            total = p[0] + p[1]
+            masses.append(np.sqrt(e_tot ** 2 - total @ total))
+    return np.sort(masses)
+
+
+class TestPairs(unittest.TestCase):
+    def setUp(self):
+        self.cols = random_events(np.random.default_rng(11))
+
+    def test_unlike_sign_matches_double_loop(self):
+        masses = np.concatenate([p['mass'] for p in iter_pairs(self.cols, chunk=7)])
+        np.testing.assert_allclose(np.sort(masses), brute_force(self.cols, 211, -211), rtol=1e-9)
+
+    def test_like_sign_pairs_counted_once(self):
+        masses = np.concatenate([p['mass'] for p in iter_pairs(self.cols, 'pi+', 'pi+', chunk=5)])
+        np.testing.assert_allclose(np.sort(masses), brute_force(self.cols, 211, 211), rtol=1e-9)
+
+    def test_pairs_stay_in_their_event(self):
+        offsets = self.cols['event_offsets']
+        pdg = self.cols['pdg']
+        expected = [np.count_nonzero(pdg[a:b] == 211) * np.count_nonzero(pdg[a:b] == -211)
+                    for a, b in zip(offsets[:-1], offsets[1:])]
+        events = np.concatenate([p['event'] for p in iter_pairs(self.cols, chunk=3)])
+        np.testing.assert_array_equal(np.bincount(events, minlength=offsets.size - 1), expected)
+
+    def test_back_to_back(self):
+        pairs = pair_observables((np.array([1.0]), np.array([0.0]), np.array([0.0])),
+                                 (np.array([-1.0]), np.array([0.0]), np.array([0.0])), PION_MASS, PION_MASS)
+        self.assertAlmostEqual(pairs['mass'][0], 2 * np.hypot(1.0, PION_MASS))
+        self.assertAlmostEqual(pairs['opening_angle'][0], np.pi)
+        self.assertAlmostEqual(abs(pairs['delta_phi'][0]), np.pi)
+
+    def test_fill_pairs(self):
+        hists = new_pair_histograms()
+        n = fill_pairs(hists, self.cols)
+        self.assertEqual(n, brute_force(self.cols, 211, -211).size)
+        for hist in hists.values():
+            self.assertEqual(hist['counts'].sum(), n)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from particle_reader import read_particles, iter_blocks
+from particle_cache import load_particles
+from particle_arrow import convert, columnar_format
+
+
+@unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow not installed")
+class TestParticleArrow(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'output-Set0.txt')
+        with open(self.path, 'w') as f:
+            f.write("0 2\n0.1 0.2 0.3 211\n-0.5 0.5 1.0 -211\n1 1\n1.0 0.0 0.0 111\n"
+                    "2 3\n0.0 0.1 0.2 22\n0.3 0.4 0.5 2212\n0.6 0.7 0.8 -211\n")
+        self.text = read_particles(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def check_round_trip(self, suffix, compression):
+        out = os.path.join(self.folder, 'output-Set0' + suffix)
+        stats = convert(self.path, out, compression, block_size=24)
+        self.assertEqual(stats['particles'], 6)
+        self.assertGreater(stats['row_groups'], 1)
+        cols = read_particles(out)
+        for name, column in self.text.items():
+            np.testing.assert_array_equal(cols[name], column)
+        # row groups follow the event blocks of the text reader
+        self.assertEqual([b['event_id'].tolist() for b in iter_blocks(out)],
+                         [b['event_id'].tolist() for b in iter_blocks(self.path, 24)])
+        return out
+
+    def test_parquet(self):
+        self.check_round_trip('.parquet', 'zstd')
+
+    def test_arrow_ipc(self):
+        self.check_round_trip('.arrow', 'lz4')
+
+    def test_column_projection(self):
+        out = self.check_round_trip('.parquet', 'none')
+        cols = read_particles(out, columns=['px', 'py'], max_events=2)
+        self.assertNotIn('pdg', cols)
+        self.assertEqual(cols['px'].tolist(), [0.1, -0.5, 1.0])
+        self.assertEqual(cols['event_offsets'].tolist(), [0, 2, 3])
+        self.assertEqual(sorted(load_particles(out, columns=['pdg'])),
+                         ['event_id', 'event_offsets', 'n_particles', 'pdg'])
+
+    def test_format_from_extension(self):
+        self.assertEqual(columnar_format('a.parquet'), 'parquet')
+        self.assertEqual(columnar_format('a.arrow'), 'arrow')
+        self.assertIsNone(columnar_format('a.txt.gz'))
+
+
+if __name__ == '__main__':
+    unittest.main()
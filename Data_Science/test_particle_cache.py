@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+import numpy as np
+import particle_reader
+from particle_cache import load_particles, build_cache, is_fresh, cache_dir
+from particle_reader import new_error_report, error_summary, read_particles
+from synthetic_data import generate_file
+
+
+class TestParticleCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'output-Set0.txt')
+        with open(self.path, 'w') as f:
+            f.write("0 2\n0.1 0.2 0.3 211\n-0.5 0.5 1.0 -211\n1 1\n1.0 0.0 0.0 111\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_first_read_writes_sidecar(self):
+        cols = load_particles(self.path)
+        self.assertTrue(is_fresh(self.path))
+        self.assertEqual(cols['pdg'].tolist(), [211, -211, 111])
+
+    def test_second_read_is_memory_mapped(self):
+        load_particles(self.path)
+        cols = load_particles(self.path)
+        self.assertIsInstance(cols['px'], np.memmap)
+        self.assertEqual(cols['event_offsets'].tolist(), [0, 2, 3])
+
+    def test_rejected_lines_survive_cache(self):
+        with open(self.path, 'a') as f:
+            f.write("0.1 oops 0.3 211\n")
+        for _ in range(2):
+            report = new_error_report()
+            cols = load_particles(self.path, report=report)
+            self.assertEqual(cols['pdg'].tolist(), [211, -211, 111])
+            self.assertEqual(error_summary(report), {'unparsable number': 1})
+
+    def test_stale_sidecar_is_rebuilt(self):
+        load_particles(self.path)
+        with open(self.path, 'a') as f:
+            f.write("2 1\n0.0 0.0 2.0 -211\n")
+        self.assertFalse(is_fresh(self.path))
+        cols = load_particles(self.path)
+        self.assertEqual(cols['pdg'].tolist(), [211, -211, 111, -211])
+        self.assertTrue(is_fresh(self.path))
+
+    def test_float32_momentum(self):
+        cols = load_particles(self.path, momentum_dtype=np.float32)
+        self.assertEqual(cols['px'].dtype, np.float32)
+        self.assertFalse(is_fresh(self.path, np.float64))
+
+    def test_truncation(self):
+        # a cold head read only parses the head and leaves the sidecar alone
+        cols = load_particles(self.path, max_events=1)
+        self.assertEqual(cols['pdg'].tolist(), [211, -211])
+        self.assertFalse(os.path.isdir(cache_dir(self.path)))
+        load_particles(self.path)
+        cols = load_particles(self.path, max_particles=1, momentum_dtype=np.float64)
+        self.assertEqual(cols['pdg'].tolist(), [211])
+        self.assertEqual(cols['event_offsets'].tolist(), [0, 1])
+
+    def test_empty_file(self):
+        open(self.path, 'w').close()
+        for _ in range(2):
+            cols = load_particles(self.path)
+            self.assertEqual(cols['px'].size, 0)
+            self.assertEqual(cols['event_offsets'].tolist(), [0])
+
+    def test_build_holds_one_block_in_memory(self):
+        generate_file(self.path, 4000, 20.0, seed=5)
+        expected = read_particles(self.path)
+        total = sum(col.nbytes for col in expected.values())
+        with mock.patch.object(particle_reader, 'block_size', 1 << 14):
+            tracemalloc.start()
+            try:
+                cols = build_cache(self.path)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        self.assertLess(peak, total / 4)
+        self.assertIsInstance(cols['px'], np.memmap)
+        for name in expected:
+            np.testing.assert_array_equal(cols[name], expected[name])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from particle_index import (build_event_index, load_event_index, index_path, read_event_range,
+                            read_events, sample_events)
+from particle_reader import read_particles, select_events
+from synthetic_data import generate_file
+
+
+class TestParticleIndex(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'output-Set0.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, text: str) -> None:
+        with open(self.path, 'w') as f:
+            f.write(text)
+
+    def assertSameColumns(self, a: dict, b: dict):
+        self.assertEqual(sorted(a), sorted(b))
+        for name in a:
+            np.testing.assert_array_equal(a[name], b[name], err_msg=name)
+
+    def test_reads_match_full_parse(self):
+        generate_file(self.path, 300, 8.0, seed=2, events_per_block=50)
+        cols = read_particles(self.path)
+        index = load_event_index(self.path)
+        self.assertEqual(index['offset'].size, cols['event_id'].size)
+        for start, stop in ((0, 300), (0, 1), (17, 140), (299, 400), (250, 250)):
+            self.assertSameColumns(read_event_range(self.path, start, stop, index),
+                                   select_events(cols, range(start, stop)))
+        events = [5, 3, 4, 200, 299, 0, 5, -1, 300]
+        self.assertSameColumns(read_events(self.path, events, index),
+                               select_events(cols, [0, 3, 4, 5, 200, 299]))
+        expected = np.sort(np.random.default_rng(9).choice(300, size=25, replace=False))
+        self.assertSameColumns(sample_events(self.path, 25, seed=9, index=index), select_events(cols, expected))
+        self.assertSameColumns(sample_events(self.path, 1000, index=index), select_events(cols, range(300)))
+
+    def test_index_is_saved_and_rebuilt_when_stale(self):
+        self.write("0 1\n0.1 0.2 0.3 211\n1 1\n1.0 0.0 0.0 111\n")
+        self.assertEqual(load_event_index(self.path)['offset'].size, 2)
+        self.assertTrue(os.path.exists(index_path(self.path)))
+        with open(self.path, 'a') as f:
+            f.write("2 2\n0.0 1.0 0.0 -211\n0.0 0.0 1.0 211\n")
+        index = load_event_index(self.path)
+        self.assertEqual(index['event_id'].tolist(), [0, 1, 2])
+        self.assertEqual(read_event_range(self.path, 2, 3, index)['pdg'].tolist(), [-211, 211])
+
+    def test_malformed_headers_are_not_events(self):
+        self.write("0 2\n0.1 0.2 0.3 211\n0.2 0.1 0.0 -211\n"
+                   "1 -1\n0.5 0.5 0.5 211\n"        # negative count
+                   "foo bar\n"                      # unparsable 2-field line
+                   "2 1\n1.0 0.0 0.0 211\n"
+                   "3 1.5\n"                        # non-integer count
+                   "4 1\n0.3 0.3 0.3 -211\n")
+        index = build_event_index(self.path)
+        cols = read_particles(self.path)
+        self.assertEqual(index['event_id'].tolist(), [0, 2, 4])
+        self.assertEqual(index['offset'].size, index['event_id'].size)
+        for e in range(3):
+            self.assertSameColumns(read_event_range(self.path, e, e + 1, index), select_events(cols, range(e, e + 1)))
+        self.assertSameColumns(read_events(self.path, [2, 0], index), select_events(cols, [0, 2]))
+
+    def test_old_index_version_is_rebuilt(self):
+        self.write("0 1\n0.1 0.2 0.3 211\n1 1\n1.0 0.0 0.0 111\n")
+        index = load_event_index(self.path)
+        index['version'] = 1
+        np.savez(self.path + '.evindex.npz', **index)
+        self.assertEqual(int(load_event_index(self.path)['version']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
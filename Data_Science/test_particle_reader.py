@@ -0,0 +1,146 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import particle_reader
+from particle_reader import (parse_block, read_particles, event_index, new_error_report, error_summary,
+                             rejected_lines, REJECT_REASONS)
+
+SAMPLE = (
+    "0 2\n"
+    "0.1 0.2 0.3 211\n"
+    "-0.5 0.5 1.0 -211\n"
+    "1 0\n"
+    "2 3\n"
+    "1.0 0.0 0.0 111\n"
+    "0.0 1.0 0.0 2212\n"
+    "0.0 0.0 1.0 211\n"
+)
+
+
+class TestParseBlock(unittest.TestCase):
+    def test_columns(self):
+        cols = parse_block(SAMPLE.encode())
+        self.assertEqual(cols['px'].tolist(), [0.1, -0.5, 1.0, 0.0, 0.0])
+        self.assertEqual(cols['pz'].tolist(), [0.3, 1.0, 0.0, 0.0, 1.0])
+        self.assertEqual(cols['pdg'].tolist(), [211, -211, 111, 2212, 211])
+        self.assertEqual(cols['event_id'].tolist(), [0, 1, 2])
+        self.assertEqual(cols['n_particles'].tolist(), [2, 0, 3])
+        self.assertEqual(cols['event_offsets'].tolist(), [0, 2, 2, 5])
+
+    def test_event_index(self):
+        cols = parse_block(SAMPLE.encode())
+        self.assertEqual(event_index(cols).tolist(), [0, 0, 2, 2, 2])
+
+    def test_short_lines_ignored(self):
+        cols = parse_block(b"0 1\n1 2 3\n\n0.5 0.5 0.5 211\n")
+        self.assertEqual(cols['pdg'].tolist(), [211])
+
+    def test_empty(self):
+        cols = parse_block(b"")
+        self.assertEqual(cols['px'].size, 0)
+        self.assertEqual(cols['event_offsets'].tolist(), [0])
+
+
+MALFORMED = (
+    "0 2\n"
+    "0.1 0.2 0.3 211\n"
+    "0.1 abc 0.3 211\n"    # 3: unparsable number
+    "1.2.3 0.2 0.3 211\n"  # 4: unparsable number (valid characters only)
+    "0.1 nan 0.3 211\n"    # 5: non-finite momentum
+    "0.1 0.2 0.3 21.5\n"   # 6: non-integer pdg
+    "7\n"                  # 7: wrong field count
+    "1 -1\n"               # 8: bad header
+    "2 1\n"
+    "-0.5 0.5 1.0 -211\n"
+)
+
+
+class TestMalformedLines(unittest.TestCase):
+    def test_bad_lines_dropped(self):
+        cols = parse_block(MALFORMED.encode())
+        self.assertEqual(cols['pdg'].tolist(), [211, -211])
+        self.assertEqual(cols['event_id'].tolist(), [0, 2])
+        self.assertEqual(cols['event_offsets'].tolist(), [0, 1, 2])
+
+    def test_report(self):
+        report = new_error_report()
+        parse_block(MALFORMED.encode(), report, first_line=100)
+        rows, reasons = rejected_lines(report)
+        # line 1 is kept but its header promised 2 particles
+        self.assertEqual(rows.tolist(), [101, 103, 104, 105, 106, 107, 108])
+        self.assertEqual(error_summary(report), {
+            'unparsable number': 2, 'wrong field count': 1, 'non-finite momentum': 1,
+            'non-integer pdg': 1, 'bad header': 1, 'particle count mismatch': 1})
+
+    def test_malformed_numbers_in_a_large_block(self):
+        lines = ["0 20000"] + [f"{i % 7}.5 0.25 -{i % 3}.0 {211 if i % 2 else -211}" for i in range(20000)]
+        clean = parse_block("\n".join(lines).encode())
+        bad = [17, 4999, 5000, 19999]
+        for i in bad:
+            lines[i + 1] = "1.2.3 0.25 1e 211"
+        report = new_error_report()
+        cols = parse_block("\n".join(lines).encode(), report)
+        keep = np.setdiff1d(np.arange(20000), bad)
+        for name in ('px', 'py', 'pz', 'pdg'):
+            np.testing.assert_array_equal(cols[name], clean[name][keep])
+        rows, reasons = rejected_lines(report)
+        unparsable = REJECT_REASONS.index('unparsable number')
+        self.assertEqual(rows[reasons == unparsable].tolist(), [i + 2 for i in bad])
+
+    def test_clean_block_reports_nothing(self):
+        report = new_error_report()
+        parse_block(SAMPLE.encode(), report)
+        self.assertEqual(error_summary(report), {})
+
+    def test_line_numbers_across_blocks(self):
+        fd, path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w') as f:
+            f.write(SAMPLE * 20 + "3 1\n0.1 x 0.3 211\n")
+        old_size = particle_reader.block_size
+        particle_reader.block_size = 41
+        try:
+            report = new_error_report()
+            cols = read_particles(path, report=report)
+        finally:
+            particle_reader.block_size = old_size
+            os.remove(path)
+        self.assertEqual(cols['pdg'].size, 100)
+        self.assertEqual(rejected_lines(report)[0].tolist(), [161, 162])
+        self.assertEqual(report['lines'], 162)
+
+
+class TestReadParticles(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w') as f:
+            f.write(SAMPLE * 50)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_small_blocks_match_single_block(self):
+        with open(self.path, 'rb') as f:
+            whole = parse_block(f.read())
+        old_size = particle_reader.block_size
+        particle_reader.block_size = 37
+        try:
+            cols = read_particles(self.path)
+        finally:
+            particle_reader.block_size = old_size
+        for name in whole:
+            np.testing.assert_array_equal(cols[name], whole[name])
+
+    def test_max_events(self):
+        cols = read_particles(self.path, max_events=4)
+        self.assertEqual(cols['event_id'].tolist(), [0, 1, 2, 0])
+        self.assertEqual(cols['event_offsets'].tolist(), [0, 2, 2, 5, 7])
+
+    def test_max_particles(self):
+        cols = read_particles(self.path, max_particles=3)
+        self.assertEqual(cols['pdg'].tolist(), [211, -211, 111])
+        self.assertEqual(cols['event_offsets'].tolist(), [0, 2, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
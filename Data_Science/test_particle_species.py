@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from particle_species import make_classifier, classify, category, species_counts, load_species_table
+
+
+class TestClassifier(unittest.TestCase):
+    def test_default_table(self):
+        pdg = np.array([211, -211, 111, 2212, 999999, -1000010020, 0])
+        names = make_classifier()['names']
+        self.assertEqual([names[c] for c in classify(pdg)],
+                         ['pi+', 'pi-', 'pi0', 'p', 'other', 'other', 'other'])
+
+    def test_custom_table(self):
+        classifier = make_classifier({'pion': [211, -211, 111], 'lambda': [3122]})
+        cats = classify([3122, 111, 22], classifier)
+        self.assertEqual(cats.tolist(), [category('lambda', classifier), category('pion', classifier), 0])
+
+    def test_nuclear_codes_use_sorted_search(self):
+        table = {'pi+': [211], 'd': [1000010020], 'pbar': [-2212], 'pion': [211]}
+        classifier = make_classifier(table)
+        self.assertNotIn('lut', classifier)
+        pdg = [1000010020, 211, -2212, 22, 1000010021, -5000000000, 2000000000]
+        self.assertEqual(classify(pdg, classifier).tolist(),
+                         [category('d', classifier), category('pion', classifier), category('pbar', classifier),
+                          0, 0, 0, 0])
+
+    def test_species_counts(self):
+        counts = species_counts([211, 211, -211, 22, 5])
+        self.assertEqual(counts['pi+'], 2)
+        self.assertEqual(counts['pi-'], 1)
+        self.assertEqual(counts['gamma'], 1)
+        self.assertEqual(counts['other'], 1)
+
+    def test_empty_table(self):
+        classifier = make_classifier({})
+        self.assertEqual(classify([211, -211], classifier).tolist(), [0, 0])
+
+    def test_load_table(self):
+        fd, path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w') as f:
+            f.write("# name codes\npi+ 211\n\nkaons 321 -321\n")
+        try:
+            self.assertEqual(load_species_table(path), {'pi+': [211], 'kaons': [321, -321]})
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
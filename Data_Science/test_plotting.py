@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+import unittest
+from plotting import line_plot, new_plotter, submit_plot, close_plotter
+
+
+class TestPlotting(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.task = {'file': os.path.join(self.folder, 'plot.png'), 'x': ['a', 'b'],
+                     'series': [([1, 2], 'one', 'o'), ([2, 1], 'two', 's')], 'title': 'test'}
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_line_plot_writes_png(self):
+        line_plot(self.task)
+        with open(self.task['file'], 'rb') as f:
+            self.assertEqual(f.read(4), b'\x89PNG')
+
+    def test_plotter_renders_in_background(self):
+        plotter = new_plotter(enabled=True, workers=1)
+        submit_plot(plotter, line_plot, self.task)
+        self.assertEqual(close_plotter(plotter), [self.task['file']])
+        self.assertTrue(os.path.exists(self.task['file']))
+
+    def test_disabled_plotter(self):
+        plotter = new_plotter(enabled=False)
+        submit_plot(plotter, line_plot, self.task)
+        self.assertEqual(close_plotter(plotter), [])
+        self.assertFalse(os.path.exists(self.task['file']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import numpy as np
+from precision import momentum_dtype, as_precision, total, precision_loss, worst_loss
+from streaming_stats import block_moments
+from histograms import new_histogram, fill
+
+
+class TestPrecision(unittest.TestCase):
+    def test_momentum_dtype(self):
+        self.assertEqual(momentum_dtype('float32'), np.float32)
+        with self.assertRaises(ValueError):
+            momentum_dtype('float16')
+
+    def test_as_precision_casts_momenta_only(self):
+        cols = {'px': np.ones(3), 'py': np.ones(3), 'pz': np.ones(3), 'pdg': np.array([211, 211, -211])}
+        low = as_precision(cols, 'float32')
+        self.assertEqual(low['px'].dtype, np.float32)
+        self.assertIs(low['pdg'], cols['pdg'])
+        self.assertIs(as_precision(low, 'float32')['px'], low['px'])
+
+    def test_float32_total_accumulates_in_float64(self):
+        values = np.full(10_000_000, 0.1, dtype=np.float32)
+        self.assertAlmostEqual(total(values), 10_000_000 * float(np.float32(0.1)), delta=1e-3)
+
+    def test_float32_moments_close_to_float64(self):
+        values = np.random.default_rng(3).exponential(0.5, size=100000)
+        ref = block_moments(values)
+        low = block_moments(values.astype(np.float32))
+        self.assertAlmostEqual(low['mean'], ref['mean'], places=6)
+        self.assertAlmostEqual(low['m2'] / ref['m2'], 1.0, places=5)
+
+    def test_float32_histogram(self):
+        values = np.array([0.05, 0.15, 0.95, 2.0])
+        ref = fill(new_histogram(0.0, 1.0, 10), values)
+        low = fill(new_histogram(0.0, 1.0, 10), values.astype(np.float32))
+        np.testing.assert_array_equal(low['counts'], ref['counts'])
+
+    def test_precision_loss(self):
+        loss = precision_loss({'avg': 2.0, 'n': 5, 'file': 'x', 'ok': True}, {'avg': 2.002, 'n': 5})
+        self.assertEqual(set(loss), {'avg', 'n'})
+        self.assertAlmostEqual(loss['avg']['rel_diff'], 1e-3)
+        self.assertEqual(worst_loss(loss)[0], 'avg')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+from results_store import fingerprint, load_store, save_store, lookup, record, split_cached
+
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.folder, 'results.json')
+        self.paths = []
+        for i in range(2):
+            path = os.path.join(self.folder, f'output-Set{i}.txt')
+            with open(path, 'w') as f:
+                f.write(f"0 1\n0.1 0.2 0.3 {211 if i else -211}\n")
+            self.paths.append(path)
+        self.config = {'max_events': 100}
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        store = load_store(self.store_path)
+        record(store, self.paths[0], self.config, {'events': 1, 'species': {'pi-': 1}})
+        save_store(store, self.store_path)
+        store = load_store(self.store_path)
+        self.assertEqual(lookup(store, self.paths[0], self.config), {'events': 1, 'species': {'pi-': 1}})
+        self.assertIsNone(lookup(store, self.paths[1], self.config))
+
+    def test_changed_file_or_config_is_recomputed(self):
+        store = load_store(self.store_path)
+        record(store, self.paths[0], self.config, {'events': 1})
+        self.assertIsNone(lookup(store, self.paths[0], {'max_events': 200}))
+        with open(self.paths[0], 'a') as f:
+            f.write("1 1\n0.0 0.0 1.0 211\n")
+        self.assertIsNone(lookup(store, self.paths[0], self.config))
+
+    def test_same_size_rewrite_changes_hash(self):
+        before = fingerprint(self.paths[0])
+        st = os.stat(self.paths[0])
+        with open(self.paths[0], 'w') as f:
+            f.write("0 1\n0.1 0.2 0.3 +211\n")
+        os.utime(self.paths[0], ns=(st.st_atime_ns, st.st_mtime_ns))
+        after = fingerprint(self.paths[0])
+        self.assertEqual(before['size'], after['size'])
+        self.assertEqual(before['mtime_ns'], after['mtime_ns'])
+        self.assertNotEqual(before['sample_hash'], after['sample_hash'])
+
+    def test_split_cached(self):
+        store = load_store(self.store_path)
+        record(store, self.paths[1], self.config, {'events': 1})
+        missing = os.path.join(self.folder, 'missing.txt')
+        cached, todo, fps = split_cached(store, self.paths + [missing], self.config)
+        self.assertEqual(list(cached), [self.paths[1]])
+        self.assertEqual(todo, [self.paths[0], missing])
+        self.assertIsNone(fps[missing])
+
+    def test_corrupt_store_starts_empty(self):
+        with open(self.store_path, 'w') as f:
+            f.write("{not json")
+        self.assertEqual(load_store(self.store_path)['files'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
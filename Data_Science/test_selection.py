@@ -0,0 +1,69 @@
+import unittest
+import selection
+from selection import compile_selection, apply_selection, filter_particles, select
+from particle_reader import parse_block
+
+DATA = (b"0 3\n0.6 0.0 0.1 211\n0.1 0.1 5.0 -211\n1.0 1.0 0.0 22\n"
+        b"1 2\n0.0 0.9 0.0 -211\n0.3 0.0 0.0 2212\n")
+
+
+class TestSelection(unittest.TestCase):
+    def setUp(self):
+        self.cols = parse_block(DATA)
+
+    def test_particle_cut(self):
+        mask = apply_selection("pT > 0.5 and abs(eta) < 2.4 and pdg in (211, -211)", self.cols)
+        self.assertEqual(mask.tolist(), [True, False, False, True, False])
+
+    def test_species_names_and_chains(self):
+        mask = apply_selection("species in ('pi+', 'pi-') and 0.5 < pT <= 1", self.cols)
+        self.assertEqual(mask.tolist(), [True, False, False, True, False])
+        mask = apply_selection("not species == 'gamma' and event_id == 1", self.cols)
+        self.assertEqual(mask.tolist(), [False, False, False, True, True])
+
+    def test_backends_agree(self):
+        text = "sqrt(px**2 + py**2) > 0.2 or pdg not in (22, -211)"
+        old = selection.backend
+        try:
+            selection.backend = 'numpy'
+            expected = apply_selection(text, self.cols)
+            selection.backend = 'auto'
+            self.assertEqual(apply_selection(text, self.cols).tolist(), expected.tolist())
+        finally:
+            selection.backend = old
+        self.assertIsNotNone(compile_selection(text)['numexpr'])
+
+    def test_filter_keeps_events(self):
+        out = select(self.cols, "pdg == -211")
+        self.assertEqual(out['pdg'].tolist(), [-211, -211])
+        self.assertEqual(out['event_id'].tolist(), [0, 1])
+        self.assertEqual(out['n_particles'].tolist(), [1, 1])
+        self.assertEqual(out['event_offsets'].tolist(), [0, 1, 2])
+
+    def test_filter_with_leading_particles(self):
+        cols = parse_block(b"0.5 0.5 0.5 211\n" + DATA)
+        out = filter_particles(cols, cols['pdg'] == 211)
+        self.assertEqual(out['event_offsets'].tolist(), [1, 2, 2])
+
+    def test_event_level(self):
+        sel = compile_selection("n_particles >= 2 and count(species == 'pi-') == 1 and count(pT > 0.5) >= 2", 'event')
+        self.assertEqual(apply_selection(sel, self.cols).tolist(), [True, False])
+        self.assertEqual(select(self.cols, sel)['pdg'].tolist(), [211, -211, 22])
+
+    def test_rejects_unsafe_or_invalid(self):
+        for text in ("pT >", "foo > 1", "__import__('os').system('x')", "pT.real > 0",
+                     "species == 'kaon'", "pT + 1", "pdg in pdg"):
+            with self.assertRaises(ValueError):
+                apply_selection(text, self.cols)
+
+    def test_species_names_only_compare_with_species(self):
+        self.assertEqual(apply_selection("'pi+' == species", self.cols).tolist(),
+                         apply_selection("species == 'pi+'", self.cols).tolist())
+        for text in ("pdg == 'pi+'", "pT > 'K+'", "pdg in ('pi+', 211)", "species == 'pi+' < pT",
+                     "pT + 'pi+' > 0", "'pi+' in (1, 2)"):
+            with self.assertRaises(ValueError):
+                apply_selection(text, self.cols)
+
+
+if __name__ == '__main__':
+    unittest.main()
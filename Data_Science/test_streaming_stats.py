@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from scipy.stats import f_oneway
+from streaming_stats import new_moments, update_moments, merge_moments, variance, one_way_anova
+
+
+class TestMoments(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.values = rng.normal(3.0, 2.0, size=10000)
+
+    def test_blockwise_matches_numpy(self):
+        acc = new_moments()
+        for block in np.array_split(self.values, 13):
+            acc = update_moments(acc, block)
+        self.assertEqual(acc['n'], self.values.size)
+        self.assertAlmostEqual(acc['mean'], self.values.mean(), places=10)
+        self.assertAlmostEqual(variance(acc), self.values.var(ddof=1), places=8)
+
+    def test_merge_is_order_independent(self):
+        a = update_moments(new_moments(), self.values[:3000])
+        b = update_moments(new_moments(), self.values[3000:])
+        ab = merge_moments(a, b)
+        ba = merge_moments(b, a)
+        self.assertAlmostEqual(ab['mean'], ba['mean'], places=12)
+        self.assertAlmostEqual(ab['m2'], ba['m2'], places=6)
+
+    def test_empty_blocks(self):
+        acc = update_moments(new_moments(), [])
+        self.assertEqual(acc, new_moments())
+
+
+class TestAnova(unittest.TestCase):
+    def test_matches_f_oneway(self):
+        rng = np.random.default_rng(3)
+        groups = [rng.normal(loc, 1.0, size=n) for loc, n in ((0.0, 500), (0.1, 800), (0.05, 300))]
+        accs = []
+        for g in groups:
+            acc = new_moments()
+            for block in np.array_split(g, 4):
+                acc = update_moments(acc, block)
+            accs.append(acc)
+        f_stat, p_value = one_way_anova(accs)
+        expected = f_oneway(*groups)
+        self.assertAlmostEqual(f_stat, expected.statistic, places=8)
+        self.assertAlmostEqual(p_value, expected.pvalue, places=10)
+
+    def test_single_group(self):
+        acc = update_moments(new_moments(), [1.0, 2.0])
+        f_stat, p_value = one_way_anova([acc])
+        self.assertTrue(np.isnan(f_stat) and np.isnan(p_value))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import tempfile
+from pathlib import Path
+import unittest
+from synthetic_data import generate_file, generate_set, parse_mix
+from particle_reader import read_particles
+from particle_species import species_counts
+
+
+class TestSyntheticData(unittest.TestCase):
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'output-Set0.txt')
+            size = generate_file(path, 250, 12.0, parse_mix('pi+=0.5,pi-=0.5'), seed=1, events_per_block=100)
+            self.assertEqual(size, os.path.getsize(path))
+            cols = read_particles(path)
+        self.assertEqual(cols['event_id'].tolist(), list(range(250)))
+        self.assertEqual(int(cols['n_particles'].sum()), cols['pdg'].size)
+        counts = species_counts(cols['pdg'])
+        self.assertEqual(counts['pi+'] + counts['pi-'], cols['pdg'].size)
+
+    def test_reproducible_set(self):
+        with tempfile.TemporaryDirectory() as folder:
+            paths = generate_set(folder, 2, 20, seed=3)
+            first = [Path(p).read_text() for p in paths]
+            generate_set(folder, 2, 20, seed=3)
+            self.assertEqual(first, [Path(p).read_text() for p in paths])
+            self.assertNotEqual(first[0], first[1])
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('pi+=0.3, p=0.1'), {'pi+': 0.3, 'p': 0.1})
+
+
+if __name__ == '__main__':
+    unittest.main()